@@ -1,26 +1,87 @@
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from app.models import db
+from app.utils.database import engine_options
+from app.utils.cache import restaurants_cache
+from app.utils.limits import capacity_limits
+from app.utils.metrics import request_metrics
+from app.utils.replicas import replica_router
+from app.utils.search import restaurant_search
+from app.utils.archive import archive_scheduler
+from app.utils.events import availability_events
+from app.utils.idempotency import idempotency_store
+from app.utils.throttling import load_shedder, rate_limiter
 
 def create_app(config_class=Config):
     """
     Application Factory Pattern
     Crea y configura la aplicación Flask
+    Con AUTO_MIGRATE=false no abre ninguna conexión a la BD: el esquema se
+    aplica antes con `flask upgrade-db` y las cachés se cargan al usarse.
     """
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    
+    # Réplicas de lectura opcionales (binds adicionales, antes de db.init_app)
+    replica_router.init_app(app)
+    
+    # IP real del cliente detrás de proxies de confianza (rate limiting por cliente)
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
     
     # extensiones
     db.init_app(app)
     CORS(app)  
     
+    # Métricas por petición (SQL, BD, serialización) expuestas en /metrics
+    request_metrics.init_app(app)
+    
+    # Protección de las escrituras antes de cualquier otro trabajo de la petición:
+    # load shedding (503) y después rate limiting por cliente y restaurante (429)
+    load_shedder.init_app(app)
+    rate_limiter.init_app(app)
+    
     #  blueprints 
     from app.routes import register_routes
     register_routes(app)
     
-    with app.app_context():
-        db.create_all()
+    # ETag / If-None-Match para las vistas de lectura marcadas con @etag_version
+    from app.utils.conditional import register_conditional_requests
+    register_conditional_requests(app)
+    
+    # Comandos CLI (flask upgrade-db, ...)
+    from app.cli import register_commands
+    register_commands(app)
+    
+    # Límites de reservas por restaurante y fecha (caché en memoria, carga en la primera lectura;
+    # antes de las migraciones, que guardan la capacidad de daily_occupancy)
+    capacity_limits.init_app(app)
+    
+    # Esquema: tablas nuevas + migraciones pendientes (índices, columnas)
+    # En producción, AUTO_MIGRATE=false y `flask upgrade-db` en el despliegue
+    if app.config['AUTO_MIGRATE']:
+        from app.migrations import upgrade
+        with app.app_context():
+            upgrade()
+    
+    # Caché de respuestas del listado de restaurantes
+    restaurants_cache.init_app(app)
+    
+    # Índice de búsqueda de restaurantes en memoria (GET /api/restaurants/search)
+    # Con LAZY_STARTUP se construye en la primera búsqueda
+    restaurant_search.init_app(app)
+    
+    # Archivado periódico de reservas pasadas (opcional, ARCHIVE_INTERVAL; hilo desde la primera petición)
+    archive_scheduler.init_app(app)
+    
+    # Pub/sub de cambios de disponibilidad (GET /api/reservations/availability/stream)
+    availability_events.init_app(app)
+    
+    # Idempotency-Key en las escrituras marcadas con @idempotent
+    idempotency_store.init_app(app)
     
    
     @app.route('/')
@@ -0,0 +1,381 @@
+"""
+Modo de servicio ASGI para los endpoints de lectura
+Las lecturas más frecuentes de la app móvil (listado y detalle de restaurantes,
+listado de reservas y consulta de disponibilidad) se atienden con acceso
+asíncrono a la BD (aiosqlite / asyncpg): una petición esperando a la BD no
+ocupa un worker. El stream SSE de disponibilidad también es nativo: cada
+conexión es una corrutina, no un hilo. El resto de rutas, incluidas todas las escrituras, se delegan
+sin cambios en la app Flask de create_app a través de WsgiToAsgi.
+
+Uso (desde backend/):
+    uvicorn asgi:app --workers 4 --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import re
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.http import http_date, is_resource_modified
+from app import create_app
+from app.models import db, Restaurant
+from app.schemas import restaurant_schema
+from app.utils.admission import availability_select
+from app.utils.cache import restaurants_cache
+from app.utils.conditional import make_etag, reservations_version_query, restaurant_version_query
+from app.utils.database import async_engine_options, async_engine_url
+from app.utils.events import availability_events, parse_subscriptions, sse_event, SSE_KEEPALIVE
+from app.utils.limits import capacity_limits
+from app.utils.metrics import request_metrics, serialization
+from app.utils.reads import (
+    parse_date, reservations_list_query, reservations_page, reservations_page_size, restaurants_list,
+    restaurants_list_filters
+)
+from app.utils.serializers import restaurants_list_select, reservations_source, encode_json, ndjson_encoder
+from app.utils.validators import availability_summary
+from config import Config
+
+
+class ReadRequest:
+    """Datos de la petición HTTP que necesitan los handlers de lectura"""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope['query_string'].decode('latin-1')
+        self.full_path = f'{self.path}?{self.query_string}'
+        self.args = {key: values[0] for key, values in parse_qs(self.query_string).items()}
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+    def int_arg(self, name):
+        """Igual que request.args.get(name, type=int): None si falta o no es entero"""
+        try:
+            return int(self.args[name])
+        except (KeyError, ValueError):
+            return None
+
+    def not_modified(self, etag, last_modified=None):
+        """True si las cabeceras condicionales del cliente siguen siendo válidas"""
+        environ = {
+            'REQUEST_METHOD': self.method,
+            'HTTP_IF_NONE_MATCH': self.headers.get('if-none-match', ''),
+            'HTTP_IF_MODIFIED_SINCE': self.headers.get('if-modified-since', '')
+        }
+        return not is_resource_modified(environ, etag=etag, last_modified=last_modified)
+
+
+class AsyncReadApp:
+    """
+    Aplicación ASGI: handlers asíncronos para las rutas de lectura y la app
+    Flask (vía WsgiToAsgi) para todo lo demás
+    Las respuestas son las mismas que las de las vistas Flask equivalentes
+    (cuerpo, ETag/304 y CORS): las queries y los cuerpos salen de los mismos
+    helpers (app/utils/reads.py) y las peticiones cuentan en /metrics con el
+    endpoint de la vista. El formato NDJSON de reservas y las consultas con
+    include_archived se delegan en Flask.
+    """
+
+    # (ruta, handler, endpoint de la vista Flask equivalente: nombre en /metrics)
+    ROUTES = (
+        (re.compile(r'/api/restaurants'), '_get_restaurants', 'restaurants.get_restaurants'),
+        (re.compile(r'/api/restaurants/(?P<id>\d+)'), '_get_restaurant', 'restaurants.get_restaurant'),
+        (re.compile(r'/api/reservations'), '_get_reservations', 'reservations.get_reservations'),
+        (re.compile(r'/api/reservations/availability/(?P<restaurant_id>\d+)/(?P<date>[^/]+)'), '_check_availability',
+         'reservations.check_availability')
+    )
+    STREAM_PATH = '/api/reservations/availability/stream'
+    STREAM_ENDPOINT = 'reservations.availability_stream'
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+        with flask_app.app_context():
+            url = db.engine.url
+        # Misma BD que la app Flask (ruta de SQLite ya resuelta), con el driver asíncrono
+        self.engine = create_async_engine(async_engine_url(url), **async_engine_options(flask_app.config))
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == self.STREAM_PATH:
+            token = request_metrics.begin()
+            try:
+                return await self._availability_stream(ReadRequest(scope), receive, send)
+            finally:
+                request_metrics.end(token, self.STREAM_ENDPOINT, 'GET')
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            for pattern, handler_name, endpoint in self.ROUTES:
+                match = pattern.fullmatch(scope['path'])
+                if match:
+                    request = ReadRequest(scope)
+                    result = await self._dispatch(getattr(self, handler_name), request, match.groupdict(), endpoint)
+                    if result is not None:
+                        return await self._send(send, request, *result)
+                    break
+
+        # Un hilo por petición delegada (por defecto asgiref ejecutaría todas en el mismo hilo)
+        async with ThreadSensitiveContext():
+            return await self.wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, handler, request, params, endpoint):
+        """
+        Ejecuta el handler con contexto de app (config y encoder JSON) y una sesión asíncrona
+        La petición cuenta en request_metrics con el endpoint de la vista Flask,
+        salvo si el handler la delega en Flask (devuelve None), que ya la mide.
+        """
+        token = request_metrics.begin()
+        result = None
+        try:
+            with self.flask_app.app_context():
+                try:
+                    async with self.session_factory() as session:
+                        result = await handler(session, request, **params)
+                except Exception:
+                    self.flask_app.logger.exception('Error en %s %s', request.method, request.path)
+                    result = self._json(500, {
+                        'success': False,
+                        'message': 'Error interno del servidor'
+                    })
+            return result
+        finally:
+            request_metrics.end(token, endpoint, request.method, record=result is not None)
+
+    @staticmethod
+    def _cors(request, headers):
+        """Cabeceras CORS como flask_cors con la configuración por defecto (origen del cliente)"""
+        headers = dict(headers)
+        origin = request.headers.get('origin')
+        if origin:
+            headers['Access-Control-Allow-Origin'] = origin
+            headers['Vary'] = 'Origin'
+        return headers
+
+    async def _send(self, send, request, status, body, headers):
+        headers = self._cors(request, headers)
+        if status != 304:
+            headers['Content-Length'] = str(len(body))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': body if request.method == 'GET' and status != 304 else b''
+        })
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _availability_stream(self, request, receive, send):
+        """
+        Versión nativa de reservations.availability_stream
+        Cada conexión es una corrutina con su cola: una suscripción inactiva no
+        ocupa hilos ni conexiones a la BD, solo su entrada en availability_events.
+        """
+        config = self.flask_app.config
+        with self.flask_app.app_context():
+            try:
+                keys = parse_subscriptions(request.args.get('subscribe'), config['AVAILABILITY_STREAM_MAX_KEYS'])
+            except ValueError as err:
+                return await self._send(send, request, *self._json(400, {
+                    'success': False,
+                    'message': str(err)
+                }))
+
+            requested_ids = {restaurant_id for restaurant_id, _ in keys}
+            async with self.session_factory() as session:
+                existing_ids = set((await session.execute(
+                    select(Restaurant.id).where(Restaurant.id.in_(requested_ids))
+                )).scalars())
+            if existing_ids != requested_ids:
+                return await self._send(send, request, *self._json(404, {
+                    'success': False,
+                    'message': f'Restaurante no encontrado: {min(requested_ids - existing_ids)}'
+                }))
+
+            loop = asyncio.get_running_loop()
+            changes = asyncio.Queue()
+            # notify se llama desde el hilo que publica el cambio
+            subscription = await asyncio.to_thread(
+                self._subscribe, keys,
+                lambda key, counts: loop.call_soon_threadsafe(changes.put_nowait, (key, counts))
+            )
+            disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+            keepalive = config['AVAILABILITY_STREAM_KEEPALIVE']
+            encode = ndjson_encoder()
+            try:
+                headers = self._cors(request, {
+                    'Content-Type': 'text/event-stream; charset=utf-8',
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'
+                })
+                await send({
+                    'type': 'http.response.start',
+                    'status': 200,
+                    'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+                })
+                initial = f'retry: {keepalive * 1000}\n\n'.encode() + b''.join(
+                    sse_event(key, subscription.counts[key], encode) for key in keys
+                )
+                await send({'type': 'http.response.body', 'body': initial, 'more_body': True})
+
+                while True:
+                    change = asyncio.ensure_future(changes.get())
+                    done, _ = await asyncio.wait(
+                        {change, disconnected}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if change not in done:
+                        change.cancel()
+                    if disconnected in done:
+                        return
+                    body = sse_event(*change.result(), encode) if change in done else SSE_KEEPALIVE
+                    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            finally:
+                disconnected.cancel()
+                availability_events.unsubscribe(subscription)
+
+    def _subscribe(self, keys, notify):
+        """Registra la suscripción en un hilo con su propio contexto (y su propia sesión de Flask-SQLAlchemy)"""
+        with self.flask_app.app_context():
+            return availability_events.subscribe(db, keys, notify)
+
+    @staticmethod
+    def _json(status, payload, headers=None):
+        return status, encode_json(payload), {'Content-Type': 'application/json', **(headers or {})}
+
+    async def _versioned(self, session, request, version_query):
+        """
+        ETag por versión de los datos (como register_conditional_requests)
+        Returns:
+            tuple: (etag o None, respuesta 304 o None)
+        """
+        version = (await session.execute(version_query)).first()
+        if version is None:
+            return None, None
+        etag = make_etag(request.full_path, version)
+        if request.not_modified(etag):
+            return etag, (304, b'', {'ETag': f'"{etag}"'})
+        return etag, None
+
+    async def _get_restaurants(self, session, request):
+        """Async de restaurants.get_restaurants (comparte la caché de respuestas, la query y el cuerpo)"""
+        letter, city, cache_key = restaurants_list_filters(request.args)
+
+        entry = restaurants_cache.get(cache_key)
+        if entry is None:
+            generation = restaurants_cache.generation()
+            rows = (await session.execute(restaurants_list_select(letter, city))).all()
+            with serialization():
+                body = encode_json(restaurants_list(rows))
+            entry = restaurants_cache.set(cache_key, body.decode(), generation)
+
+        headers = {
+            'Content-Type': 'application/json',
+            'ETag': f'"{entry["etag"]}"',
+            'Last-Modified': http_date(entry['last_modified']),
+            'Cache-Control': 'no-cache'
+        }
+        if request.not_modified(entry['etag'], datetime.fromtimestamp(entry['last_modified'], timezone.utc)):
+            return 304, b'', headers
+        return 200, entry['body'].encode(), headers
+
+    async def _get_restaurant(self, session, request, id):
+        """Async de restaurants.get_restaurant"""
+        id = int(id)
+        etag, not_modified = await self._versioned(session, request, restaurant_version_query(id))
+        if not_modified:
+            return not_modified
+
+        restaurant = await session.get(Restaurant, id)
+        if not restaurant:
+            return self._json(404, {
+                'success': False,
+                'message': 'Restaurante no encontrado'
+            })
+
+        return self._json(200, {
+            'success': True,
+            'data': restaurant_schema.dump(restaurant)
+        }, {'ETag': f'"{etag}"'})
+
+    async def _get_reservations(self, session, request):
+        """Async de reservations.get_reservations (solo la respuesta paginada en JSON; misma query y cuerpo)"""
+        if request.args.get('format') == 'ndjson' or request.args.get('include_archived', '').lower() == 'true':
+            return None
+
+        etag, not_modified = await self._versioned(session, request, reservations_version_query())
+        if not_modified:
+            return not_modified
+
+        try:
+            query = reservations_list_query(
+                reservations_source(),
+                request.int_arg('restaurant_id'),
+                request.args.get('date'),
+                request.args.get('cursor')
+            )
+            page_size = reservations_page_size(request.int_arg('limit'), self.flask_app.config)
+        except ValueError as err:
+            return self._json(400, {
+                'success': False,
+                'message': str(err)
+            })
+
+        rows = (await session.execute(query.limit(page_size + 1))).all()
+        with serialization():
+            return self._json(200, reservations_page(rows, page_size), {'ETag': f'"{etag}"'})
+
+    async def _check_availability(self, session, request, restaurant_id, date):
+        """Async de reservations.check_availability (misma query sobre daily_capacity)"""
+        restaurant_id = int(restaurant_id)
+        try:
+            reservation_date = parse_date(date)
+        except ValueError as err:
+            return self._json(400, {
+                'success': False,
+                'message': str(err)
+            })
+
+        restaurant = await session.get(Restaurant, restaurant_id)
+        if not restaurant:
+            return self._json(404, {
+                'success': False,
+                'message': 'Restaurante no encontrado'
+            })
+
+        existing, total = (await session.execute(availability_select(restaurant_id, reservation_date))).one()
+
+        # Límites en memoria; si la caché ha caducado se recarga fuera del event loop
+        if capacity_limits.stale():
+            await session.run_sync(capacity_limits.reload)
+
+        return self._json(200, {
+            'success': True,
+            **availability_summary(existing, total, capacity_limits.limits(restaurant_id, reservation_date, reload=False))
+        })
+
+
+def create_asgi_app(config_class=Config):
+    """
+    Crea la aplicación ASGI sobre la app Flask de create_app
+    (mismo esquema, configuración, extensiones y rutas de escritura)
+    """
+    return AsyncReadApp(create_app(config_class))
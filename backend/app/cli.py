@@ -0,0 +1,147 @@
+import click
+from flask import current_app
+from app.migrations import upgrade
+from app.models import db
+from app.utils.admission import rebuild_counters
+from app.utils.archive import ArchiveConflict, archive_horizon, archive_reservations
+from app.utils.bulk import EXPORT_FORMATS, Progress, export_query, export_rows, import_restaurants, iter_rows, seed
+from app.utils.cache import restaurants_cache
+from app.utils.rollups import rebuild_rollups
+from app.utils.search import restaurant_search
+from app.utils.serializers import reservations_source
+
+
+def _report(message):
+    """Progreso por stderr: stdout puede ser el destino de una exportación"""
+    click.echo(message, err=True)
+
+
+def _format_for(file, fmt):
+    """Formato explícito o deducido de la extensión del fichero (CSV por defecto)"""
+    if fmt:
+        return fmt
+    return 'ndjson' if file.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def _invalidate_restaurant_reads():
+    """
+    Tras cargar restaurantes sin pasar por la API: vacía la caché de listados y
+    descarta el índice de búsqueda. Con RESPONSE_CACHE_BACKEND=redis la caché es la
+    de los workers; con la caché en memoria cada worker ve los restaurantes nuevos
+    al caducar sus entradas (RESPONSE_CACHE_TTL) y en su índice al sincronizarse
+    (SEARCH_REFRESH_INTERVAL).
+    """
+    restaurants_cache.clear()
+    restaurant_search.invalidate()
+
+
+def register_commands(app):
+    """Comandos de `flask` disponibles para la aplicación"""
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Crea las tablas y aplica las migraciones pendientes"""
+        applied = upgrade()
+        if applied:
+            click.echo(f'Migraciones aplicadas: {", ".join(str(version) for version in applied)}')
+        else:
+            click.echo('El esquema ya está actualizado')
+    
+    @app.cli.command('archive-reservations')
+    @click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='Archivar reservas anteriores a esta fecha (por defecto hoy - ARCHIVE_AFTER_DAYS)')
+    @click.option('--batch-size', type=int, help='Reservas por lote (por defecto ARCHIVE_BATCH_SIZE)')
+    @click.option('--max-batches', type=int, help='Número máximo de lotes en esta ejecución')
+    def archive_reservations_command(before, batch_size, max_batches):
+        """Mueve las reservas pasadas a reservations_archive en lotes"""
+        before = before.date() if before else archive_horizon(current_app.config)
+        batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+        click.echo(f'Archivando reservas anteriores a {before.isoformat()} (lotes de {batch_size})')
+        
+        try:
+            moved = archive_reservations(
+                db, before, batch_size=batch_size, max_batches=max_batches,
+                progress=lambda total: click.echo(f'  {total} reservas archivadas')
+            )
+        except ArchiveConflict as err:
+            raise click.ClickException(str(err))
+        click.echo(f'Reservas archivadas: {moved}')
+    
+    @app.cli.command('seed')
+    @click.option('--restaurants', type=int, default=0, help='Restaurantes sintéticos a crear')
+    @click.option('--reservations', type=int, default=0, help='Reservas a crear entre todos los restaurantes')
+    @click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='Primera fecha de las reservas (por defecto hoy)')
+    @click.option('--days', type=click.IntRange(min=1), default=365, help='Días entre los que se reparten las reservas')
+    @click.option('--seed-value', type=int, help='Semilla aleatoria (datos reproducibles)')
+    @click.option('--chunk-size', type=click.IntRange(min=1), default=10_000, help='Filas por INSERT/commit')
+    @click.option('--defer-indexes/--keep-indexes', default=True,
+                  help='Recrear los índices de reservas al final de la carga (bloquea la tabla)')
+    def seed_command(restaurants, reservations, start, days, seed_value, chunk_size, defer_indexes):
+        """Carga datos sintéticos en bloque (entornos de staging y pruebas de carga)"""
+        try:
+            seed(
+                db, restaurants, reservations, start=start.date() if start else None, days=days,
+                seed_value=seed_value, chunk_size=chunk_size, defer_indexes=defer_indexes, report=_report
+            )
+        except ValueError as err:
+            raise click.ClickException(str(err))
+        
+        if restaurants:
+            _invalidate_restaurant_reads()
+        if reservations:
+            rebuild_counters(db)
+            rebuild_rollups(db.session.connection())
+            db.session.commit()
+            _report('Contadores de capacidad y resumen diario reconstruidos')
+    
+    @app.cli.command('export-reservations')
+    @click.argument('output', type=click.File('w', encoding='utf-8', lazy=False), default='-')
+    @click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), help='Por defecto según la extensión (CSV)')
+    @click.option('--restaurant-id', type=int, help='Solo las reservas de este restaurante')
+    @click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), help='Desde esta fecha (incluida)')
+    @click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), help='Hasta esta fecha (incluida)')
+    @click.option('--include-archived', is_flag=True, help='Incluir las reservas archivadas')
+    @click.option('--chunk-size', type=click.IntRange(min=1), default=10_000, help='Filas por lectura del cursor')
+    def export_reservations_command(output, fmt, restaurant_id, date_from, date_to, include_archived, chunk_size):
+        """Exporta reservas a CSV o NDJSON (fichero o - para stdout) en streaming"""
+        fmt = _format_for(output, fmt)
+        source = reservations_source(include_archived)
+        query = export_query(source, fmt)
+        if restaurant_id is not None:
+            query = query.where(source.c.restaurant_id == restaurant_id)
+        if date_from:
+            query = query.where(source.c.reservation_date >= date_from.date())
+        if date_to:
+            query = query.where(source.c.reservation_date <= date_to.date())
+        query = query.order_by(source.c.id)
+        
+        progress = Progress(_report, 'reservas exportadas')
+        export_rows(db, query, output, fmt, chunk_size=chunk_size, progress=progress)
+        output.flush()
+        progress.done()
+    
+    @app.cli.command('import-restaurants')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), help='Por defecto según la extensión (CSV)')
+    @click.option('--chunk-size', type=click.IntRange(min=1), default=10_000, help='Filas por INSERT/commit')
+    def import_restaurants_command(source, fmt, chunk_size):
+        """Importa restaurantes desde CSV o NDJSON (fichero o - para stdin) en bloques"""
+        rejected = []
+        
+        def on_error(index, errors):
+            rejected.append(index)
+            _report(f'  Fila {index} descartada: {errors}')
+        
+        progress = Progress(_report, 'filas leídas')
+        try:
+            inserted = import_restaurants(
+                db, iter_rows(source, _format_for(source, fmt)), chunk_size=chunk_size,
+                progress=progress, on_error=on_error
+            )
+        except ValueError as err:
+            raise click.ClickException(f'Error leyendo el fichero: {err}')
+        finally:
+            # Los bloques anteriores a un error ya están confirmados
+            _invalidate_restaurant_reads()
+        progress.done()
+        _report(f'Restaurantes importados: {inserted}, descartados: {len(rejected)}')
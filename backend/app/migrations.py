@@ -0,0 +1,162 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from app.models import db, DailyOccupancy, Restaurant, Reservation, SchemaMigration
+from app.utils.rollups import rebuild_rollups, refresh_capacity
+
+# Lista ordenada de migraciones: (versión, descripción, función(connection))
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Registra una función como migración de esquema"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def upgrade():
+    """
+    Crea las tablas que falten y aplica las migraciones pendientes en orden
+    db.create_all() solo crea tablas nuevas; los cambios sobre tablas existentes
+    (índices, columnas) se aplican aquí y quedan registrados en schema_migrations.
+
+    Returns:
+        list: versiones aplicadas en esta ejecución
+    """
+    # Solo el primario: las réplicas de lectura también son binds y reciben el esquema por replicación
+    db.create_all(bind_key=None)
+
+    applied = []
+    for version, description, func in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if db.session.get(SchemaMigration, version):
+            continue
+
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            # Serializa migraciones lanzadas a la vez por varios workers
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': 720_001})
+            if db.session.get(SchemaMigration, version):
+                db.session.commit()
+                continue
+
+        func(connection)
+        db.session.add(SchemaMigration(version=version, description=description))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Otro proceso registró la misma migración (las migraciones son idempotentes)
+            db.session.rollback()
+            continue
+        applied.append(version)
+
+    return applied
+
+
+@migration(1, 'Índices compuestos para las consultas de reservas y restaurantes')
+def add_hot_path_indexes(connection):
+    names = ('ix_restaurants_name', 'ix_reservations_restaurant_date', 'ix_reservations_date_created')
+    for table in (Restaurant.__table__, Reservation.__table__):
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=connection, checkfirst=True)
+
+    if connection.dialect.name != 'postgresql':
+        return
+
+    # Prefijo insensible a mayúsculas: lower(name) LIKE 'x%'
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_restaurants_name_lower_prefix '
+        'ON restaurants (lower(name) text_pattern_ops)'
+    ))
+
+    # Búsqueda por subcadena: city ILIKE '%x%' (requiere la extensión pg_trgm)
+    savepoint = connection.begin_nested()
+    try:
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        connection.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_restaurants_city_trgm '
+            'ON restaurants USING gin (city gin_trgm_ops)'
+        ))
+        savepoint.commit()
+    except Exception:
+        # Sin permisos para crear la extensión: la búsqueda por ciudad sigue funcionando sin índice
+        savepoint.rollback()
+
+
+@migration(2, 'Columna updated_at en restaurantes y reservas (versiones para ETags)')
+def add_updated_at(connection):
+    for table in ('restaurants', 'reservations'):
+        columns = {column['name'] for column in inspect(connection).get_columns(table)}
+        if 'updated_at' not in columns:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP'))
+        connection.execute(text(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL'))
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)'))
+
+
+@migration(3, 'Hora, duración y mesa de las reservas (asignación de mesas por horario)')
+def add_reservation_slots(connection):
+    # restaurant_tables ya existe: upgrade() ejecuta create_all() antes de las migraciones
+    new_columns = (
+        ('start_time', 'TIME'),
+        ('duration_minutes', 'INTEGER'),
+        ('table_id', 'INTEGER')
+    )
+    for table in ('reservations', 'reservations_archive'):
+        columns = {column['name'] for column in inspect(connection).get_columns(table)}
+        for name, type_ in new_columns:
+            if name not in columns:
+                if table == 'reservations' and name == 'table_id':
+                    type_ += ' REFERENCES restaurant_tables (id) ON DELETE SET NULL'
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {type_}'))
+
+
+@migration(4, 'Resumen diario de reservas para analítica (daily_occupancy)')
+def backfill_daily_occupancy(connection):
+    # daily_occupancy ya existe (create_all); se rellena con el histórico vivo y archivado
+    # dentro de la transacción de la migración (con el advisory lock en PostgreSQL)
+    rebuild_rollups(connection)
+
+
+@migration(5, 'Ids de reservas sin reutilizar en SQLite (AUTOINCREMENT)')
+def reservations_autoincrement(connection):
+    # PostgreSQL: las secuencias nunca reutilizan ids
+    if connection.dialect.name != 'sqlite':
+        return
+    table_sql = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'reservations'")
+    ).scalar()
+    if 'AUTOINCREMENT' not in table_sql.upper():
+        # SQLite no admite ALTER de la clave primaria: se reconstruye la tabla con sus índices
+        table = Reservation.__table__
+        columns = ', '.join(column['name'] for column in inspect(connection).get_columns('reservations'))
+        connection.execute(text('ALTER TABLE reservations RENAME TO reservations_rebuild'))
+        for index in inspect(connection).get_indexes('reservations_rebuild'):
+            connection.execute(text(f'DROP INDEX IF EXISTS {index["name"]}'))
+        table.create(bind=connection)
+        connection.execute(text(f'INSERT INTO reservations ({columns}) SELECT {columns} FROM reservations_rebuild'))
+        connection.execute(text('DROP TABLE reservations_rebuild'))
+
+    # Los ids nuevos continúan tras el mayor id vivo o archivado
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'reservations'"))
+    connection.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'reservations', max("
+        'coalesce((SELECT max(id) FROM reservations), 0), '
+        'coalesce((SELECT max(id) FROM reservations_archive), 0))'
+    ))
+
+
+@migration(6, 'Capacidad guardada en daily_occupancy (ocupación histórica estable)')
+def add_daily_occupancy_capacity(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('daily_occupancy')}
+    if 'capacity' not in columns:
+        connection.execute(text('ALTER TABLE daily_occupancy ADD COLUMN capacity INTEGER NOT NULL DEFAULT 0'))
+        # No hay registro de los límites pasados: se parte de los actuales
+        refresh_capacity(connection)
+
+    # El índice por fecha incluye la capacidad para seguir siendo cubriente
+    index = next(index for index in DailyOccupancy.__table__.indexes if index.name == 'ix_daily_occupancy_date')
+    existing = {item['name']: item['column_names'] for item in inspect(connection).get_indexes('daily_occupancy')}
+    if existing.get(index.name) != [column.name for column in index.columns]:
+        connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+        index.create(bind=connection)
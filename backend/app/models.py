@@ -1,11 +1,22 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from app.utils.replicas import RoutingSession
 
-db = SQLAlchemy()
+# La sesión enruta las lecturas de las peticiones GET a las réplicas (si hay)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# restaurant_id reservado para los totales del día (contadores y límites)
+ALL_RESTAURANTS = 0
 
 class Restaurant(db.Model):
     """Modelo de Restaurante"""
     __tablename__ = 'restaurants'
+    __table_args__ = (
+        # Listado ordenado alfabéticamente
+        db.Index('ix_restaurants_name', 'name'),
+        # Versión de la colección para ETags: max(updated_at)
+        db.Index('ix_restaurants_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -14,17 +25,50 @@ class Restaurant(db.Model):
     city = db.Column(db.String(100), nullable=False)
     photo_url = db.Column(db.String(500), nullable=True, default='https://images.unsplash.com/photo-1517248135467-4c7edcad34c4')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relación con reservas (1TM)
     reservations = db.relationship('Reservation', backref='restaurant', lazy=True, cascade='all, delete-orphan')
+    # Inventario de mesas (1TM): si tiene mesas, las reservas se asignan por horario
+    tables = db.relationship('RestaurantTable', backref='restaurant', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Restaurant {self.name}>'
 
 
+class RestaurantTable(db.Model):
+    """Mesa de un restaurante con su número de plazas (ver app/utils/allocation.py)"""
+    __tablename__ = 'restaurant_tables'
+    __table_args__ = (
+        db.UniqueConstraint('restaurant_id', 'name', name='uq_restaurant_tables_name'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id'), nullable=False)
+    name = db.Column(db.String(20), nullable=False)
+    seats = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Reservas asignadas a la mesa (al borrarla quedan sin mesa)
+    reservations = db.relationship('Reservation', backref='table', lazy=True, passive_deletes=True)
+    
+    def __repr__(self):
+        return f'<RestaurantTable {self.name} ({self.seats})>'
+
+
 class Reservation(db.Model):
     """Modelo de Reserva"""
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # Validaciones y filtros por restaurante + fecha
+        db.Index('ix_reservations_restaurant_date', 'restaurant_id', 'reservation_date'),
+        # Filtros por fecha y listado paginado (reservation_date, created_at, id)
+        db.Index('ix_reservations_date_created', 'reservation_date', 'created_at', 'id'),
+        # Versión de la colección para ETags: max(updated_at)
+        db.Index('ix_reservations_updated_at', 'updated_at'),
+        # SQLite no reutiliza ids de reservas borradas o archivadas (reservations_archive conserva los ids)
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id'), nullable=False)
@@ -33,7 +77,145 @@ class Reservation(db.Model):
     customer_phone = db.Column(db.String(20), nullable=True)
     reservation_date = db.Column(db.Date, nullable=False)
     number_of_people = db.Column(db.Integer, nullable=False, default=1)
+    # Hora de llegada, duración y mesa asignada (solo en restaurantes con mesas)
+    start_time = db.Column(db.Time, nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=True)
+    table_id = db.Column(db.Integer, db.ForeignKey('restaurant_tables.id', ondelete='SET NULL'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Reservation {self.customer_name} - {self.reservation_date}>'
+
+class DailyCapacity(db.Model):
+    """
+    Contadores de reservas confirmadas por restaurante y fecha
+    La fila con restaurant_id = 0 acumula el total del día (todos los restaurantes)
+    """
+    __tablename__ = 'daily_capacity'
+    
+    restaurant_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    reservation_date = db.Column(db.Date, primary_key=True)
+    reserved = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyCapacity {self.restaurant_id} - {self.reservation_date}: {self.reserved}>'
+
+
+class CapacityLimit(db.Model):
+    """
+    Límite de reservas por día de un restaurante (ver app/utils/limits.py)
+    La fila con restaurant_id = 0 es el límite del total del día (todos los
+    restaurantes). Sin fila se aplican MAX_TABLES_PER_RESTAURANT / MAX_RESERVATIONS_PER_DAY.
+    """
+    __tablename__ = 'capacity_limits'
+    
+    restaurant_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    max_reservations = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CapacityLimit {self.restaurant_id}: {self.max_reservations}>'
+
+
+class CapacityLimitOverride(db.Model):
+    """Límite para una fecha concreta (festivos, eventos): prevalece sobre capacity_limits"""
+    __tablename__ = 'capacity_limit_overrides'
+    
+    restaurant_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    limit_date = db.Column(db.Date, primary_key=True)
+    max_reservations = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CapacityLimitOverride {self.restaurant_id} - {self.limit_date}: {self.max_reservations}>'
+
+
+class DailyOccupancy(db.Model):
+    """
+    Resumen diario de reservas por restaurante para analítica (ver app/utils/rollups.py)
+    Se mantiene en la misma transacción que cada alta, modificación o baja y no
+    se archiva: cubre también el histórico de reservations_archive. La fila con
+    restaurant_id = 0 acumula el total del día. Las columnas lead_* cuentan
+    reservas por antelación (días entre created_at y la fecha de la reserva).
+    capacity guarda el límite del día al escribir el resumen y deja de cambiar
+    cuando la fecha ha pasado: la ocupación histórica no depende de los límites actuales.
+    """
+    __tablename__ = 'daily_occupancy'
+    __table_args__ = (
+        # Totales por restaurante de un rango de fechas sin leer la tabla (índice cubriente);
+        # la PK cubre la serie diaria de un restaurante o del total del día
+        db.Index('ix_daily_occupancy_date', 'reservation_date', 'restaurant_id', 'reservations', 'covers', 'lead_days', 'capacity'),
+    )
+    
+    restaurant_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    reservation_date = db.Column(db.Date, primary_key=True)
+    reservations = db.Column(db.Integer, nullable=False, default=0)
+    covers = db.Column(db.Integer, nullable=False, default=0)
+    lead_days = db.Column(db.Integer, nullable=False, default=0)
+    lead_same_day = db.Column(db.Integer, nullable=False, default=0)
+    lead_1_day = db.Column(db.Integer, nullable=False, default=0)
+    lead_2_7_days = db.Column(db.Integer, nullable=False, default=0)
+    lead_8_30_days = db.Column(db.Integer, nullable=False, default=0)
+    lead_over_30_days = db.Column(db.Integer, nullable=False, default=0)
+    capacity = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyOccupancy {self.restaurant_id} - {self.reservation_date}: {self.reservations}>'
+
+
+class ArchivedReservation(db.Model):
+    """
+    Reservas pasadas movidas fuera de la tabla caliente (ver app/utils/archive.py)
+    Mismas columnas e ids que Reservation, sin clave foránea: es histórico de solo lectura
+    """
+    __tablename__ = 'reservations_archive'
+    __table_args__ = (
+        db.Index('ix_reservations_archive_restaurant_date', 'restaurant_id', 'reservation_date'),
+        db.Index('ix_reservations_archive_date_created', 'reservation_date', 'created_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    restaurant_id = db.Column(db.Integer, nullable=False)
+    customer_name = db.Column(db.String(100), nullable=False)
+    customer_email = db.Column(db.String(100), nullable=True)
+    customer_phone = db.Column(db.String(20), nullable=True)
+    reservation_date = db.Column(db.Date, nullable=False)
+    number_of_people = db.Column(db.Integer, nullable=False, default=1)
+    start_time = db.Column(db.Time, nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=True)
+    table_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivedReservation {self.customer_name} - {self.reservation_date}>'
+
+
+
+class DataVersion(db.Model):
+    """
+    Contador de versión por tabla (ETags de las colecciones, ver app/utils/conditional.py)
+    Se incrementa en la misma transacción que cualquier escritura sobre la tabla.
+    Las reservas tienen una fila por restaurante ('reservations:<id>') que no se borra.
+    """
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name} {self.version}>'
+
+
+class SchemaMigration(db.Model):
+    """Migraciones de esquema aplicadas (ver app/migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Reservation {self.customer_name} - {self.reservation_date}>'
\ No newline at end of file
+        return f'<SchemaMigration {self.version}>'
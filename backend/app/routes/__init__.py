@@ -1,7 +1,11 @@
 from app.routes.restaurants import restaurants_bp
 from app.routes.reservations import reservations_bp
+from app.routes.limits import limits_bp
+from app.routes.analytics import analytics_bp
 
 def register_routes(app):
     """Blueprints register list"""
     app.register_blueprint(restaurants_bp)
-    app.register_blueprint(reservations_bp)
\ No newline at end of file
+    app.register_blueprint(reservations_bp)
+    app.register_blueprint(limits_bp)
+    app.register_blueprint(analytics_bp)
\ No newline at end of file
@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+from flask import Blueprint, current_app, request, jsonify
+from app.models import db, Restaurant
+from app.utils.analytics import occupancy_report
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+
+@analytics_bp.route('/occupancy', methods=['GET'])
+def get_occupancy():
+    """
+    Ocupación por día y por restaurante, cubiertos y antelación de las reservas
+    Se sirve del resumen diario (daily_occupancy), sin recorrer la tabla de reservas.
+    Query params opcionales:
+        - from: Fecha inicial YYYY-MM-DD (por defecto hoy - 29 días)
+        - to: Fecha final YYYY-MM-DD (por defecto hoy)
+        - restaurant_id: Solo ese restaurante
+        - limit: Restaurantes de la lista, de mayor a menor ocupación (por defecto ANALYTICS_DEFAULT_LIMIT)
+    El rango está limitado a ANALYTICS_MAX_DAYS días
+    """
+    try:
+        date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else date.today()
+        date_from = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args else date_to - timedelta(days=29)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+        }), 400
+    
+    max_days = current_app.config['ANALYTICS_MAX_DAYS']
+    if date_to < date_from or (date_to - date_from).days + 1 > max_days:
+        return jsonify({
+            'success': False,
+            'message': f'El rango debe ser válido y de como máximo {max_days} días'
+        }), 400
+    
+    limit = request.args.get('limit', current_app.config['ANALYTICS_DEFAULT_LIMIT'], type=int)
+    if limit is None or not 1 <= limit <= current_app.config['ANALYTICS_MAX_LIMIT']:
+        return jsonify({
+            'success': False,
+            'message': f'limit debe estar entre 1 y {current_app.config["ANALYTICS_MAX_LIMIT"]}'
+        }), 400
+    
+    restaurant_id = request.args.get('restaurant_id', type=int)
+    if restaurant_id is not None and not Restaurant.query.get(restaurant_id):
+        return jsonify({
+            'success': False,
+            'message': 'Restaurante no encontrado'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'restaurant_id': restaurant_id,
+        **occupancy_report(db, date_from, date_to, restaurant_id, limit)
+    }), 200
@@ -0,0 +1,188 @@
+from datetime import date, datetime
+from flask import Blueprint, current_app, request, jsonify
+from app.models import db, ALL_RESTAURANTS, Restaurant, CapacityLimit, CapacityLimitOverride, DailyOccupancy
+from app.schemas import limit_schema
+from app.utils.idempotency import idempotent
+from app.utils.limits import capacity_limits
+from app.utils.rollups import refresh_capacity
+from marshmallow import ValidationError
+
+limits_bp = Blueprint('limits', __name__, url_prefix='/api/limits')
+
+
+@limits_bp.route('', methods=['GET'])
+def get_limits():
+    """
+    Listar los límites de reservas por día
+    restaurant_id = 0 es el límite del total del día (todos los restaurantes).
+    Los límites por fecha solo se listan desde hoy.
+    """
+    limits = CapacityLimit.query.order_by(CapacityLimit.restaurant_id).all()
+    overrides = CapacityLimitOverride.query.filter(
+        CapacityLimitOverride.limit_date >= date.today()
+    ).order_by(CapacityLimitOverride.limit_date, CapacityLimitOverride.restaurant_id).all()
+    
+    return jsonify({
+        'success': True,
+        'defaults': {
+            'restaurant': current_app.config['MAX_TABLES_PER_RESTAURANT'],
+            'daily': current_app.config['MAX_RESERVATIONS_PER_DAY']
+        },
+        'limits': [
+            {'restaurant_id': limit.restaurant_id, 'max_reservations': limit.max_reservations}
+            for limit in limits
+        ],
+        'overrides': [
+            {
+                'restaurant_id': override.restaurant_id,
+                'date': override.limit_date.isoformat(),
+                'max_reservations': override.max_reservations
+            }
+            for override in overrides
+        ]
+    }), 200
+
+
+def _load_limit(restaurant_id):
+    """
+    Valida el restaurante (0 = total del día) y el cuerpo de la petición
+    Returns:
+        tuple: (max_reservations, None) o (None, respuesta de error)
+    """
+    if restaurant_id != ALL_RESTAURANTS and not Restaurant.query.get(restaurant_id):
+        return None, (jsonify({
+            'success': False,
+            'message': 'Restaurante no encontrado'
+        }), 404)
+    
+    try:
+        data = limit_schema.load(request.json)
+    except ValidationError as err:
+        return None, (jsonify({
+            'success': False,
+            'message': 'Datos inválidos',
+            'errors': err.messages
+        }), 400)
+    
+    return data['max_reservations'], None
+
+
+def _refresh_capacity(restaurant_id, limit_date=None):
+    """
+    Lleva el límite nuevo a la capacidad de daily_occupancy en las fechas que no han
+    pasado (las pasadas conservan la de su día); se confirma con el cambio de límite
+    """
+    conditions = [DailyOccupancy.restaurant_id == restaurant_id, DailyOccupancy.reservation_date >= date.today()]
+    if limit_date is not None:
+        conditions.append(DailyOccupancy.reservation_date == limit_date)
+    db.session.flush()
+    refresh_capacity(db.session.connection(), *conditions)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+@limits_bp.route('/<int:restaurant_id>', methods=['PUT'])
+@idempotent
+def set_restaurant_limit(restaurant_id):
+    """Fijar el límite de reservas por día de un restaurante (0 = total del día)"""
+    max_reservations, error = _load_limit(restaurant_id)
+    if error:
+        return error
+    
+    limit = db.session.get(CapacityLimit, restaurant_id)
+    if limit is None:
+        limit = CapacityLimit(restaurant_id=restaurant_id)
+        db.session.add(limit)
+    limit.max_reservations = max_reservations
+    _refresh_capacity(restaurant_id)
+    db.session.commit()
+    capacity_limits.invalidate()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Límite actualizado exitosamente',
+        'data': {'restaurant_id': restaurant_id, 'max_reservations': max_reservations}
+    }), 200
+
+
+@limits_bp.route('/<int:restaurant_id>', methods=['DELETE'])
+@idempotent
+def delete_restaurant_limit(restaurant_id):
+    """Volver al límite por defecto (MAX_TABLES_PER_RESTAURANT / MAX_RESERVATIONS_PER_DAY)"""
+    limit = db.session.get(CapacityLimit, restaurant_id)
+    
+    if not limit:
+        return jsonify({
+            'success': False,
+            'message': 'Límite no encontrado'
+        }), 404
+    
+    db.session.delete(limit)
+    _refresh_capacity(restaurant_id)
+    db.session.commit()
+    capacity_limits.invalidate()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Límite eliminado: se aplica el límite por defecto'
+    }), 200
+
+
+@limits_bp.route('/<int:restaurant_id>/<limit_date>', methods=['PUT'])
+@idempotent
+def set_date_limit(restaurant_id, limit_date):
+    """Fijar el límite de un restaurante (0 = total del día) para una fecha concreta"""
+    limit_date = _parse_date(limit_date)
+    if limit_date is None:
+        return jsonify({
+            'success': False,
+            'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+        }), 400
+    
+    max_reservations, error = _load_limit(restaurant_id)
+    if error:
+        return error
+    
+    override = db.session.get(CapacityLimitOverride, (restaurant_id, limit_date))
+    if override is None:
+        override = CapacityLimitOverride(restaurant_id=restaurant_id, limit_date=limit_date)
+        db.session.add(override)
+    override.max_reservations = max_reservations
+    _refresh_capacity(restaurant_id, limit_date)
+    db.session.commit()
+    capacity_limits.invalidate()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Límite de la fecha actualizado exitosamente',
+        'data': {'restaurant_id': restaurant_id, 'date': limit_date.isoformat(), 'max_reservations': max_reservations}
+    }), 200
+
+
+@limits_bp.route('/<int:restaurant_id>/<limit_date>', methods=['DELETE'])
+@idempotent
+def delete_date_limit(restaurant_id, limit_date):
+    """Eliminar el límite de una fecha (vuelve a aplicarse el del restaurante)"""
+    limit_date = _parse_date(limit_date)
+    override = db.session.get(CapacityLimitOverride, (restaurant_id, limit_date)) if limit_date else None
+    
+    if not override:
+        return jsonify({
+            'success': False,
+            'message': 'Límite no encontrado'
+        }), 404
+    
+    db.session.delete(override)
+    _refresh_capacity(restaurant_id, limit_date)
+    db.session.commit()
+    capacity_limits.invalidate()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Límite de la fecha eliminado exitosamente'
+    }), 200
@@ -1,55 +1,102 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
 from app.models import db, Reservation, Restaurant
 from app.schemas import reservation_schema, reservations_schema
-from app.utils.validators import validate_restaurant_availability, validate_daily_reservation_limit
+from app.utils.validators import availability_summary, availability_calendar
+from app.utils.admission import admit_reservation, admit_batch, lock_batch, release_reservation, availability_counts
+from app.utils.allocation import allocate, allocate_batch, available_slots, effective_duration
+from app.utils.bulk import chunked, iter_rows
+from app.utils.events import availability_events, parse_subscriptions, sse_event, SSE_KEEPALIVE
+from app.utils.idempotency import idempotent
+from app.utils.limits import capacity_limits
+from app.utils.conditional import etag_version, reservations_version, reservation_version
+from app.utils.replicas import use_primary
+from app.utils.rollups import record_rollups
+from app.utils.metrics import serialization
+from app.utils.reads import parse_date, reservations_list_query, reservations_page, reservations_page_size
+from app.utils.serializers import reservations_source, reservations_select, reservation_row_to_dict, encode_json, ndjson_encoder
 from marshmallow import ValidationError
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import io
+import queue
 
 reservations_bp = Blueprint('reservations', __name__, url_prefix='/api/reservations')
 
 
 @reservations_bp.route('', methods=['GET'])
+@etag_version(reservations_version)
 def get_reservations():
     """
-    Listar todas las reservas
+    Listar reservas con paginación por cursor (keyset)
+    Orden: reservation_date, created_at, id descendentes (más recientes primero)
     Query params opcionales:
         - restaurant_id: Filtrar por restaurante
         - date: Filtrar por fecha (formato: YYYY-MM-DD)
+        - limit: Tamaño de página (por defecto RESERVATIONS_PAGE_SIZE)
+        - cursor: Valor de next_cursor de la página anterior
+        - format: 'ndjson' para recibir las reservas en streaming, una por línea
+        - include_archived: 'true' para incluir las reservas pasadas ya archivadas
     """
     restaurant_id = request.args.get('restaurant_id', type=int)
     date_str = request.args.get('date')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    stream = request.args.get('format') == 'ndjson'
+    include_archived = request.args.get('include_archived', '').lower() == 'true'
     
-    # Query base
-    query = Reservation.query
-    
-    # Aplicar filtros
-    if restaurant_id:
-        query = query.filter(Reservation.restaurant_id == restaurant_id)
+    # Por defecto solo la tabla caliente; el histórico archivado solo si se pide
+    # (misma query que el handler asíncrono de app/asgi.py)
+    try:
+        query = reservations_list_query(reservations_source(include_archived), restaurant_id, date_str, cursor)
+        page_size = reservations_page_size(limit, current_app.config)
+    except ValueError as err:
+        return jsonify({
+            'success': False,
+            'message': str(err)
+        }), 400
     
-    if date_str:
-        try:
-            filter_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            query = query.filter(Reservation.reservation_date == filter_date)
-        except ValueError:
-            return jsonify({
-                'success': False,
-                'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
-            }), 400
+    # Streaming NDJSON: filas desde un cursor de servidor, memoria constante
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        encode = ndjson_encoder()
+        yield_per = current_app.config['RESERVATIONS_MAX_PAGE_SIZE']
+        
+        def generate():
+            for row in db.session.execute(query.execution_options(yield_per=yield_per)):
+                with serialization():
+                    line = encode(reservation_row_to_dict(row))
+                yield line
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
     
-    # Ordenar por fecha descendente (más recientes primero)
-    reservations = query.order_by(Reservation.reservation_date.desc(), Reservation.created_at.desc()).all()
+    # Se pide una fila extra para saber si hay página siguiente
+    rows = db.session.execute(query.limit(page_size + 1)).all()
     
-    return jsonify({
-        'success': True,
-        'data': reservations_schema.dump(reservations),
-        'count': len(reservations)
-    }), 200
+    # Serialización directa de tuplas a bytes JSON (mismo resultado que reservations_schema + jsonify)
+    with serialization():
+        body = encode_json(reservations_page(rows, page_size))
+    return current_app.response_class(body, status=200, mimetype='application/json')
 
 
 @reservations_bp.route('/<int:id>', methods=['GET'])
+@etag_version(reservation_version)
 def get_reservation(id):
-    """Obtener una reserva por ID"""
-    reservation = Reservation.query.get(id)
+    """
+    Obtener una reserva por ID
+    Query param opcional include_archived=true: busca también en el histórico archivado
+    """
+    reservation = Reservation.query.options(joinedload(Reservation.restaurant)).get(id)
+    
+    if not reservation and request.args.get('include_archived', '').lower() == 'true':
+        source = reservations_source(include_archived=True)
+        row = db.session.execute(reservations_select(source).where(source.c.id == id)).first()
+        if row:
+            return jsonify({
+                'success': True,
+                'data': reservation_row_to_dict(row)
+            }), 200
     
     if not reservation:
         return jsonify({
@@ -64,13 +111,16 @@ def get_reservation(id):
 
 
 @reservations_bp.route('', methods=['POST'])
+@idempotent
 def create_reservation():
     """
     Crear una nueva reserva
     Validaciones:
-        - Máximo 15 reservas por restaurante por día
-        - Máximo 20 reservas totales por día
+        - Máximo de reservas por restaurante y día (15 por defecto, configurable en /api/limits)
+        - Máximo de reservas totales por día (20 por defecto)
         - Fecha no puede ser en el pasado
+        - En restaurantes con mesas: start_time obligatoria y una mesa libre
+          con plazas suficientes durante duration_minutes
     """
     try:
         # Validar estructura de datos
@@ -90,8 +140,8 @@ def create_reservation():
             'message': 'Restaurante no encontrado'
         }), 404
     
-    # VALIDACIÓN 1: Verificar disponibilidad del restaurante (máx 15 mesas)
-    is_valid, message, available = validate_restaurant_availability(
+    # VALIDACIÓN: Admisión atómica contra los contadores y los límites guardados en la BD
+    is_valid, message, available, total = admit_reservation(
         db, 
         data['restaurant_id'], 
         data['reservation_date']
@@ -101,44 +151,215 @@ def create_reservation():
         return jsonify({
             'success': False,
             'message': message,
-            'available_tables': available
+            'available_tables': available,
+            'total_reservations': total
         }), 400
     
-    # VALIDACIÓN 2: Verificar límite diario total (máx 20 reservas)
-    is_valid, message, total = validate_daily_reservation_limit(
-        db, 
-        data['reservation_date']
+    # Mesa por horario (restaurantes con inventario de mesas; bloqueo ya tomado por la admisión)
+    is_valid, message, table_id = allocate(
+        db,
+        data['restaurant_id'],
+        data['reservation_date'],
+        data['number_of_people'],
+        data.get('start_time'),
+        data.get('duration_minutes')
     )
     
     if not is_valid:
+        db.session.rollback()
         return jsonify({
             'success': False,
-            'message': message,
-            'total_reservations': total
+            'message': message
         }), 400
     
-    # Crear la reserva
+    # Crear la reserva (misma transacción que el incremento de los contadores)
     new_reservation = Reservation(
         restaurant_id=data['restaurant_id'],
         customer_name=data['customer_name'],
         customer_email=data.get('customer_email'),
         customer_phone=data.get('customer_phone'),
         reservation_date=data['reservation_date'],
-        number_of_people=data['number_of_people']
+        number_of_people=data['number_of_people'],
+        start_time=data.get('start_time'),
+        duration_minutes=effective_duration(data.get('start_time'), data.get('duration_minutes')),
+        table_id=table_id
     )
     
     db.session.add(new_reservation)
+    record_rollups(db, [(data['restaurant_id'], data['reservation_date'], data['number_of_people'], None, 1)])
+    changes = availability_events.collect(db, [(data['restaurant_id'], data['reservation_date'])])
     db.session.commit()
+    availability_events.publish(changes)
     
     return jsonify({
         'success': True,
         'message': 'Reserva creada exitosamente',
         'data': reservation_schema.dump(new_reservation),
-        'available_tables_remaining': available - 1
+        'available_tables_remaining': available
     }), 201
 
 
+@reservations_bp.route('/bulk', methods=['POST'])
+@idempotent
+def bulk_create_reservations():
+    """
+    Importar reservas en lote
+    Formatos de entrada (según Content-Type):
+        - application/json: lista de reservas o {"reservations": [...]} (máx BULK_MAX_ROWS)
+        - application/x-ndjson: una reserva JSON por línea (streaming)
+        - text/csv: cabecera con los campos de la reserva (streaming)
+    Cada bloque de BULK_CHUNK_SIZE filas se valida de una vez y se inserta en
+    una única transacción. Devuelve el resultado fila a fila.
+    """
+    chunk_size = current_app.config['BULK_CHUNK_SIZE']
+    
+    if request.mimetype in ('application/x-ndjson', 'text/csv'):
+        chunks = chunked(_iter_upload_rows(request.mimetype), chunk_size)
+    else:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('reservations')
+        
+        if not isinstance(payload, list):
+            return jsonify({
+                'success': False,
+                'message': 'Se esperaba una lista de reservas'
+            }), 400
+        
+        if len(payload) > current_app.config['BULK_MAX_ROWS']:
+            return jsonify({
+                'success': False,
+                'message': f'Máximo {current_app.config["BULK_MAX_ROWS"]} reservas por petición; use NDJSON o CSV para lotes mayores'
+            }), 413
+        
+        chunks = chunked(iter(payload), chunk_size)
+    
+    results = []
+    try:
+        for chunk in chunks:
+            results.extend(_import_chunk(chunk, offset=len(results)))
+    except ValueError as err:
+        return jsonify({
+            'success': False,
+            'message': f'Error leyendo la fila {len(results)}: {err}',
+            'results': results
+        }), 400
+    
+    accepted = sum(1 for result in results if result['success'])
+    
+    return jsonify({
+        'success': True,
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results
+    }), 200
+
+
+def _iter_upload_rows(mimetype):
+    """Lee el cuerpo de la petición línea a línea sin cargarlo entero en memoria"""
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8')
+    return iter_rows(lines, 'csv' if mimetype == 'text/csv' else 'ndjson')
+
+
+def _import_chunk(items, offset):
+    """
+    Valida e inserta un bloque de reservas en una única transacción
+    Returns:
+        list: resultado por fila ({'index', 'success', 'id' | 'message', 'errors'})
+    """
+    results = [{'index': offset + i, 'success': False} for i in range(len(items))]
+    
+    # Validación del bloque completo con el schema many=True
+    try:
+        loaded = reservations_schema.load(items)
+        errors = {}
+    except ValidationError as err:
+        loaded = err.valid_data if isinstance(err.valid_data, list) else [{} for _ in items]
+        errors = err.messages if isinstance(err.messages, dict) else {}
+    
+    candidates = []
+    for i, data in enumerate(loaded):
+        if i in errors or not isinstance(data, dict):
+            results[i].update(message='Datos inválidos', errors=errors.get(i, {}))
+        else:
+            candidates.append((i, data))
+    
+    # Restaurantes existentes en una sola query
+    requested_ids = {data['restaurant_id'] for _, data in candidates}
+    existing_ids = {
+        restaurant_id for (restaurant_id,) in
+        db.session.query(Restaurant.id).filter(Restaurant.id.in_(requested_ids))
+    } if requested_ids else set()
+    
+    found = []
+    for i, data in candidates:
+        if data['restaurant_id'] in existing_ids:
+            found.append((i, data))
+        else:
+            results[i]['message'] = 'Restaurante no encontrado'
+    
+    # Contadores del bloque bloqueados antes que las agendas de mesas, en el mismo
+    # orden (fecha, restaurante; total del día primero) que una alta individual
+    counters = lock_batch(db, [(data['restaurant_id'], data['reservation_date']) for _, data in found])
+    
+    # Mesas por horario en los restaurantes con inventario de mesas
+    allocations = allocate_batch(db, [
+        (data['restaurant_id'], data['reservation_date'], data['number_of_people'],
+         data.get('start_time'), data.get('duration_minutes'), None)
+        for _, data in found
+    ])
+    
+    valid = []
+    for (i, data), (is_valid, message, table_id) in zip(found, allocations):
+        if is_valid:
+            valid.append((i, data, table_id))
+        else:
+            results[i]['message'] = message
+    
+    # Capacidad por (restaurante, fecha) del bloque entero
+    admissions = admit_batch(db, [(data['restaurant_id'], data['reservation_date']) for _, data, _ in valid], counters)
+    
+    accepted = []
+    for (i, data, table_id), (is_valid, message) in zip(valid, admissions):
+        if is_valid:
+            accepted.append((i, data, table_id))
+        else:
+            results[i]['message'] = message
+    
+    if accepted:
+        # Un único INSERT executemany para todas las filas aceptadas
+        new_ids = db.session.scalars(
+            insert(Reservation).returning(Reservation.id, sort_by_parameter_order=True),
+            [{
+                'restaurant_id': data['restaurant_id'],
+                'customer_name': data['customer_name'],
+                'customer_email': data.get('customer_email'),
+                'customer_phone': data.get('customer_phone'),
+                'reservation_date': data['reservation_date'],
+                'number_of_people': data['number_of_people'],
+                'start_time': data.get('start_time'),
+                'duration_minutes': effective_duration(data.get('start_time'), data.get('duration_minutes')),
+                'table_id': table_id
+            } for _, data, table_id in accepted]
+        ).all()
+        
+        for (i, _, _), new_id in zip(accepted, new_ids):
+            results[i].update(success=True, id=new_id)
+        
+        record_rollups(db, [
+            (data['restaurant_id'], data['reservation_date'], data['number_of_people'], None, 1)
+            for _, data, _ in accepted
+        ])
+    
+    changes = availability_events.collect(db, {(data['restaurant_id'], data['reservation_date']) for _, data, _ in accepted})
+    db.session.commit()
+    availability_events.publish(changes)
+    
+    return results
+
+
 @reservations_bp.route('/<int:id>', methods=['PUT'])
+@idempotent
 def update_reservation(id):
     """Actualizar una reserva existente"""
     reservation = Reservation.query.get(id)
@@ -161,14 +382,17 @@ def update_reservation(id):
     # Si se cambia de restaurante o fecha, validar nuevamente
     new_restaurant_id = data.get('restaurant_id', reservation.restaurant_id)
     new_date = data.get('reservation_date', reservation.reservation_date)
+    old_key = (reservation.restaurant_id, reservation.reservation_date)
+    old_rollup = (*old_key, reservation.number_of_people, reservation.created_at, -1)
+    slot_changed = (new_restaurant_id, new_date) != old_key
     
-    # Solo validar si cambió restaurante o fecha
-    if new_restaurant_id != reservation.restaurant_id or new_date != reservation.reservation_date:
-        # Validar disponibilidad del restaurante
-        is_valid, message, available = validate_restaurant_availability(
+    # Solo validar si cambió restaurante o fecha: mueve la plaza de forma atómica
+    if slot_changed:
+        is_valid, message, available, total = admit_reservation(
             db, 
             new_restaurant_id, 
-            new_date
+            new_date, 
+            release=old_key
         )
         
         if not is_valid:
@@ -176,15 +400,31 @@ def update_reservation(id):
                 'success': False,
                 'message': message
             }), 400
-        
-        # Validar límite diario total
-        is_valid, message, total = validate_daily_reservation_limit(db, new_date)
+    
+    # Reasignar mesa si cambia cualquier dato del que depende (la propia reserva no cuenta)
+    new_start_time = data.get('start_time', reservation.start_time)
+    new_duration = data.get('duration_minutes', reservation.duration_minutes)
+    if slot_changed or data.keys() & {'start_time', 'duration_minutes', 'number_of_people'}:
+        is_valid, message, table_id = allocate(
+            db,
+            new_restaurant_id,
+            new_date,
+            data.get('number_of_people', reservation.number_of_people),
+            new_start_time,
+            new_duration,
+            exclude_id=reservation.id
+        )
         
         if not is_valid:
+            db.session.rollback()
             return jsonify({
                 'success': False,
                 'message': message
             }), 400
+        
+        reservation.table_id = table_id
+        reservation.start_time = new_start_time
+        reservation.duration_minutes = effective_duration(new_start_time, new_duration)
     
     # Actualizar campos
     if 'restaurant_id' in data:
@@ -200,8 +440,18 @@ def update_reservation(id):
     if 'number_of_people' in data:
         reservation.number_of_people = data['number_of_people']
     
+    if slot_changed or reservation.number_of_people != old_rollup[2]:
+        record_rollups(db, [old_rollup, (
+            reservation.restaurant_id, reservation.reservation_date,
+            reservation.number_of_people, reservation.created_at, 1
+        )])
+    
+    changes = availability_events.collect(db, [old_key, (new_restaurant_id, new_date)]) if slot_changed else []
     db.session.commit()
     
+    if slot_changed:
+        availability_events.publish(changes)
+    
     return jsonify({
         'success': True,
         'message': 'Reserva actualizada exitosamente',
@@ -210,6 +460,7 @@ def update_reservation(id):
 
 
 @reservations_bp.route('/<int:id>', methods=['DELETE'])
+@idempotent
 def delete_reservation(id):
     """Cancelar/eliminar una reserva"""
     reservation = Reservation.query.get(id)
@@ -221,9 +472,14 @@ def delete_reservation(id):
         }), 404
     
     customer_name = reservation.customer_name
+    key = (reservation.restaurant_id, reservation.reservation_date)
     
+    release_reservation(db, *key)
+    record_rollups(db, [(*key, reservation.number_of_people, reservation.created_at, -1)])
     db.session.delete(reservation)
+    changes = availability_events.collect(db, [key])
     db.session.commit()
+    availability_events.publish(changes)
     
     return jsonify({
         'success': True,
@@ -231,7 +487,116 @@ def delete_reservation(id):
     }), 200
 
 
+@reservations_bp.route('/availability/stream', methods=['GET'])
+@use_primary
+def availability_stream():
+    """
+    Stream SSE con los cambios de disponibilidad (alternativa al polling de check_availability)
+    Query params:
+        - subscribe: pares restaurant_id:YYYY-MM-DD separados por comas
+          (máx AVAILABILITY_STREAM_MAX_KEYS)
+    Envía un evento 'availability' por par al conectar y otro cada vez que una
+    alta, modificación o cancelación cambia sus contadores. Los contadores
+    iniciales se leen del primario, como check_availability. Con gunicorn cada
+    conexión ocupa un hilo; para miles de conexiones usar el modo ASGI.
+    """
+    try:
+        keys = parse_subscriptions(request.args.get('subscribe'), current_app.config['AVAILABILITY_STREAM_MAX_KEYS'])
+    except ValueError as err:
+        return jsonify({
+            'success': False,
+            'message': str(err)
+        }), 400
+    
+    # Verificar que los restaurantes existen (una sola query)
+    requested_ids = {restaurant_id for restaurant_id, _ in keys}
+    existing_ids = {
+        restaurant_id for (restaurant_id,) in
+        db.session.query(Restaurant.id).filter(Restaurant.id.in_(requested_ids))
+    }
+    if existing_ids != requested_ids:
+        return jsonify({
+            'success': False,
+            'message': f'Restaurante no encontrado: {min(requested_ids - existing_ids)}'
+        }), 404
+    
+    keepalive = current_app.config['AVAILABILITY_STREAM_KEEPALIVE']
+    encode = ndjson_encoder()
+    
+    def generate():
+        changes = queue.SimpleQueue()
+        subscription = availability_events.subscribe(db, keys, lambda key, counts: changes.put((key, counts)))
+        # La conexión a la BD vuelve al pool: una suscripción inactiva no la retiene
+        db.session.remove()
+        try:
+            yield f'retry: {keepalive * 1000}\n\n'.encode()
+            for key in keys:
+                yield sse_event(key, subscription.counts[key], encode)
+            while True:
+                try:
+                    key, counts = changes.get(timeout=keepalive)
+                except queue.Empty:
+                    yield SSE_KEEPALIVE
+                    continue
+                yield sse_event(key, counts, encode)
+        finally:
+            availability_events.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@reservations_bp.route('/availability/<int:restaurant_id>', methods=['GET'])
+@use_primary
+def availability_calendar_range(restaurant_id):
+    """
+    Disponibilidad de un restaurante para un rango de fechas (calendario)
+    Query params opcionales:
+        - from: Fecha inicial YYYY-MM-DD (por defecto hoy)
+        - to: Fecha final YYYY-MM-DD (por defecto from + 30 días)
+    El rango está limitado a AVAILABILITY_CALENDAR_MAX_DAYS días
+    """
+    try:
+        date_from = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args else date.today()
+        date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else date_from + timedelta(days=30)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+        }), 400
+    
+    max_days = current_app.config['AVAILABILITY_CALENDAR_MAX_DAYS']
+    if date_to < date_from or (date_to - date_from).days + 1 > max_days:
+        return jsonify({
+            'success': False,
+            'message': f'El rango debe ser válido y de como máximo {max_days} días'
+        }), 400
+    
+    # Verificar que el restaurante existe
+    restaurant = Restaurant.query.get(restaurant_id)
+    if not restaurant:
+        return jsonify({
+            'success': False,
+            'message': 'Restaurante no encontrado'
+        }), 404
+    
+    response = jsonify({
+        'success': True,
+        'restaurant_id': restaurant_id,
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'data': availability_calendar(db, restaurant_id, date_from, date_to)
+    })
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['AVAILABILITY_CALENDAR_MAX_AGE']
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 @reservations_bp.route('/availability/<int:restaurant_id>/<date>', methods=['GET'])
+@use_primary
 def check_availability(restaurant_id, date):
     """
     Endpoint adicional para verificar disponibilidad antes de reservar
@@ -240,11 +605,11 @@ def check_availability(restaurant_id, date):
         - date: Fecha en formato YYYY-MM-DD
     """
     try:
-        reservation_date = datetime.strptime(date, '%Y-%m-%d').date()
-    except ValueError:
+        reservation_date = parse_date(date)
+    except ValueError as err:
         return jsonify({
             'success': False,
-            'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            'message': str(err)
         }), 400
     
     # Verificar que el restaurante existe
@@ -255,29 +620,66 @@ def check_availability(restaurant_id, date):
             'message': 'Restaurante no encontrado'
         }), 404
     
-    # Verificar disponibilidad del restaurante
-    is_valid_restaurant, msg_restaurant, available = validate_restaurant_availability(
-        db, 
-        restaurant_id, 
-        reservation_date
-    )
+    # Contadores de daily_capacity, los mismos contra los que admite la escritura
+    existing_reservations, total_reservations = availability_counts(db, [(restaurant_id, reservation_date)])[(restaurant_id, reservation_date)]
+    return jsonify({
+        'success': True,
+        **availability_summary(
+            existing_reservations,
+            total_reservations,
+            capacity_limits.limits(restaurant_id, reservation_date)
+        )
+    }), 200
+
+@reservations_bp.route('/availability/<int:restaurant_id>/<date>/slots', methods=['GET'])
+@use_primary
+def available_time_slots(restaurant_id, date):
+    """
+    Próximas horas de llegada con mesa libre (restaurantes con inventario de mesas)
+    Query params:
+        - party: Número de personas (obligatorio)
+        - after: Hora mínima HH:MM (por defecto la apertura)
+        - duration: Duración en minutos (por defecto DEFAULT_RESERVATION_MINUTES)
+        - limit: Número de horas (por defecto 5, máx AVAILABLE_SLOTS_MAX)
+    """
+    try:
+        reservation_date = datetime.strptime(date, '%Y-%m-%d').date()
+        after = datetime.strptime(request.args['after'], '%H:%M').time() if 'after' in request.args else None
+        party = int(request.args['party'])
+        duration = int(request.args.get('duration', current_app.config['DEFAULT_RESERVATION_MINUTES']))
+        limit = min(int(request.args.get('limit', 5)), current_app.config['AVAILABLE_SLOTS_MAX'])
+    except (KeyError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'Parámetros inválidos. Use date YYYY-MM-DD, party (entero), after HH:MM, duration y limit enteros'
+        }), 400
     
-    # Verificar límite diario total
-    is_valid_daily, msg_daily, total = validate_daily_reservation_limit(
-        db, 
-        reservation_date
-    )
+    if party < 1 or not 15 <= duration <= 360 or limit < 1:
+        return jsonify({
+            'success': False,
+            'message': 'party debe ser >= 1, duration entre 15 y 360 y limit >= 1'
+        }), 400
+    
+    # Verificar que el restaurante existe
+    restaurant = Restaurant.query.get(restaurant_id)
+    if not restaurant:
+        return jsonify({
+            'success': False,
+            'message': 'Restaurante no encontrado'
+        }), 404
+    
+    slots = available_slots(db, restaurant_id, reservation_date, party, duration, after=after, count=limit)
+    if slots is None:
+        return jsonify({
+            'success': False,
+            'message': 'Este restaurante no tiene mesas configuradas'
+        }), 400
     
     return jsonify({
         'success': True,
-        'available': is_valid_restaurant and is_valid_daily,
-        'restaurant': {
-            'available_tables': available,
-            'message': msg_restaurant
-        },
-        'daily_limit': {
-            'total_reservations': total,
-            'remaining': 20 - total,
-            'message': msg_daily
-        }
-    }), 200
\ No newline at end of file
+        'restaurant_id': restaurant_id,
+        'date': reservation_date.isoformat(),
+        'party': party,
+        'duration_minutes': duration,
+        'slots': [slot.strftime('%H:%M') for slot in slots]
+    }), 200
@@ -1,6 +1,21 @@
-from flask import Blueprint, request, jsonify
-from app.models import db, Restaurant
-from app.schemas import restaurant_schema, restaurants_schema
+from datetime import date
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import update
+from app.models import db, Restaurant, RestaurantTable, Reservation
+from app.schemas import restaurant_schema, table_schema, tables_schema
+from app.utils.admission import release_restaurant
+from app.utils.archive import delete_archived
+from app.utils.cache import restaurants_cache
+from app.utils.conditional import etag_version, restaurant_version
+from app.utils.events import availability_events
+from app.utils.idempotency import idempotent
+from app.utils.limits import capacity_limits, delete_limits
+from app.utils.metrics import serialization
+from app.utils.replicas import primary
+from app.utils.rollups import delete_rollups
+from app.utils.search import restaurant_search
+from app.utils.reads import restaurants_list, restaurants_list_filters
+from app.utils.serializers import restaurants_list_select, encode_json
 from marshmallow import ValidationError
 
 restaurants_bp = Blueprint('restaurants', __name__, url_prefix='/api/restaurants')
@@ -13,32 +28,92 @@ def get_restaurants():
     Query params: 
         - letter: Filtrar por letra inicial del nombre
         - city: Filtrar por ciudad
+    La respuesta se cachea por filtros normalizados y lleva ETag/Last-Modified
     """
-    # Obtener parámetros de query
-    letter = request.args.get('letter', '').upper()
-    city = request.args.get('city', '')
+    # Obtener parámetros de query (normalizados: también forman la clave de caché)
+    letter, city, cache_key = restaurants_list_filters(request.args)
     
-    # Construir query base
-    query = Restaurant.query
+    entry = restaurants_cache.get(cache_key)
+    if entry is None:
+        # Generación leída antes de la consulta: si un commit invalida el listado
+        # mientras tanto, esta respuesta no se guarda en la caché
+        generation = restaurants_cache.generation()
+        
+        # Ejecutar query filtrada y ordenada alfabéticamente
+        # (desde el primario: una réplica con retraso dejaría cacheado un listado obsoleto)
+        with primary():
+            rows = db.session.execute(restaurants_list_select(letter, city)).all()
+        
+        with serialization():
+            body = encode_json(restaurants_list(rows))
+        entry = restaurants_cache.set(cache_key, body.decode(), generation)
     
-    # Aplicar filtros si existen
-    if letter:
-        query = query.filter(Restaurant.name.ilike(f'{letter}%'))
+    response = current_app.response_class(entry['body'], status=200, mimetype='application/json')
+    response.set_etag(entry['etag'])
+    response.last_modified = entry['last_modified']
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@restaurants_bp.route('/search', methods=['GET'])
+def search_restaurants():
+    """
+    Buscar restaurantes por nombre, ciudad y descripción (índice en memoria)
+    Tolera errores de escritura y coincide por prefijo; resultados por relevancia
+    Query params:
+        - q: Texto a buscar
+        - limit: Máximo de resultados (por defecto SEARCH_DEFAULT_LIMIT)
+    """
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', current_app.config['SEARCH_DEFAULT_LIMIT'], type=int)
     
-    if city:
-        query = query.filter(Restaurant.city.ilike(f'%{city}%'))
+    if not query:
+        return jsonify({
+            'success': False,
+            'message': 'El parámetro q es obligatorio'
+        }), 400
     
-    # Ejecutar query y ordenar alfabéticamente
-    restaurants = query.order_by(Restaurant.name).all()
+    if limit < 1:
+        return jsonify({
+            'success': False,
+            'message': 'El parámetro limit debe ser mayor que 0'
+        }), 400
+    
+    try:
+        results = restaurant_search.search(query, min(limit, current_app.config['SEARCH_MAX_LIMIT']))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     
     return jsonify({
         'success': True,
-        'data': restaurants_schema.dump(restaurants),
-        'count': len(restaurants)
+        'data': [{**restaurant, 'score': score} for score, restaurant in results],
+        'count': len(results)
     }), 200
 
 
+def _invalidate_cached_lists(*restaurants):
+    """
+    Invalida solo los listados cacheados en los que aparece alguno de los restaurantes
+    (misma comparación literal que restaurants_list_select)
+    Args:
+        restaurants: tuplas (name, city) antes y/o después del cambio
+    """
+    def affected(key):
+        letter, city = key.split('|', 1)
+        return any(
+            (not letter or name.lower().startswith(letter.lower())) and
+            (not city or city in restaurant_city.lower())
+            for name, restaurant_city in restaurants
+        )
+    
+    restaurants_cache.invalidate(affected)
+
+
 @restaurants_bp.route('/<int:id>', methods=['GET'])
+@etag_version(restaurant_version)
 def get_restaurant(id):
     """Obtener un restaurante por ID"""
     restaurant = Restaurant.query.get(id)
@@ -56,6 +131,7 @@ def get_restaurant(id):
 
 
 @restaurants_bp.route('', methods=['POST'])
+@idempotent
 def create_restaurant():
     """Crear un nuevo restaurante"""
     try:
@@ -79,6 +155,8 @@ def create_restaurant():
     
     db.session.add(new_restaurant)
     db.session.commit()
+    _invalidate_cached_lists((new_restaurant.name, new_restaurant.city))
+    restaurant_search.add(new_restaurant)
     
     return jsonify({
         'success': True,
@@ -88,6 +166,7 @@ def create_restaurant():
 
 
 @restaurants_bp.route('/<int:id>', methods=['PUT'])
+@idempotent
 def update_restaurant(id):
     """Actualizar un restaurante existente"""
     restaurant = Restaurant.query.get(id)
@@ -108,6 +187,8 @@ def update_restaurant(id):
             'errors': err.messages
         }), 400
     
+    previous = (restaurant.name, restaurant.city)
+    
     # Actualizar campos
     if 'name' in data:
         restaurant.name = data['name']
@@ -121,6 +202,8 @@ def update_restaurant(id):
         restaurant.photo_url = data['photo_url']
     
     db.session.commit()
+    _invalidate_cached_lists(previous, (restaurant.name, restaurant.city))
+    restaurant_search.add(restaurant)
     
     return jsonify({
         'success': True,
@@ -130,6 +213,7 @@ def update_restaurant(id):
 
 
 @restaurants_bp.route('/<int:id>', methods=['DELETE'])
+@idempotent
 def delete_restaurant(id):
     """Eliminar un restaurante"""
     restaurant = Restaurant.query.get(id)
@@ -143,10 +227,120 @@ def delete_restaurant(id):
     # Guardar nombre para mensaje de confirmación
     restaurant_name = restaurant.name
     
+    previous = (restaurant.name, restaurant.city)
+    
+    released = release_restaurant(db, id)
+    delete_archived(db, id)
+    delete_limits(db, id)
+    delete_rollups(db, id)
+    # Los totales del día bajan también para los suscriptores de otros restaurantes
+    changes = availability_events.collect(db, released)
     db.session.delete(restaurant)
     db.session.commit()
+    availability_events.publish(changes)
+    _invalidate_cached_lists(previous)
+    restaurant_search.remove(id)
+    capacity_limits.invalidate()
     
     return jsonify({
         'success': True,
         'message': f'Restaurante "{restaurant_name}" eliminado exitosamente'
-    }), 200
\ No newline at end of file
+    }), 200
+
+
+@restaurants_bp.route('/<int:id>/tables', methods=['GET'])
+def get_tables(id):
+    """Listar las mesas de un restaurante (ordenadas por plazas)"""
+    restaurant = Restaurant.query.get(id)
+    
+    if not restaurant:
+        return jsonify({
+            'success': False,
+            'message': 'Restaurante no encontrado'
+        }), 404
+    
+    tables = RestaurantTable.query.filter_by(restaurant_id=id).order_by(RestaurantTable.seats, RestaurantTable.id).all()
+    
+    return jsonify({
+        'success': True,
+        'data': tables_schema.dump(tables),
+        'count': len(tables)
+    }), 200
+
+
+@restaurants_bp.route('/<int:id>/tables', methods=['POST'])
+@idempotent
+def create_table(id):
+    """
+    Añadir una mesa al restaurante
+    Con al menos una mesa, sus reservas se asignan por horario (start_time obligatoria)
+    """
+    restaurant = Restaurant.query.get(id)
+    
+    if not restaurant:
+        return jsonify({
+            'success': False,
+            'message': 'Restaurante no encontrado'
+        }), 404
+    
+    try:
+        data = table_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({
+            'success': False,
+            'message': 'Datos inválidos',
+            'errors': err.messages
+        }), 400
+    
+    if RestaurantTable.query.filter_by(restaurant_id=id, name=data['name']).first():
+        return jsonify({
+            'success': False,
+            'message': f'Ya existe la mesa "{data["name"]}" en este restaurante'
+        }), 409
+    
+    new_table = RestaurantTable(restaurant_id=id, name=data['name'], seats=data['seats'])
+    db.session.add(new_table)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Mesa creada exitosamente',
+        'data': table_schema.dump(new_table)
+    }), 201
+
+
+@restaurants_bp.route('/<int:id>/tables/<int:table_id>', methods=['DELETE'])
+@idempotent
+def delete_table(id, table_id):
+    """Eliminar una mesa sin reservas futuras (las pasadas quedan sin mesa)"""
+    table = RestaurantTable.query.filter_by(id=table_id, restaurant_id=id).first()
+    
+    if not table:
+        return jsonify({
+            'success': False,
+            'message': 'Mesa no encontrada'
+        }), 404
+    
+    upcoming = db.session.query(Reservation.id).filter(
+        Reservation.table_id == table_id,
+        Reservation.reservation_date >= date.today()
+    ).count()
+    if upcoming:
+        return jsonify({
+            'success': False,
+            'message': f'La mesa tiene {upcoming} reservas futuras: cancélelas o muévalas antes de eliminarla'
+        }), 409
+    
+    db.session.execute(
+        update(Reservation)
+        .where(Reservation.table_id == table_id)
+        .values(table_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.delete(table)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': f'Mesa "{table.name}" eliminada exitosamente'
+    }), 200
@@ -1,7 +1,17 @@
 from marshmallow import Schema, fields, validate, validates, ValidationError
 from datetime import date
+from app.utils.metrics import serialization
 
-class RestaurantSchema(Schema):
+
+class BaseSchema(Schema):
+    """Schema base: el tiempo de dump cuenta como serialización en las métricas"""
+    
+    def dump(self, obj, *, many=None):
+        with serialization():
+            return super().dump(obj, many=many)
+
+
+class RestaurantSchema(BaseSchema):
     """Schema para validar y serializar Restaurantes"""
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True, validate=validate.Length(min=1, max=100))
@@ -12,7 +22,21 @@ class RestaurantSchema(Schema):
     created_at = fields.DateTime(dump_only=True)
 
 
-class ReservationSchema(Schema):
+class RestaurantTableSchema(BaseSchema):
+    """Schema para validar y serializar las mesas de un restaurante"""
+    id = fields.Int(dump_only=True)
+    restaurant_id = fields.Int(dump_only=True)
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=20))
+    seats = fields.Int(required=True, validate=validate.Range(min=1, max=20))
+    created_at = fields.DateTime(dump_only=True)
+
+
+class CapacityLimitSchema(BaseSchema):
+    """Schema para validar los límites de reservas por día (restaurante o fecha)"""
+    max_reservations = fields.Int(required=True, validate=validate.Range(min=0, max=100000))
+
+
+class ReservationSchema(BaseSchema):
     """Schema para validar y serializar Reservas"""
     id = fields.Int(dump_only=True)
     restaurant_id = fields.Int(required=True)
@@ -24,6 +48,10 @@ class ReservationSchema(Schema):
         required=True, 
         validate=validate.Range(min=1, max=20)
     )
+    # Hora de llegada (HH:MM) y duración: obligatoria en restaurantes con mesas
+    start_time = fields.Time(format='%H:%M', allow_none=True)
+    duration_minutes = fields.Int(allow_none=True, validate=validate.Range(min=15, max=360))
+    table_id = fields.Int(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
     
     # Campos anidados para mostrar info del restaurante al listar reservas
@@ -41,4 +69,7 @@ def validate_reservation_date(self, value):
 restaurant_schema = RestaurantSchema()
 restaurants_schema = RestaurantSchema(many=True)
 reservation_schema = ReservationSchema()
-reservations_schema = ReservationSchema(many=True)
\ No newline at end of file
+reservations_schema = ReservationSchema(many=True)
+table_schema = RestaurantTableSchema()
+tables_schema = RestaurantTableSchema(many=True)
+limit_schema = CapacityLimitSchema()
\ No newline at end of file
@@ -0,0 +1,407 @@
+from datetime import timedelta
+from sqlalchemy import func, literal, select, tuple_, update, delete
+from app.models import ALL_RESTAURANTS, Reservation, DailyCapacity
+from app.utils.database import dialect_insert
+from app.utils.limits import capacity_limits
+
+
+def _insert(db):
+    """INSERT con soporte ON CONFLICT según el dialecto (SQLite o PostgreSQL)"""
+    return dialect_insert(db, DailyCapacity)
+
+
+def _existing_count(restaurant_id, reservation_date):
+    """COUNT de reservas de un (restaurant_id, fecha), o del día con ALL_RESTAURANTS"""
+    existing = select(func.count(Reservation.id)).where(Reservation.reservation_date == reservation_date)
+    if restaurant_id != ALL_RESTAURANTS:
+        existing = existing.where(Reservation.restaurant_id == restaurant_id)
+    return existing.scalar_subquery()
+
+
+def _ensure_counter(db, restaurant_id, reservation_date):
+    """
+    Crea la fila del contador si no existe, sembrada con el COUNT actual de reservas
+    Si otra transacción la crea a la vez, ON CONFLICT DO NOTHING la deja intacta
+    """
+    db.session.execute(
+        _insert(db).values(
+            restaurant_id=restaurant_id,
+            reservation_date=reservation_date,
+            reserved=_existing_count(restaurant_id, reservation_date)
+        ).on_conflict_do_nothing(index_elements=['restaurant_id', 'reservation_date'])
+    )
+
+
+def _apply(db, restaurant_id, reservation_date, delta, limit=None):
+    """
+    Suma delta al contador con un único UPDATE condicional
+    Returns:
+        bool: True si la fila se actualizó (no se superó el límite)
+    """
+    conditions = [
+        DailyCapacity.restaurant_id == restaurant_id,
+        DailyCapacity.reservation_date == reservation_date,
+        DailyCapacity.reserved + delta >= 0
+    ]
+    if limit is not None:
+        conditions.append(DailyCapacity.reserved + delta <= limit)
+
+    result = db.session.execute(
+        update(DailyCapacity)
+        .where(*conditions)
+        .values(reserved=DailyCapacity.reserved + delta)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _counts(db, restaurant_id, reservation_date):
+    """
+    Lee de la BD en una query (reservas del restaurante, reservas del día,
+    límite del restaurante, límite del día)
+    """
+    def reserved(counter_restaurant_id):
+        return func.coalesce(select(DailyCapacity.reserved).where(
+            DailyCapacity.restaurant_id == counter_restaurant_id,
+            DailyCapacity.reservation_date == reservation_date
+        ).scalar_subquery(), 0)
+
+    return tuple(db.session.execute(select(
+        reserved(restaurant_id),
+        reserved(ALL_RESTAURANTS),
+        capacity_limits.limit_clause(restaurant_id, reservation_date),
+        capacity_limits.limit_clause(ALL_RESTAURANTS, reservation_date)
+    )).one())
+
+
+def capacity_counts(db, keys):
+    """
+    Lee de los contadores (reservas del restaurante, reservas del día) de varios
+    (restaurant_id, fecha) en una sola query. Dentro de la transacción de una
+    escritura devuelve los valores que quedarán al hacer commit.
+
+    Returns:
+        dict: {(restaurant_id, fecha): (restaurant_total, daily_total)}
+    """
+    if not keys:
+        return {}
+    rows = {
+        (restaurant_id, reservation_date): reserved
+        for restaurant_id, reservation_date, reserved in db.session.execute(
+            select(DailyCapacity.restaurant_id, DailyCapacity.reservation_date, DailyCapacity.reserved).where(
+                DailyCapacity.restaurant_id.in_({restaurant_id for restaurant_id, _ in keys} | {ALL_RESTAURANTS}),
+                DailyCapacity.reservation_date.in_({reservation_date for _, reservation_date in keys})
+            )
+        )
+    }
+    return {
+        (restaurant_id, reservation_date): (
+            rows.get((restaurant_id, reservation_date), 0),
+            rows.get((ALL_RESTAURANTS, reservation_date), 0)
+        )
+        for restaurant_id, reservation_date in keys
+    }
+
+
+def availability_select(restaurant_id, reservation_date):
+    """
+    SELECT de (reservas del restaurante, reservas del día) para consultar disponibilidad
+    Lee los mismos contadores de daily_capacity que la admisión, así que el
+    resultado vale para todos los workers. Si un contador aún no existe se
+    cuenta en reservas, como lo sembraría _ensure_counter. Lo ejecutan la vista
+    Flask, su versión ASGI y el stream de disponibilidad.
+    """
+    def counter(counter_restaurant_id):
+        reserved = select(DailyCapacity.reserved).where(
+            DailyCapacity.restaurant_id == counter_restaurant_id,
+            DailyCapacity.reservation_date == reservation_date
+        ).scalar_subquery()
+        return func.coalesce(reserved, _existing_count(counter_restaurant_id, reservation_date))
+
+    return select(counter(restaurant_id), counter(ALL_RESTAURANTS))
+
+
+def availability_counts(db, keys):
+    """
+    (reservas del restaurante, reservas del día) de varios (restaurant_id, fecha)
+
+    Returns:
+        dict: {(restaurant_id, fecha): (restaurant_total, daily_total)}
+    """
+    return {
+        (restaurant_id, reservation_date): tuple(db.session.execute(availability_select(restaurant_id, reservation_date)).one())
+        for restaurant_id, reservation_date in keys
+    }
+
+
+def calendar_counts(db, restaurant_id, date_from, date_to):
+    """
+    (reservas del restaurante, reservas del día) de cada fecha de un rango
+    Lee los contadores de daily_capacity del rango en una query, como
+    availability_select; solo los días sin fila de contador se cuentan en
+    reservas, con un GROUP BY limitado a esas fechas.
+
+    Returns:
+        dict: {fecha: (restaurant_total, daily_total)} de cada día del rango
+    """
+    rows = db.session.execute(
+        select(DailyCapacity.restaurant_id, DailyCapacity.reservation_date, DailyCapacity.reserved).where(
+            DailyCapacity.restaurant_id.in_((restaurant_id, ALL_RESTAURANTS)),
+            DailyCapacity.reservation_date.between(date_from, date_to)
+        )
+    ).all()
+    counters = {(counter_restaurant_id, reservation_date): reserved for counter_restaurant_id, reservation_date, reserved in rows}
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    missing = [
+        day for day in days
+        if (restaurant_id, day) not in counters or (ALL_RESTAURANTS, day) not in counters
+    ]
+
+    counted = {}
+    if missing:
+        counted = {
+            reservation_date: (restaurant_total, daily_total)
+            for reservation_date, restaurant_total, daily_total in db.session.execute(
+                select(
+                    Reservation.reservation_date,
+                    func.count(Reservation.id).filter(Reservation.restaurant_id == restaurant_id),
+                    func.count(Reservation.id)
+                ).where(Reservation.reservation_date.in_(missing)).group_by(Reservation.reservation_date)
+            )
+        }
+
+    counts = {}
+    for day in days:
+        restaurant_total, daily_total = counted.get(day, (0, 0))
+        counts[day] = (
+            counters.get((restaurant_id, day), restaurant_total),
+            counters.get((ALL_RESTAURANTS, day), daily_total)
+        )
+    return counts
+
+
+def lock_counters(db, keys):
+    """
+    Bloquea los contadores de varios (restaurant_id, fecha) hasta el fin de la transacción
+    Serializa las escrituras sobre un mismo restaurante y día (asignación de
+    mesas): FOR UPDATE en PostgreSQL; en SQLite el INSERT ya toma el bloqueo de escritura.
+    Incluye el total de cada día y bloquea en el orden (fecha, restaurante) de
+    admit_reservation y admit_batch: el total del día primero (sin interbloqueos).
+    """
+    keys = set(keys)
+    keys |= {(ALL_RESTAURANTS, reservation_date) for _, reservation_date in keys}
+    keys = sorted(keys, key=lambda key: (key[1], key[0]))
+    for restaurant_id, reservation_date in keys:
+        _ensure_counter(db, restaurant_id, reservation_date)
+    if keys:
+        db.session.execute(
+            select(DailyCapacity.restaurant_id)
+            .where(tuple_(DailyCapacity.restaurant_id, DailyCapacity.reservation_date).in_(keys))
+            .order_by(DailyCapacity.reservation_date, DailyCapacity.restaurant_id)
+            .with_for_update()
+        ).all()
+
+
+def admit_reservation(db, restaurant_id, reservation_date, release=None):
+    """
+    Admite una reserva de forma atómica (sin check-then-insert)
+    Incrementa condicionalmente el contador del restaurante y el del día hasta
+    sus límites, leídos de la BD en el propio UPDATE (limit_clause: la caché de
+    límites del proceso puede ir por detrás de otro worker), dentro de la
+    transacción en curso. El llamador inserta la reserva y hace commit; si la
+    admisión falla se hace rollback aquí.
+
+    Args:
+        release: (restaurant_id, reservation_date) que libera una plaza en la
+                 misma transacción (cambio de restaurante o fecha)
+
+    Returns:
+        tuple: (is_valid: bool, message: str, available_tables: int, total_reservations: int)
+    """
+    # Orden fijo de bloqueo (fecha, restaurante) para evitar deadlocks en PostgreSQL
+    operations = [
+        (reservation_date, restaurant_id, 1, capacity_limits.limit_clause(restaurant_id, reservation_date)),
+        (reservation_date, ALL_RESTAURANTS, 1, capacity_limits.limit_clause(ALL_RESTAURANTS, reservation_date))
+    ]
+    if release is not None:
+        old_restaurant_id, old_date = release
+        operations += [(old_date, old_restaurant_id, -1, None), (old_date, ALL_RESTAURANTS, -1, None)]
+    # Las liberaciones van antes que los incrementos: mover una reserva dentro del mismo día no consume cupo diario
+    operations.sort(key=lambda op: (op[0], op[1] != ALL_RESTAURANTS, op[1], op[2]))
+
+    for op_date, op_restaurant_id, delta, limit in operations:
+        _ensure_counter(db, op_restaurant_id, op_date)
+        if _apply(db, op_restaurant_id, op_date, delta, limit) or delta < 0:
+            continue
+
+        restaurant_total, daily_total, restaurant_limit, daily_limit = _counts(db, restaurant_id, reservation_date)
+        db.session.rollback()
+
+        if op_restaurant_id == ALL_RESTAURANTS:
+            return (False, f'Se ha alcanzado el límite de {daily_limit} reservas para esta fecha',
+                    max(restaurant_limit - restaurant_total, 0), daily_total)
+        return False, 'No hay mesas disponibles en este restaurante para la fecha seleccionada', 0, daily_total
+
+    restaurant_total, daily_total, restaurant_limit, _ = _counts(db, restaurant_id, reservation_date)
+    return True, 'Mesa disponible', restaurant_limit - restaurant_total, daily_total
+
+
+def release_reservation(db, restaurant_id, reservation_date):
+    """Libera la plaza de una reserva eliminada (misma transacción que el DELETE)"""
+    for op_restaurant_id in (ALL_RESTAURANTS, restaurant_id):
+        _ensure_counter(db, op_restaurant_id, reservation_date)
+        _apply(db, op_restaurant_id, reservation_date, -1)
+
+
+def release_restaurant(db, restaurant_id):
+    """
+    Descuenta del total diario las reservas de un restaurante y borra sus contadores
+    Debe llamarse antes de eliminar el restaurante (sus reservas se borran en cascada)
+
+    Returns:
+        list: (restaurant_id, fecha) liberados, para availability_events.collect
+    """
+    released = [
+        (restaurant_id, reservation_date) for reservation_date in db.session.scalars(
+            select(Reservation.reservation_date).where(Reservation.restaurant_id == restaurant_id).distinct()
+        )
+    ]
+    own_reservations = select(func.count(Reservation.id)).where(
+        Reservation.restaurant_id == restaurant_id,
+        Reservation.reservation_date == DailyCapacity.reservation_date
+    ).scalar_subquery()
+
+    db.session.execute(
+        update(DailyCapacity)
+        .where(
+            DailyCapacity.restaurant_id == ALL_RESTAURANTS,
+            DailyCapacity.reservation_date.in_(
+                select(Reservation.reservation_date).where(Reservation.restaurant_id == restaurant_id)
+            )
+        )
+        .values(reserved=DailyCapacity.reserved - own_reservations)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(DailyCapacity)
+        .where(DailyCapacity.restaurant_id == restaurant_id)
+        .execution_options(synchronize_session=False)
+    )
+    return released
+
+
+def lock_batch(db, slots):
+    """
+    Siembra y bloquea los contadores de un lote en una sola pasada ordenada
+    Una agregación sobre reservas siembra los contadores que faltan y los
+    contadores afectados (con el total de cada día) se leen bloqueados en orden
+    (fecha, restaurante): FOR UPDATE en PostgreSQL; SQLite ya serializa las
+    escrituras. La importación lo llama antes de asignar mesas, de modo que
+    lock_counters ya no bloquea nada nuevo.
+
+    Args:
+        slots: lista de (restaurant_id, reservation_date)
+
+    Returns:
+        dict: {(restaurant_id, fecha): reservas} de los contadores bloqueados
+    """
+    if not slots:
+        return {}
+
+    dates = {reservation_date for _, reservation_date in slots}
+    restaurant_ids = {restaurant_id for restaurant_id, _ in slots} | {ALL_RESTAURANTS}
+
+    # Reservas existentes por (restaurante, fecha) en un solo GROUP BY
+    seeds = {}
+    grouped = db.session.execute(
+        select(Reservation.restaurant_id, Reservation.reservation_date, func.count(Reservation.id))
+        .where(Reservation.reservation_date.in_(dates))
+        .group_by(Reservation.restaurant_id, Reservation.reservation_date)
+    )
+    for restaurant_id, reservation_date, total in grouped:
+        seeds[(restaurant_id, reservation_date)] = total
+        seeds[(ALL_RESTAURANTS, reservation_date)] = seeds.get((ALL_RESTAURANTS, reservation_date), 0) + total
+
+    keys = sorted(set(slots) | {(ALL_RESTAURANTS, d) for d in dates}, key=lambda key: (key[1], key[0]))
+    db.session.execute(
+        _insert(db).on_conflict_do_nothing(index_elements=['restaurant_id', 'reservation_date']),
+        [{'restaurant_id': r, 'reservation_date': d, 'reserved': seeds.get((r, d), 0)} for r, d in keys]
+    )
+
+    return {
+        (r, d): reserved
+        for r, d, reserved in db.session.execute(
+            select(DailyCapacity.restaurant_id, DailyCapacity.reservation_date, DailyCapacity.reserved)
+            .where(DailyCapacity.reservation_date.in_(dates), DailyCapacity.restaurant_id.in_(restaurant_ids))
+            .order_by(DailyCapacity.reservation_date, DailyCapacity.restaurant_id)
+            .with_for_update()
+        )
+    }
+
+
+def admit_batch(db, slots, counters=None):
+    """
+    Admite un lote de reservas en una única transacción
+    Con los contadores bloqueados (lock_batch) y los límites guardados en la
+    BD se decide fila a fila en orden de llegada.
+    El llamador inserta las reservas aceptadas y hace commit.
+
+    Args:
+        slots: lista de (restaurant_id, reservation_date), una por reserva
+        counters: resultado de lock_batch para un superconjunto de slots
+            (si no se pasa, se bloquean aquí)
+
+    Returns:
+        list: (is_valid: bool, message: str) alineada con slots
+    """
+    if not slots:
+        return []
+    if counters is None:
+        counters = lock_batch(db, slots)
+    counters = dict(counters)
+
+    # Límites guardados en la BD, leídos con los contadores ya bloqueados
+    keys = set(slots) | {(ALL_RESTAURANTS, reservation_date) for _, reservation_date in slots}
+    limits = capacity_limits.stored_limits(db.session, keys)
+
+    results = []
+    changed = set()
+    for restaurant_id, reservation_date in slots:
+        day_key = (ALL_RESTAURANTS, reservation_date)
+        restaurant_limit, daily_limit = limits[(restaurant_id, reservation_date)], limits[day_key]
+        if counters[(restaurant_id, reservation_date)] >= restaurant_limit:
+            results.append((False, 'No hay mesas disponibles en este restaurante para la fecha seleccionada'))
+        elif counters[day_key] >= daily_limit:
+            results.append((False, f'Se ha alcanzado el límite de {daily_limit} reservas para esta fecha'))
+        else:
+            counters[(restaurant_id, reservation_date)] += 1
+            counters[day_key] += 1
+            changed.update([(restaurant_id, reservation_date), day_key])
+            results.append((True, 'Mesa disponible'))
+
+    if changed:
+        # UPDATE por clave primaria en bloque (executemany)
+        db.session.execute(
+            update(DailyCapacity),
+            [{'restaurant_id': r, 'reservation_date': d, 'reserved': counters[(r, d)]} for r, d in sorted(changed, key=lambda key: (key[1], key[0]))]
+        )
+
+    return results
+
+
+def rebuild_counters(db):
+    """
+    Reconstruye daily_capacity desde las reservas con dos INSERT ... SELECT
+    Tras una carga masiva que no pasa por la admisión (flask seed, importaciones)
+    los contadores existentes quedarían desfasados. El llamador hace commit.
+    """
+    db.session.execute(delete(DailyCapacity).execution_options(synchronize_session=False))
+    columns = ['restaurant_id', 'reservation_date', 'reserved']
+    db.session.execute(_insert(db).from_select(columns, (
+        select(Reservation.restaurant_id, Reservation.reservation_date, func.count(Reservation.id))
+        .group_by(Reservation.restaurant_id, Reservation.reservation_date)
+    )))
+    db.session.execute(_insert(db).from_select(columns, (
+        select(literal(ALL_RESTAURANTS), Reservation.reservation_date, func.count(Reservation.id))
+        .group_by(Reservation.reservation_date)
+    )))
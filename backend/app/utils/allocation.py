@@ -0,0 +1,257 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, time
+from itertools import islice
+from flask import current_app
+from sqlalchemy import select, tuple_
+from app.models import Reservation, RestaurantTable
+from app.utils.admission import lock_counters
+
+
+def to_minutes(value):
+    """time o 'HH:MM' -> minutos desde medianoche"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%H:%M').time()
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(minutes):
+    """Minutos desde medianoche -> time"""
+    return time(minutes // 60, minutes % 60)
+
+
+def service_window():
+    """(primera, última) hora de llegada en minutos según SERVICE_OPENS / LAST_SEATING"""
+    return to_minutes(current_app.config['SERVICE_OPENS']), to_minutes(current_app.config['LAST_SEATING'])
+
+
+def effective_duration(start_time, duration_minutes):
+    """Duración que se guarda: la indicada o DEFAULT_RESERVATION_MINUTES si hay hora"""
+    if start_time is None:
+        return duration_minutes
+    return duration_minutes or current_app.config['DEFAULT_RESERVATION_MINUTES']
+
+
+class TableIntervals:
+    """
+    Reservas de una mesa en un día como intervalos [inicio, fin) en minutos
+    Listas ordenadas y sin solapes (la asignación nunca los crea): comprobar un
+    hueco es una búsqueda binaria, O(log n) con cientos de reservas al día.
+    """
+
+    __slots__ = ('table_id', 'seats', 'starts', 'ends')
+
+    def __init__(self, table_id, seats):
+        self.table_id = table_id
+        self.seats = seats
+        self.starts = []
+        self.ends = []
+
+    def add(self, start, end):
+        if not self.starts or start >= self.starts[-1]:
+            # Carga desde la BD en orden de hora: sin desplazar elementos
+            self.starts.append(start)
+            self.ends.append(end)
+            return
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+
+    def is_free(self, start, end):
+        position = bisect_right(self.starts, start)
+        if position and self.ends[position - 1] > start:
+            return False
+        return position == len(self.starts) or self.starts[position] >= end
+
+    def free_starts(self, first, last, duration, step):
+        """Horas de llegada libres de la rejilla (first + k * step) hasta last, en orden"""
+        start = first
+        position = bisect_right(self.ends, start)
+        while start <= last:
+            if position < len(self.starts) and self.starts[position] < start + duration:
+                # Solapa con la siguiente reserva: saltar a su fin (redondeado a la rejilla)
+                start = max(start, first + -(-(self.ends[position] - first) // step) * step)
+                position += 1
+                continue
+            yield start
+            start += step
+
+
+class DaySchedule:
+    """
+    Mesas de un restaurante en un día, ordenadas por plazas
+    La asignación elige la mesa más pequeña en la que cabe el grupo (best fit):
+    las mesas grandes quedan libres para los grupos grandes.
+    """
+
+    def __init__(self, tables):
+        self.tables = sorted((TableIntervals(table_id, seats) for table_id, seats in tables), key=lambda t: (t.seats, t.table_id))
+        self._seats = [table.seats for table in self.tables]
+        self._by_id = {table.table_id: table for table in self.tables}
+
+    def fitting(self, party):
+        """Mesas con plazas suficientes para el grupo"""
+        return self.tables[bisect_left(self._seats, party):]
+
+    def add(self, table_id, start, end):
+        table = self._by_id.get(table_id)
+        if table is not None:
+            table.add(start, end)
+
+    def find_table(self, party, start, end):
+        """Mesa libre más pequeña para el grupo en [start, end), o None"""
+        for table in self.fitting(party):
+            if table.is_free(start, end):
+                return table
+        return None
+
+    def next_slots(self, party, first, last, duration, step, count):
+        """Las `count` primeras horas de llegada con alguna mesa libre para el grupo"""
+        starts = heapq.merge(*(table.free_starts(first, last, duration, step) for table in self.fitting(party)))
+        return list(islice(_unique(starts), count))
+
+
+def _unique(sorted_values):
+    """Elimina repetidos consecutivos de un iterable ordenado"""
+    previous = None
+    for value in sorted_values:
+        if value != previous:
+            yield value
+            previous = value
+
+
+def load_schedules(db, keys, exclude_ids=(), lock=False):
+    """
+    Agenda de mesas de varios (restaurant_id, fecha), solo de restaurantes con mesas
+    Dos queries: el inventario de mesas y las reservas con mesa de esos días
+    (índice restaurant_id + reservation_date, sin recorrer la tabla).
+
+    Args:
+        exclude_ids: reservas que no cuentan (la propia reserva al modificarla)
+        lock: bloquear los contadores de esos días antes de leer las reservas
+
+    Returns:
+        dict: {(restaurant_id, fecha): DaySchedule}
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+
+    tables = defaultdict(list)
+    for table_id, restaurant_id, seats in db.session.execute(
+        select(RestaurantTable.id, RestaurantTable.restaurant_id, RestaurantTable.seats)
+        .where(RestaurantTable.restaurant_id.in_({restaurant_id for restaurant_id, _ in keys}))
+    ):
+        tables[restaurant_id].append((table_id, seats))
+
+    schedules = {key: DaySchedule(tables[key[0]]) for key in keys if key[0] in tables}
+    if not schedules:
+        return {}
+    if lock:
+        lock_counters(db, schedules)
+
+    query = select(
+        Reservation.restaurant_id, Reservation.reservation_date, Reservation.table_id,
+        Reservation.start_time, Reservation.duration_minutes
+    ).where(
+        tuple_(Reservation.restaurant_id, Reservation.reservation_date).in_(list(schedules)),
+        Reservation.table_id.isnot(None)
+    ).order_by(Reservation.start_time)
+    if exclude_ids:
+        query = query.where(Reservation.id.notin_(exclude_ids))
+
+    for restaurant_id, reservation_date, table_id, start_time, duration_minutes in db.session.execute(query):
+        start = start_time.hour * 60 + start_time.minute
+        schedules[(restaurant_id, reservation_date)].add(table_id, start, start + duration_minutes)
+    return schedules
+
+
+def allocate_batch(db, requests):
+    """
+    Asigna mesa a varias reservas en orden de llegada (mismas reglas que allocate)
+    Bloquea los contadores de los días con mesas antes de leer las agendas, así
+    que dos escrituras concurrentes no pueden elegir la misma mesa. Las mesas
+    asignadas a una fila cuentan para las siguientes del lote.
+
+    Args:
+        requests: lista de (restaurant_id, fecha, personas, start_time, duration_minutes, exclude_id)
+
+    Returns:
+        list: (is_valid: bool, message: str, table_id | None) alineada con requests
+    """
+    opens, last_seating = service_window()
+    results = [None] * len(requests)
+    pending = []
+    for i, (restaurant_id, reservation_date, party, start_time, duration_minutes, exclude_id) in enumerate(requests):
+        if start_time is not None and not opens <= to_minutes(start_time) <= last_seating:
+            results[i] = (False, f'La hora de llegada debe estar entre {from_minutes(opens):%H:%M} y {from_minutes(last_seating):%H:%M}', None)
+        else:
+            pending.append(i)
+
+    schedules = load_schedules(
+        db,
+        {(requests[i][0], requests[i][1]) for i in pending},
+        exclude_ids={requests[i][5] for i in pending if requests[i][5] is not None},
+        lock=True
+    )
+
+    for i in pending:
+        restaurant_id, reservation_date, party, start_time, duration_minutes, _ = requests[i]
+        schedule = schedules.get((restaurant_id, reservation_date))
+        if schedule is None:
+            # Restaurante sin mesas: solo cuenta el límite diario de reservas
+            results[i] = (True, 'Mesa disponible', None)
+            continue
+        if start_time is None:
+            results[i] = (False, 'Este restaurante asigna mesas por horario: indique start_time (HH:MM)', None)
+            continue
+        if not schedule.fitting(party):
+            results[i] = (False, f'No hay mesas para {party} personas en este restaurante', None)
+            continue
+
+        start = to_minutes(start_time)
+        end = start + effective_duration(start_time, duration_minutes)
+        table = schedule.find_table(party, start, end)
+        if table is None:
+            results[i] = (False, f'No hay mesas libres para {party} personas a las {start_time:%H:%M}', None)
+            continue
+        table.add(start, end)
+        results[i] = (True, 'Mesa asignada', table.table_id)
+
+    return results
+
+
+def allocate(db, restaurant_id, reservation_date, party, start_time, duration_minutes=None, exclude_id=None):
+    """
+    Asigna la mesa libre más pequeña para el grupo en [start_time, start_time + duración)
+    En restaurantes sin mesas no asigna nada (table_id None) y no hace más
+    queries que la del inventario. Debe llamarse dentro de la transacción que
+    inserta o modifica la reserva; el llamador hace commit o rollback.
+
+    Returns:
+        tuple: (is_valid: bool, message: str, table_id | None)
+    """
+    return allocate_batch(db, [(restaurant_id, reservation_date, party, start_time, duration_minutes, exclude_id)])[0]
+
+
+def available_slots(db, restaurant_id, reservation_date, party, duration_minutes=None, after=None, count=5):
+    """
+    Próximas `count` horas de llegada con mesa libre para el grupo
+    Horas de la rejilla SLOT_INTERVAL_MINUTES desde SERVICE_OPENS (o desde
+    `after`) hasta LAST_SEATING. Lee la agenda del día sin bloquear.
+
+    Returns:
+        list | None: horas (time) o None si el restaurante no tiene mesas
+    """
+    schedule = load_schedules(db, [(restaurant_id, reservation_date)]).get((restaurant_id, reservation_date))
+    if schedule is None:
+        return None
+
+    opens, last_seating = service_window()
+    step = current_app.config['SLOT_INTERVAL_MINUTES']
+    first = opens
+    if after is not None and to_minutes(after) > opens:
+        first = opens + -(-(to_minutes(after) - opens) // step) * step
+    duration = duration_minutes or current_app.config['DEFAULT_RESERVATION_MINUTES']
+    return [from_minutes(start) for start in schedule.next_slots(party, first, last_seating, duration, step, count)]
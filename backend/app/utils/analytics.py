@@ -0,0 +1,185 @@
+from sqlalchemy import func, select, tuple_
+from app.models import ALL_RESTAURANTS, DailyOccupancy, Restaurant
+from app.utils.limits import capacity_limits
+from app.utils.rollups import LEAD_BUCKETS
+
+
+def _ratio(numerator, denominator, digits=4):
+    return round(numerator / denominator, digits) if denominator else None
+
+
+def lead_time_stats(reservations, lead_days, buckets):
+    """
+    Antelación media y distribución por tramos
+    La mediana se da como tramo: el primero en el que el acumulado llega a la mitad.
+
+    Args:
+        buckets: reservas por tramo, en el orden de LEAD_BUCKETS
+    """
+    names = [column.removeprefix('lead_') for _, column in LEAD_BUCKETS]
+    median = None
+    cumulative = 0
+    for name, total in zip(names, buckets):
+        cumulative += total
+        if reservations and cumulative * 2 >= reservations:
+            median = name
+            break
+
+    return {
+        'average_days': _ratio(lead_days, reservations, 2),
+        'median_bucket': median,
+        'distribution': dict(zip(names, buckets))
+    }
+
+
+def _daily_rows(db, scope, date_from, date_to):
+    """
+    Serie diaria de un restaurante o del total del día (PK, como mucho ANALYTICS_MAX_DAYS filas)
+    Incluye los días que se quedaron sin reservas: su capacidad guardada cuenta en el rango.
+    """
+    return db.session.execute(
+        select(
+            DailyOccupancy.reservation_date,
+            DailyOccupancy.reservations,
+            DailyOccupancy.covers,
+            DailyOccupancy.lead_days,
+            DailyOccupancy.capacity,
+            *(getattr(DailyOccupancy, column) for _, column in LEAD_BUCKETS)
+        )
+        .where(
+            DailyOccupancy.restaurant_id == scope,
+            DailyOccupancy.reservation_date.between(date_from, date_to)
+        )
+        .order_by(DailyOccupancy.reservation_date)
+    ).all()
+
+
+def _restaurant_rows(db, date_from, date_to, restaurant_id=None):
+    """Totales por restaurante del rango con un GROUP BY sobre el índice cubriente de fecha"""
+    query = select(
+        DailyOccupancy.restaurant_id,
+        func.sum(DailyOccupancy.reservations),
+        func.sum(DailyOccupancy.covers),
+        func.sum(DailyOccupancy.lead_days),
+        func.max(DailyOccupancy.reservations),
+        func.count(),
+        func.sum(DailyOccupancy.capacity)
+    ).where(
+        DailyOccupancy.reservation_date.between(date_from, date_to),
+        DailyOccupancy.restaurant_id != ALL_RESTAURANTS
+    ).group_by(DailyOccupancy.restaurant_id)
+    if restaurant_id is not None:
+        query = query.where(DailyOccupancy.restaurant_id == restaurant_id)
+    return db.session.execute(query).all()
+
+
+def _capacities(db, stored, date_from, date_to):
+    """
+    Capacidad del rango: la guardada en daily_occupancy en los días con resumen y el
+    límite actual en los días sin fila (nunca tuvieron reservas)
+
+    Args:
+        stored: {restaurant_id: (días con resumen, capacidad guardada)}
+    """
+    covered = {}
+    keys = capacity_limits.override_keys(stored, date_from, date_to)
+    if keys:
+        # Fechas con límite propio que ya tienen su capacidad guardada
+        for restaurant_id, reservation_date in db.session.execute(
+            select(DailyOccupancy.restaurant_id, DailyOccupancy.reservation_date)
+            .where(tuple_(DailyOccupancy.restaurant_id, DailyOccupancy.reservation_date).in_(keys))
+        ):
+            covered.setdefault(restaurant_id, set()).add(reservation_date)
+    current = capacity_limits.capacities(stored, date_from, date_to, {
+        restaurant_id: (days, covered.get(restaurant_id, ())) for restaurant_id, (days, _) in stored.items()
+    })
+    return {restaurant_id: capacity + current[restaurant_id] for restaurant_id, (_, capacity) in stored.items()}
+
+
+def occupancy_report(db, date_from, date_to, restaurant_id=None, limit=50):
+    """
+    Ocupación, cubiertos y antelación de las reservas en un rango de fechas
+    Solo lee daily_occupancy: el coste depende del rango y del número de
+    restaurantes, no del histórico de reservas. La BD hace las sumas (serie
+    diaria por clave primaria y un GROUP BY por restaurante); en Python solo
+    se derivan los ratios. Ocupación = reservas / suma de las capacidades
+    diarias del rango: la guardada en el resumen de cada día (el límite de
+    entonces) y, en los días sin reservas, que cuentan como 0, el límite actual.
+
+    Args:
+        restaurant_id: solo ese restaurante; sin él, la serie diaria y el
+            resumen son los del total del día (todos los restaurantes)
+        limit: restaurantes de la lista, de mayor a menor ocupación
+
+    Returns:
+        dict: summary (todo el rango), days (serie diaria) y restaurants
+    """
+    scope = ALL_RESTAURANTS if restaurant_id is None else restaurant_id
+
+    days = []
+    reservations = covers = lead_days = 0
+    buckets = [0] * len(LEAD_BUCKETS)
+    peak = None
+    stored_days = stored_capacity = 0
+    for reservation_date, day_reservations, day_covers, day_lead_days, day_capacity, *day_buckets in _daily_rows(
+        db, scope, date_from, date_to
+    ):
+        stored_days += 1
+        stored_capacity += day_capacity
+        if not day_reservations:
+            continue
+        occupancy = _ratio(day_reservations, day_capacity)
+        days.append({
+            'date': reservation_date.isoformat(),
+            'reservations': day_reservations,
+            'covers': day_covers,
+            'occupancy': occupancy
+        })
+        reservations += day_reservations
+        covers += day_covers
+        lead_days += day_lead_days
+        buckets = [total + day_total for total, day_total in zip(buckets, day_buckets)]
+        if occupancy is not None and (peak is None or occupancy > peak['occupancy']):
+            peak = {'date': reservation_date.isoformat(), 'occupancy': occupancy}
+
+    rows = _restaurant_rows(db, date_from, date_to, restaurant_id)
+    stored = {row[0]: (row[5], row[6]) for row in rows}
+    stored[scope] = (stored_days, stored_capacity)
+    capacities = _capacities(db, stored, date_from, date_to)
+    ranked = sorted(
+        rows,
+        key=lambda row: (-(_ratio(row[1], capacities[row[0]]) or 0), row[0])
+    )[:limit]
+    names = dict(db.session.execute(
+        select(Restaurant.id, Restaurant.name).where(Restaurant.id.in_([row[0] for row in ranked]))
+    ).all()) if ranked else {}
+
+    restaurants = [
+        {
+            'restaurant_id': row_restaurant_id,
+            'name': names.get(row_restaurant_id),
+            'reservations': row_reservations,
+            'covers': row_covers,
+            'average_party_size': _ratio(row_covers, row_reservations, 2),
+            'occupancy': _ratio(row_reservations, capacities[row_restaurant_id]),
+            'peak_day_reservations': row_peak,
+            'average_lead_days': _ratio(row_lead_days, row_reservations, 2)
+        }
+        for row_restaurant_id, row_reservations, row_covers, row_lead_days, row_peak, _, _ in ranked
+    ]
+
+    return {
+        'summary': {
+            'days': (date_to - date_from).days + 1,
+            'reservations': reservations,
+            'covers': covers,
+            'average_party_size': _ratio(covers, reservations, 2),
+            'occupancy': {
+                'average': _ratio(reservations, capacities[scope]),
+                'peak': peak
+            },
+            'lead_time': lead_time_stats(reservations, lead_days, buckets)
+        },
+        'days': days,
+        'restaurants': restaurants
+    }
@@ -0,0 +1,168 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import DateTime, delete, func, literal, select
+from app.models import db, Reservation, ArchivedReservation, DailyCapacity
+from app.utils.database import dialect_insert
+
+# Columnas que se copian tal cual de reservations a reservations_archive
+ARCHIVED_COLUMNS = (
+    'id', 'restaurant_id', 'customer_name', 'customer_email', 'customer_phone',
+    'reservation_date', 'number_of_people', 'start_time', 'duration_minutes', 'table_id',
+    'created_at', 'updated_at'
+)
+
+
+def archive_horizon(config, today=None):
+    """Primera fecha que se mantiene en la tabla caliente (hoy - ARCHIVE_AFTER_DAYS)"""
+    return (today or date.today()) - timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+
+
+class ArchiveConflict(RuntimeError):
+    """Una reserva viva tiene el mismo id que una ya archivada (no se borra ninguna del lote)"""
+
+
+def _insert_ignore(db):
+    return dialect_insert(db, ArchivedReservation)
+
+
+def archive_reservations(db, before, batch_size=1000, max_batches=None, progress=None):
+    """
+    Mueve a reservations_archive las reservas con fecha anterior a `before`
+    En lotes acotados, cada uno en su propia transacción (INSERT ... SELECT +
+    DELETE por ids) para no bloquear la tabla. Varios procesos pueden archivar a
+    la vez: en PostgreSQL cada lote bloquea sus filas (FOR UPDATE SKIP LOCKED) y
+    en SQLite las escrituras ya están serializadas. Solo se borran las reservas
+    que el INSERT ha copiado (RETURNING). Al terminar borra los contadores de
+    capacidad de esas fechas; los límites por fecha se conservan (los usa la
+    ocupación histórica).
+
+    Args:
+        progress: callable(moved_total) opcional, llamado tras cada lote
+
+    Returns:
+        int: reservas archivadas
+    Raises:
+        ArchiveConflict: un id del lote ya existe en el histórico (el lote se deshace)
+    """
+    moved = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        ids = db.session.execute(
+            select(Reservation.id)
+            .where(Reservation.reservation_date < before)
+            .order_by(Reservation.reservation_date, Reservation.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            break
+
+        source = select(
+            *(getattr(Reservation, column) for column in ARCHIVED_COLUMNS),
+            literal(datetime.utcnow(), DateTime)
+        ).where(Reservation.id.in_(ids))
+        inserted = db.session.execute(
+            _insert_ignore(db)
+            .from_select(ARCHIVED_COLUMNS + ('archived_at',), source)
+            .on_conflict_do_nothing(index_elements=['id'])
+            .returning(ArchivedReservation.id)
+        ).scalars().all()
+        if len(inserted) != len(ids):
+            # Con las filas bloqueadas, un id ya archivado es otra reserva con el mismo id
+            db.session.rollback()
+            conflicts = sorted(set(ids).difference(inserted))
+            raise ArchiveConflict(
+                f'Reservas con id ya archivado: {", ".join(map(str, conflicts[:20]))}'
+                f'{"..." if len(conflicts) > 20 else ""}'
+            )
+        db.session.execute(
+            delete(Reservation).where(Reservation.id.in_(inserted)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        moved += len(inserted)
+        batches += 1
+        if progress is not None:
+            progress(moved)
+        if len(ids) < batch_size:
+            break
+
+    # Contadores de fechas ya cerradas: no se vuelve a reservar contra ellas
+    db.session.execute(
+        delete(DailyCapacity).where(DailyCapacity.reservation_date < before).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return moved
+
+
+def delete_archived(db, restaurant_id):
+    """Borra el histórico de un restaurante eliminado (sus reservas vivas se borran en cascada)"""
+    db.session.execute(
+        delete(ArchivedReservation)
+        .where(ArchivedReservation.restaurant_id == restaurant_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+class ArchiveScheduler:
+    """
+    Archivado periódico en un hilo de fondo (opcional, ARCHIVE_INTERVAL > 0)
+    Cada ARCHIVE_INTERVAL segundos archiva las reservas anteriores al horizonte
+    en lotes de ARCHIVE_BATCH_SIZE. Como alternativa, `flask archive-reservations`
+    puede lanzarse desde cron. El hilo arranca con la primera petición del
+    proceso que la atiende: con gunicorn preload_app, los hilos del proceso
+    padre no pasan a los workers.
+    """
+
+    def __init__(self, app=None):
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._interval = 0
+        self.last_run = None
+        self.last_moved = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['archive_scheduler'] = self
+        self._interval = app.config.get('ARCHIVE_INTERVAL', 0)
+        if self._interval and not app.testing:
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, args=(app, self._interval), name='reservations-archive', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, app, interval):
+        while not self._stop.wait(interval):
+            with app.app_context():
+                try:
+                    self.last_moved = archive_reservations(
+                        db, archive_horizon(app.config), batch_size=app.config['ARCHIVE_BATCH_SIZE']
+                    )
+                    self.last_run = datetime.utcnow()
+                    if self.last_moved:
+                        app.logger.info('Archivadas %s reservas', self.last_moved)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('Error archivando reservas')
+
+    def stop(self):
+        self._stop.set()
+
+
+# Instancia compartida, inicializada en create_app
+archive_scheduler = ArchiveScheduler()
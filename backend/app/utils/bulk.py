@@ -0,0 +1,330 @@
+import csv
+import json
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from marshmallow import ValidationError
+from sqlalchemy import Date, DateTime, String, insert, inspect, select, type_coerce
+from app.models import Restaurant, Reservation
+from app.schemas import restaurants_schema
+from app.utils.conditional import mark_changed
+from app.utils.serializers import (
+    RESERVATION_COLUMNS, restaurants_select, restaurant_row_to_dict, reservation_row_to_dict, ndjson_encoder
+)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+# Cabecera del CSV de exportación (reserva + nombre del restaurante para contabilidad)
+EXPORT_CSV_COLUMNS = tuple(column.key for column in RESERVATION_COLUMNS) + ('restaurant_name',)
+# Palabras para los nombres de los restaurantes sintéticos de flask seed
+SEED_WORDS = (
+    'casa bar taberna asador marisqueria meson bodega cocina tasca terraza jardin puerto plaza mercado '
+    'sol luna mar olivo naranjo romero tomillo azafran sardina pulpo bacalao arroz tapas brasa horno'
+).split()
+SEED_CITIES = ('Madrid', 'Barcelona', 'Sevilla', 'Valencia', 'Bilbao', 'Málaga', 'Zaragoza', 'Granada')
+SEED_PHOTO_URL = Restaurant.__table__.c.photo_url.default.arg
+
+
+def chunked(rows, size):
+    """Agrupa un iterable en listas de como máximo size elementos"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_rows(lines, fmt):
+    """Lee filas CSV (cabecera) o NDJSON de un iterable de líneas sin cargarlo entero en memoria"""
+    if fmt == 'csv':
+        for row in csv.DictReader(lines):
+            # En CSV los campos vacíos son nulos
+            yield {key: value if value != '' else None for key, value in row.items()}
+        return
+
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Progress:
+    """Informe periódico de filas procesadas y filas/s (cada `every` filas)"""
+
+    def __init__(self, report, label, every=100_000):
+        self.report = report
+        self.label = label
+        self.every = every
+        self.total = 0
+        self._next = every
+        self._start = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self._start
+        return self.total / elapsed if elapsed > 0 else 0.0
+
+    def add(self, rows):
+        self.total += rows
+        if self.total >= self._next:
+            self._next += self.every
+            self.report(f'  {self.total} {self.label} ({self.rate:,.0f} filas/s)')
+
+    def done(self):
+        self.report(f'{self.total} {self.label} en {time.perf_counter() - self._start:.2f}s ({self.rate:,.0f} filas/s)')
+
+
+def _driver_insert(db, table, keys):
+    """
+    INSERT compilado una sola vez para el driver y conversor bloque -> parámetros
+    Los valores que necesitan conversión de tipo (fechas en SQLite) se convierten
+    una vez por valor distinto del bloque: en una carga masiva se repiten mucho.
+    """
+    dialect = db.session.get_bind().dialect
+    compiled = insert(table).compile(dialect=dialect, column_keys=keys)
+    order = list(compiled.positiontup) if compiled.positional else keys
+    getter = itemgetter(*order)
+    processors = [
+        (position, processor)
+        for position, processor in enumerate(
+            table.c[key].type.dialect_impl(dialect).bind_processor(dialect) for key in order
+        )
+        if processor is not None
+    ]
+
+    def to_params(chunk):
+        rows = [getter(row) for row in chunk]
+        if processors:
+            columns = list(zip(*rows))
+            for position, processor in processors:
+                distinct = {value: processor(value) for value in set(columns[position])}
+                columns[position] = map(distinct.__getitem__, columns[position])
+            rows = list(zip(*columns))
+        if compiled.positional:
+            return rows
+        return [dict(zip(order, row)) for row in rows]
+
+    return compiled.string, to_params
+
+
+def insert_chunks(db, table, rows, chunk_size=10_000, progress=None):
+    """
+    INSERT executemany por bloques de chunk_size filas, un commit por bloque
+    Todas las filas deben tener las mismas claves. La memoria no depende del
+    total (solo se materializa un bloque cada vez) y las filas van directas al
+    driver, sin el procesado por fila de SQLAlchemy.
+
+    Returns:
+        int: filas insertadas
+    """
+    total = 0
+    statement = to_params = None
+    for chunk in chunked(rows, chunk_size):
+        if statement is None:
+            statement, to_params = _driver_insert(db, table, list(chunk[0]))
+        db.session.connection().exec_driver_sql(statement, to_params(chunk))
+        # SQL directo al driver: los listeners de la sesión no lo ven
+        mark_changed(db.session, table.name)
+        db.session.commit()
+        total += len(chunk)
+        if progress is not None:
+            progress.add(len(chunk))
+    return total
+
+
+@contextmanager
+def deferred_indexes(db, table):
+    """
+    Elimina los índices secundarios de table durante una carga masiva y los
+    recrea al final: construir un índice de una vez es mucho más rápido que
+    mantenerlo fila a fila. Bloquea la tabla: solo para cargas fuera de servicio.
+    """
+    engine = db.session.get_bind()
+    existing = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+    dropped = [index for index in table.indexes if index.name in existing]
+    db.session.commit()
+    for index in dropped:
+        index.drop(bind=engine)
+    try:
+        yield
+    finally:
+        db.session.commit()
+        for index in dropped:
+            index.create(bind=engine, checkfirst=True)
+
+
+def seed_restaurant_rows(total, rng, now=None):
+    """Restaurantes sintéticos con nombres y descripciones variados"""
+    now = now or datetime.utcnow()
+    for i in range(total):
+        words = rng.sample(SEED_WORDS, 3)
+        yield {
+            'name': f'{words[0].capitalize()} {words[1]} {i}',
+            'address': f'Calle {words[2].capitalize()} {i}',
+            'city': SEED_CITIES[i % len(SEED_CITIES)],
+            'description': f'{words[2].capitalize()} de temporada',
+            'photo_url': SEED_PHOTO_URL,
+            'created_at': now,
+            'updated_at': now
+        }
+
+
+def seed_reservation_rows(total, restaurant_ids, start, days, rng, now=None):
+    """
+    Reservas sintéticas repartidas al azar entre restaurant_ids y los `days` días desde start
+    Como una carga de histórico, no pasan por la admisión (pueden superar los límites)
+    """
+    now = now or datetime.utcnow()
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    # rng.random() directo: choice/randint pesan en cargas de millones de filas
+    uniform = rng.random
+    restaurants = len(restaurant_ids)
+    for i in range(total):
+        yield {
+            'restaurant_id': restaurant_ids[int(uniform() * restaurants)],
+            'customer_name': f'Cliente {i}',
+            'customer_email': f'cliente{i}@example.com',
+            'customer_phone': None,
+            'reservation_date': dates[i % days],
+            'number_of_people': 1 + int(uniform() * 8),
+            'created_at': now,
+            'updated_at': now
+        }
+
+
+def seed(db, restaurants, reservations, start=None, days=365, seed_value=None, chunk_size=10_000,
+         defer_indexes=True, report=None):
+    """
+    Carga datos sintéticos: `restaurants` restaurantes nuevos y `reservations`
+    reservas repartidas entre todos los restaurantes existentes
+
+    Args:
+        defer_indexes: recrear los índices de reservas al final (ver deferred_indexes)
+        report: callable(mensaje) opcional para el progreso
+
+    Returns:
+        tuple: (restaurantes insertados, reservas insertadas)
+    """
+    rng = random.Random(seed_value)
+    progress = Progress(report, 'restaurantes') if report else None
+    inserted_restaurants = insert_chunks(db, Restaurant.__table__, seed_restaurant_rows(restaurants, rng), chunk_size, progress)
+    if progress is not None and restaurants:
+        progress.done()
+
+    inserted_reservations = 0
+    if reservations:
+        restaurant_ids = db.session.execute(select(Restaurant.id)).scalars().all()
+        if not restaurant_ids:
+            raise ValueError('No hay restaurantes: use --restaurants para crearlos')
+        rows = seed_reservation_rows(reservations, restaurant_ids, start or date.today(), days, rng)
+        progress = Progress(report, 'reservas') if report else None
+        with deferred_indexes(db, Reservation.__table__) if defer_indexes else nullcontext():
+            inserted_reservations = insert_chunks(db, Reservation.__table__, rows, chunk_size, progress)
+        if progress is not None:
+            progress.done()
+
+    return inserted_restaurants, inserted_reservations
+
+
+def import_restaurants(db, rows, chunk_size=10_000, progress=None, on_error=None):
+    """
+    Valida con RestaurantSchema e inserta restaurantes por bloques (un commit por bloque)
+    Las filas inválidas se descartan y se notifican con on_error(índice, errores).
+
+    Returns:
+        int: restaurantes insertados
+    """
+    now = datetime.utcnow()
+    inserted = 0
+    offset = 0
+    for chunk in chunked(rows, chunk_size):
+        try:
+            loaded = restaurants_schema.load(chunk)
+            errors = {}
+        except ValidationError as err:
+            loaded = err.valid_data if isinstance(err.valid_data, list) else [{} for _ in chunk]
+            errors = err.messages if isinstance(err.messages, dict) else {}
+
+        valid = []
+        for i, data in enumerate(loaded):
+            if i in errors or not isinstance(data, dict):
+                if on_error is not None:
+                    on_error(offset + i, errors.get(i, {}))
+            else:
+                valid.append({**data, 'created_at': now, 'updated_at': now})
+
+        if valid:
+            db.session.execute(insert(Restaurant), valid)
+            db.session.commit()
+        inserted += len(valid)
+        offset += len(chunk)
+        if progress is not None:
+            progress.add(len(chunk))
+    return inserted
+
+
+def export_query(source, fmt):
+    """
+    SELECT de la exportación (sin JOIN: el restaurante se añade en export_rows)
+    En CSV las fechas se leen sin conversión de tipos y se escriben tal cual las
+    devuelve el driver (ISO 8601, created_at con espacio como separador).
+    """
+    columns = [source.c[column.key] for column in RESERVATION_COLUMNS]
+    if fmt == 'csv':
+        columns = [
+            type_coerce(column, String).label(column.key) if isinstance(column.type, (Date, DateTime)) else column
+            for column in columns
+        ]
+    return select(*columns).select_from(source)
+
+
+def _load_restaurants(db, restaurants, rows):
+    """Añade a la caché restaurants (id -> dict) los restaurantes de rows que falten"""
+    missing = {row[1] for row in rows}.difference(restaurants)
+    if not missing:
+        return
+    for row in db.session.execute(restaurants_select().where(Restaurant.id.in_(missing))):
+        restaurants[row[0]] = restaurant_row_to_dict(row)
+    for restaurant_id in missing.difference(restaurants):
+        restaurants[restaurant_id] = None
+
+
+def export_rows(db, query, output, fmt, chunk_size=10_000, progress=None):
+    """
+    Escribe las filas de query en output (fichero de texto) como CSV o NDJSON
+    Lee con un cursor de servidor (yield_per): memoria constante con millones de
+    filas de reservas. Los restaurantes se leen una vez por id en lugar de un
+    JOIN por fila (CSV: nombre del restaurante; NDJSON: objeto anidado como la API).
+
+    Returns:
+        int: filas exportadas
+    """
+    result = db.session.connection().execute(query.execution_options(yield_per=chunk_size))
+    restaurants = {}
+    if fmt == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+
+        names = {}
+
+        def write(rows):
+            for restaurant_id in restaurants.keys() - names.keys():
+                names[restaurant_id] = restaurants[restaurant_id] and restaurants[restaurant_id]['name']
+            writer.writerows((*row, names[row[1]]) for row in rows)
+    else:
+        encode = ndjson_encoder()
+
+        def write(rows):
+            output.write(b''.join(encode(reservation_row_to_dict(row, restaurants)) for row in rows).decode())
+
+    total = 0
+    for rows in result.partitions():
+        _load_restaurants(db, restaurants, rows)
+        write(rows)
+        total += len(rows)
+        if progress is not None:
+            progress.add(len(rows))
+    return total
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCacheBackend:
+    """Backend en memoria del proceso con expiración (TTL) y desalojo LRU"""
+
+    def __init__(self, max_entries=256):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl):
+        """Guarda value solo si key no existe o ha expirado; True si lo ha guardado"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[1] > time.monotonic():
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def set_if_generation(self, key, value, ttl, generation):
+        """Guarda value solo si no ha habido invalidaciones desde generation; True si lo ha guardado"""
+        with self._lock:
+            if self._generation != generation:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+
+    def _store(self, key, value, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend:
+    """
+    Backend compartido entre workers de gunicorn (requiere el paquete redis)
+    El TTL lo aplica Redis; con indexed, un set auxiliar guarda las claves para
+    poder invalidarlas (keys/clear)
+    """
+
+    # Comprueba la generación y guarda la entrada en un solo paso atómico
+    SET_IF_GENERATION = """
+    if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+    if KEYS[3] then
+        redis.call('SADD', KEYS[3], ARGV[4])
+    end
+    return 1
+    """
+
+    def __init__(self, url, namespace='response-cache', indexed=True):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._namespace = namespace
+        self._index = f'{namespace}:keys' if indexed else None
+        self._generation_key = f'{namespace}:generation'
+        self._set_if_generation = self._client.register_script(self.SET_IF_GENERATION)
+
+    def _key(self, key):
+        return f'{self._namespace}:{key}'
+
+    def get(self, key):
+        raw = self._client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        pipe = self._client.pipeline()
+        pipe.set(self._key(key), json.dumps(value), ex=int(ttl))
+        if self._index:
+            pipe.sadd(self._index, key)
+        pipe.execute()
+
+    def add(self, key, value, ttl):
+        """SET NX: guarda value solo si key no existe; True si lo ha guardado"""
+        if not self._client.set(self._key(key), json.dumps(value), ex=int(ttl), nx=True):
+            return False
+        if self._index:
+            self._client.sadd(self._index, key)
+        return True
+
+    def set_if_generation(self, key, value, ttl, generation):
+        """Guarda value solo si no ha habido invalidaciones desde generation; True si lo ha guardado"""
+        keys = [self._generation_key, self._key(key)] + ([self._index] if self._index else [])
+        return bool(self._set_if_generation(keys=keys, args=[generation, json.dumps(value), int(ttl), key]))
+
+    def generation(self):
+        return int(self._client.get(self._generation_key) or 0)
+
+    def bump_generation(self):
+        self._client.incr(self._generation_key)
+
+    def delete(self, key):
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(key))
+        if self._index:
+            pipe.srem(self._index, key)
+        pipe.execute()
+
+    def keys(self):
+        if not self._index:
+            raise NotImplementedError('Backend sin índice de claves')
+        return [key.decode() for key in self._client.smembers(self._index)]
+
+    def clear(self):
+        for key in self.keys():
+            self.delete(key)
+
+
+class ResponseCache:
+    """
+    Caché de respuestas JSON ya serializadas
+    Cada entrada guarda el cuerpo, su ETag y la fecha de generación (Last-Modified)
+    Backend configurable con RESPONSE_CACHE_BACKEND: 'memory' (por defecto) o 'redis'
+
+    Un listado leído antes de un commit no debe quedar cacheado después de la
+    invalidación de ese commit: quien rellena la caché lee generation() antes de
+    consultar la BD y lo pasa a set(); cada invalidación incrementa la generación
+    antes de borrar las claves y un set() con una generación pasada no guarda nada.
+    """
+
+    def __init__(self, namespace, app=None):
+        self.namespace = namespace
+        self.backend = MemoryCacheBackend()
+        self.ttl = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+        if app.config.get('RESPONSE_CACHE_BACKEND') == 'redis':
+            self.backend = RedisCacheBackend(app.config['RESPONSE_CACHE_REDIS_URL'], namespace=self.namespace)
+        else:
+            self.backend = MemoryCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 256))
+        app.extensions[f'response_cache:{self.namespace}'] = self
+
+    def get(self, key):
+        """Devuelve la entrada cacheada ({'body', 'etag', 'last_modified'}) o None"""
+        return self.backend.get(key)
+
+    def generation(self):
+        """Generación actual: se lee antes de consultar la BD para rellenar una entrada"""
+        return self.backend.generation()
+
+    def set(self, key, body, generation=None):
+        """
+        Guarda un cuerpo ya serializado y devuelve la entrada creada
+        Con generation, solo se guarda si no ha habido invalidaciones desde entonces
+        (la entrada se devuelve igualmente para responder a la petición en curso).
+        """
+        entry = {
+            'body': body,
+            'etag': hashlib.sha1(body.encode()).hexdigest(),
+            'last_modified': int(time.time())
+        }
+        if generation is None:
+            self.backend.set(key, entry, self.ttl)
+        else:
+            self.backend.set_if_generation(key, entry, self.ttl, generation)
+        return entry
+
+    def invalidate(self, predicate):
+        """Elimina las entradas cuya clave cumple predicate(key)"""
+        self.backend.bump_generation()
+        for key in self.backend.keys():
+            if predicate(key):
+                self.backend.delete(key)
+
+    def clear(self):
+        self.backend.bump_generation()
+        self.backend.clear()
+
+
+# Caché del listado de restaurantes, inicializada en create_app
+restaurants_cache = ResponseCache('restaurants')
@@ -0,0 +1,187 @@
+import hashlib
+from itertools import chain
+from flask import g, request
+from sqlalchemy import event, func, select
+from app.models import db, DataVersion, Restaurant, Reservation
+from app.utils.database import dialect_insert
+from app.utils.replicas import RoutingSession
+
+# Tablas con contador de versión en data_versions (ETags de colecciones)
+VERSIONED_TABLES = (Reservation.__tablename__, Restaurant.__tablename__)
+# Contador por restaurante ('reservations:<restaurant_id>'): los commits de reservas de
+# restaurantes distintos no esperan por una misma fila; la versión de la colección es la suma
+SHARDED_TABLES = (Reservation.__tablename__,)
+
+
+def etag_version(version_func):
+    """
+    Marca una vista de lectura con la función que calcula su versión
+    version_func recibe los mismos argumentos de URL que la vista y devuelve
+    un valor barato de calcular que cambia cuando cambian los datos (o None)
+    """
+    def decorator(view):
+        view.etag_version = version_func
+        return view
+    return decorator
+
+
+def register_conditional_requests(app):
+    """
+    Capa de peticiones condicionales (ETag / If-None-Match) para las vistas marcadas
+    Si el ETag del cliente coincide se responde 304 sin ejecutar la vista
+    (ni la query principal ni la serialización)
+    """
+    # Contadores de versión: listeners a nivel de clase de sesión, una sola vez por proceso
+    if not event.contains(RoutingSession, 'before_commit', _bump_versions):
+        event.listen(RoutingSession, 'after_flush', _track_flush)
+        event.listen(RoutingSession, 'do_orm_execute', _track_statement)
+        event.listen(RoutingSession, 'before_commit', _bump_versions)
+        event.listen(RoutingSession, 'after_transaction_end', _forget_changes)
+
+    @app.before_request
+    def check_etag():
+        if request.method not in ('GET', 'HEAD'):
+            return None
+
+        version_func = getattr(app.view_functions.get(request.endpoint), 'etag_version', None)
+        if version_func is None:
+            return None
+
+        version = version_func(**(request.view_args or {}))
+        if version is None:
+            return None
+
+        etag = make_etag(request.full_path, version)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        g.etag = etag
+        return None
+
+    @app.after_request
+    def set_etag(response):
+        etag = g.pop('etag', None)
+        if etag and response.status_code == 200:
+            response.set_etag(etag)
+        return response
+
+
+def make_etag(full_path, version):
+    """ETag de una respuesta: ruta completa (con query string) + versión de los datos"""
+    return hashlib.sha1(f'{full_path}|{version}'.encode()).hexdigest()
+
+
+def version_name(table, restaurant_id=None):
+    """Fila de data_versions de una escritura: la del restaurante en las tablas repartidas"""
+    if table in SHARDED_TABLES and restaurant_id is not None:
+        return f'{table}:{restaurant_id}'
+    return table
+
+
+def mark_changed(session, *tables, restaurant_ids=()):
+    """
+    Anota tablas modificadas en la transacción en curso
+    Las escrituras del ORM y las sentencias Core de la sesión se detectan solas;
+    hace falta para el SQL que va directo al driver (exec_driver_sql). Sin
+    restaurant_ids se incrementa la fila general de la tabla.
+    """
+    names = session.info.setdefault('changed_tables', set())
+    for table in tables:
+        if table not in VERSIONED_TABLES:
+            continue
+        if table in SHARDED_TABLES and restaurant_ids:
+            names.update(version_name(table, restaurant_id) for restaurant_id in restaurant_ids)
+        else:
+            names.add(table)
+
+
+def _track_flush(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        restaurant_id = getattr(instance, 'restaurant_id', None)
+        mark_changed(session, instance.__table__.name, restaurant_ids=() if restaurant_id is None else (restaurant_id,))
+
+
+def _track_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        # INSERT executemany (importación en lote): las filas dicen su restaurante
+        parameters = orm_execute_state.parameters
+        restaurant_ids = ()
+        if orm_execute_state.is_insert and isinstance(parameters, list) and parameters:
+            restaurant_ids = {row.get('restaurant_id') for row in parameters}
+            if None in restaurant_ids:
+                restaurant_ids = ()
+        mark_changed(orm_execute_state.session, orm_execute_state.statement.table.name, restaurant_ids=restaurant_ids)
+
+
+def _bump_versions(session):
+    """Incrementa los contadores de las filas modificadas justo antes del commit (misma transacción)"""
+    # Vuelca antes los cambios pendientes del ORM: after_flush los anota
+    session.flush()
+    names = session.info.pop('changed_tables', None)
+    # Orden fijo: dos commits concurrentes bloquean las filas en el mismo orden
+    for name in sorted(names or ()):
+        statement = dialect_insert(db, DataVersion).values(name=name, version=1)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'version': DataVersion.version + 1}
+        ))
+
+
+def _forget_changes(session, transaction):
+    """Una transacción deshecha no cambia las versiones"""
+    if transaction.parent is None:
+        session.info.pop('changed_tables', None)
+
+
+def _table_version(table):
+    if table in SHARDED_TABLES:
+        # 'reservations' y 'reservations:<id>' ('reservations;' es la clave siguiente al separador);
+        # las filas no se borran, así que la suma crece con cada commit
+        return func.coalesce(
+            select(func.sum(DataVersion.version))
+            .where(DataVersion.name >= table, DataVersion.name < f'{table};')
+            .scalar_subquery(), 0
+        )
+    return func.coalesce(
+        select(DataVersion.version).where(DataVersion.name == table).scalar_subquery(), 0
+    )
+
+
+def reservations_version_query(**_):
+    """
+    SELECT de la versión de la colección de reservas (incluye restaurantes, que van anidados)
+    Lee solo data_versions (un rango de la PK por las filas de cada restaurante y
+    una lectura por clave), sin recorrer las tablas
+    """
+    return select(_table_version(Reservation.__tablename__), _table_version(Restaurant.__tablename__))
+
+
+def reservation_version_query(id):
+    """SELECT de la versión de una reserva y de su restaurante anidado"""
+    return (
+        select(Reservation.updated_at, Restaurant.updated_at)
+        .join(Restaurant, Reservation.restaurant_id == Restaurant.id)
+        .where(Reservation.id == id)
+    )
+
+
+def restaurant_version_query(id):
+    """SELECT de la versión de un restaurante"""
+    return select(Restaurant.updated_at).where(Restaurant.id == id)
+
+
+def reservations_version(**_):
+    """Versión de la colección de reservas"""
+    return db.session.execute(reservations_version_query()).one()
+
+
+def reservation_version(id):
+    """Versión de una reserva"""
+    return db.session.execute(reservation_version_query(id)).first()
+
+
+def restaurant_version(id):
+    """Versión de un restaurante"""
+    return db.session.execute(restaurant_version_query(id)).first()
@@ -0,0 +1,138 @@
+import sqlite3
+import sys
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+
+def engine_options(config):
+    """
+    Opciones de create_engine según el backend de SQLALCHEMY_DATABASE_URI
+    PostgreSQL: pool configurable por variables de entorno, pre-ping, reciclado
+    de conexiones y statement_timeout. En modo pooler externo (PgBouncer en modo
+    transacción) se desactiva el pool propio y los prepared statements de servidor.
+    SQLite: espera en bloqueos (busy timeout); los PRAGMA se aplican al conectar.
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+
+    if uri.startswith('sqlite'):
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    connect_args = {}
+
+    if config['DB_EXTERNAL_POOLER']:
+        # El pooler externo gestiona las conexiones; evitar prepared statements de servidor
+        options['poolclass'] = NullPool
+        if uri.startswith('postgresql+psycopg:'):
+            connect_args['prepare_threshold'] = None
+    else:
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE']
+        )
+        # Con pooler externo el parámetro de arranque 'options' no se admite:
+        # en ese caso statement_timeout se configura en el rol (ALTER ROLE ... SET)
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            connect_args['options'] = f'-c statement_timeout={config["DB_STATEMENT_TIMEOUT_MS"]}'
+
+    if config['DB_CONNECT_TIMEOUT']:
+        connect_args['connect_timeout'] = config['DB_CONNECT_TIMEOUT']
+    if connect_args:
+        options['connect_args'] = connect_args
+
+    return options
+
+
+# Driver asíncrono equivalente a cada backend (modo ASGI, app.asgi)
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_engine_url(url):
+    """URL del engine síncrono (ya resuelta por Flask-SQLAlchemy) con el driver asíncrono"""
+    query = dict(url.query)
+    # asyncpg no entiende sslmode (libpq): se traduce a su parámetro ssl
+    if 'sslmode' in query:
+        query['ssl'] = query.pop('sslmode')
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()], query=query)
+
+
+def async_engine_options(config):
+    """
+    Opciones de create_async_engine equivalentes a engine_options
+    asyncpg recibe el timeout de conexión y statement_timeout con sus propios argumentos
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+
+    if uri.startswith('sqlite'):
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    connect_args = {}
+
+    if config['DB_EXTERNAL_POOLER']:
+        options['poolclass'] = NullPool
+        connect_args['statement_cache_size'] = 0
+    else:
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE']
+        )
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            connect_args['server_settings'] = {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}
+
+    if config['DB_CONNECT_TIMEOUT']:
+        connect_args['timeout'] = config['DB_CONNECT_TIMEOUT']
+    if connect_args:
+        options['connect_args'] = connect_args
+
+    return options
+
+
+def _is_sqlite_connection(dbapi_connection):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        return True
+    # aiosqlite (modo ASGI) llega envuelto en un adaptador con el mismo API de cursor;
+    # el dialecto solo está importado si se ha creado un engine aiosqlite
+    aiosqlite = sys.modules.get('sqlalchemy.dialects.sqlite.aiosqlite')
+    return aiosqlite is not None and isinstance(dbapi_connection, aiosqlite.AsyncAdapt_aiosqlite_connection)
+
+
+def dialect_insert(db, model):
+    """
+    INSERT con soporte ON CONFLICT según el dialecto de la sesión (SQLite o PostgreSQL)
+    El dialecto se importa al usarlo: un despliegue con SQLite no carga el de PostgreSQL
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def dispose_engines(app):
+    """
+    Descarta en un proceso hijo (fork de gunicorn con preload_app) las conexiones
+    heredadas del proceso padre, sin cerrarlas: siguen siendo del padre. Cada
+    worker abre las suyas en su primera query.
+    """
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            engine.dispose(close=False)
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL para que las lecturas no se bloqueen con las escrituras, y PRAGMA de rendimiento"""
+    if not _is_sqlite_connection(dbapi_connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-20000')
+    cursor.close()
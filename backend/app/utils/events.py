@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from app.utils.admission import availability_counts, capacity_counts
+from app.utils.limits import capacity_limits
+from app.utils.validators import availability_summary
+
+# Comentario SSE que mantiene viva la conexión a través de proxies
+SSE_KEEPALIVE = b': keepalive\n\n'
+
+
+def parse_subscriptions(value, max_keys):
+    """
+    Parsea el parámetro subscribe: 'restaurant_id:YYYY-MM-DD' separados por comas
+
+    Returns:
+        list: [(restaurant_id, date)] sin duplicados, en el orden recibido
+
+    Raises:
+        ValueError: con el mensaje para el cliente
+    """
+    keys = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        restaurant_id, _, day = item.partition(':')
+        try:
+            key = (int(restaurant_id), datetime.strptime(day, '%Y-%m-%d').date())
+        except ValueError:
+            raise ValueError(f'Suscripción inválida: {item!r}. Use restaurant_id:YYYY-MM-DD')
+        if key not in keys:
+            keys.append(key)
+
+    if not keys:
+        raise ValueError('El parámetro subscribe es obligatorio (restaurant_id:YYYY-MM-DD, separados por comas)')
+    if len(keys) > max_keys:
+        raise ValueError(f'Máximo {max_keys} suscripciones por conexión')
+    return keys
+
+
+def sse_event(key, counts, encode):
+    """
+    Mensaje SSE 'availability' con el mismo cuerpo que check_availability
+    Los límites se leen de la caché sin recargarla (se llama desde el event loop en ASGI)
+    encode es el ndjson_encoder() de la conexión, resuelto al abrirla
+    """
+    restaurant_id, reservation_date = key
+    payload = {
+        'restaurant_id': restaurant_id,
+        'date': reservation_date.isoformat(),
+        **availability_summary(*counts, capacity_limits.limits(restaurant_id, reservation_date, reload=False))
+    }
+    return b'event: availability\ndata: ' + encode(payload) + b'\n'
+
+
+class Subscription:
+    """
+    Suscripción de un cliente a varios (restaurant_id, fecha)
+    Guarda los últimos contadores de cada uno y llama a notify(key, counts)
+    solo para los que cambian. Los eventos traen contadores absolutos, así que
+    un evento perdido o repetido se corrige con el siguiente.
+    """
+
+    def __init__(self, keys, notify):
+        self.keys = list(keys)
+        self.counts = {}
+        self.dates = {reservation_date for _, reservation_date in self.keys}
+        self.notify = notify
+        # Totales del día llegados antes de los contadores iniciales (ver initialize)
+        self._daily_totals = {}
+
+    def initialize(self, counts):
+        """
+        Contadores leídos de la BD tras registrar la suscripción
+        Un evento que llegó mientras se leían es más reciente que la lectura: se conserva.
+        """
+        for key, (restaurant_total, daily_total) in counts.items():
+            if key not in self.counts:
+                self.counts[key] = (restaurant_total, self._daily_totals.get(key[1], daily_total))
+        self._daily_totals = {}
+
+    def apply(self, event):
+        for key in self.keys:
+            restaurant_id, reservation_date = key
+            if reservation_date != event['date']:
+                continue
+            current = self.counts.get(key)
+            # El total del día afecta a todos los restaurantes de esa fecha
+            if restaurant_id == event['restaurant_id']:
+                restaurant_total = event['restaurant_total']
+            elif current is not None:
+                restaurant_total = current[0]
+            else:
+                self._daily_totals[reservation_date] = event['daily_total']
+                continue
+            counts = (restaurant_total, event['daily_total'])
+            if counts != current:
+                self.counts[key] = counts
+                # Antes de initialize, el cliente recibe estos contadores en el estado inicial
+                if current is not None:
+                    self.notify(key, counts)
+
+
+class MemoryPubSubBackend:
+    """Pub/sub dentro del proceso: el evento se entrega directamente a los suscriptores locales"""
+
+    def __init__(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, event):
+        self._deliver(event)
+
+    def always_publish(self):
+        return False
+
+    def start(self):
+        pass
+
+
+class RedisPubSubBackend:
+    """
+    Pub/sub entre workers de gunicorn o servidores (requiere el paquete redis)
+    Cada proceso publica en un canal de Redis y un hilo escucha el canal y
+    entrega los eventos (también los propios) a sus suscriptores locales. El
+    hilo arranca con la primera suscripción del proceso (antes no hay a quién
+    entregar), así que un worker creado por fork (gunicorn preload_app) tiene
+    el suyo.
+    """
+
+    def __init__(self, url, deliver, channel='availability-events'):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._channel = channel
+        self._deliver = deliver
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._listen, name='availability-events', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def publish(self, event):
+        self._client.publish(self._channel, json.dumps({**event, 'date': event['date'].isoformat()}))
+
+    def always_publish(self):
+        # Los suscriptores pueden estar en otro proceso
+        return True
+
+    def _listen(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._channel)
+        for message in pubsub.listen():
+            event = json.loads(message['data'])
+            event['date'] = date.fromisoformat(event['date'])
+            self._deliver(event)
+
+
+class AvailabilityEvents:
+    """
+    Cambios de disponibilidad por (restaurante, fecha) para el stream SSE
+    Las escrituras de reservas leen los contadores afectados antes del commit
+    (collect) y los publican después (publish). Cada proceso indexa sus
+    suscripciones por fecha: una suscripción inactiva solo ocupa su entrada en
+    el índice y una cola. Backend configurable con AVAILABILITY_EVENTS_BACKEND:
+    'memory' (un proceso, por defecto) o 'redis' (varios workers).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._by_date = defaultdict(set)
+        self.backend = MemoryPubSubBackend(self._dispatch)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('AVAILABILITY_EVENTS_BACKEND') == 'redis':
+            self.backend = RedisPubSubBackend(app.config['AVAILABILITY_EVENTS_REDIS_URL'], self._dispatch)
+        else:
+            self.backend = MemoryPubSubBackend(self._dispatch)
+        app.extensions['availability_events'] = self
+
+    def subscribe(self, db, keys, notify):
+        """
+        Registra una suscripción y la inicializa con los contadores de daily_capacity
+        Se registra antes de leerlos: un cambio publicado mientras tanto ya
+        llega a la suscripción y no se pierde. La lectura se hace fuera del
+        lock del índice.
+        """
+        self.backend.start()
+        subscription = Subscription(keys, notify)
+        with self._lock:
+            for reservation_date in subscription.dates:
+                self._by_date[reservation_date].add(subscription)
+        try:
+            counts = availability_counts(db, subscription.keys)
+        except Exception:
+            self.unsubscribe(subscription)
+            raise
+        with self._lock:
+            subscription.initialize(counts)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for reservation_date in subscription.dates:
+                subscribers = self._by_date.get(reservation_date)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_date[reservation_date]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({subscription for subscribers in self._by_date.values() for subscription in subscribers})
+
+    def collect(self, db, keys):
+        """
+        Contadores de los (restaurant_id, fecha) que cambia la escritura en curso
+        Debe llamarse antes del commit. Sin suscriptores que puedan recibirlos no
+        hace ninguna query.
+
+        Returns:
+            list: eventos para publish() tras el commit
+        """
+        keys = set(keys)
+        if not self.backend.always_publish():
+            with self._lock:
+                keys = {key for key in keys if key[1] in self._by_date}
+        return [
+            {
+                'restaurant_id': restaurant_id,
+                'date': reservation_date,
+                'restaurant_total': restaurant_total,
+                'daily_total': daily_total
+            }
+            for (restaurant_id, reservation_date), (restaurant_total, daily_total) in capacity_counts(db, keys).items()
+        ]
+
+    def publish(self, events):
+        for event in events:
+            self.backend.publish(event)
+
+    def _dispatch(self, event):
+        with self._lock:
+            for subscription in self._by_date.get(event['date'], ()):
+                subscription.apply(event)
+
+
+# Instancia compartida, inicializada en create_app
+availability_events = AvailabilityEvents()
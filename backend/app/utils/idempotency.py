@@ -0,0 +1,192 @@
+import hashlib
+import io
+import time
+from flask import current_app, g, jsonify, request
+from app.utils.cache import MemoryCacheBackend, RedisCacheBackend
+from app.utils.throttling import client_identity, retry_later
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Cuerpos que las vistas leen en streaming (POST /api/reservations/bulk)
+STREAMED_MIMETYPES = ('application/x-ndjson', 'text/csv')
+
+
+def idempotent(view):
+    """Marca una vista de escritura que acepta la cabecera Idempotency-Key"""
+    view.idempotent = True
+    return view
+
+
+class _HashingReader(io.RawIOBase):
+    """Entrada WSGI que añade a la huella los bytes que va leyendo la vista (cuerpos en streaming)"""
+
+    def __init__(self, stream, digest):
+        self._stream = stream
+        self._digest = digest
+        self.consumed = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        self._digest.update(data)
+        self.consumed += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def drain(self, remaining):
+        """Resume lo que la vista no llegó a leer (p. ej. tras un 400); None: hasta el final"""
+        while remaining is None or remaining > 0:
+            data = self._stream.read(65536 if remaining is None else min(65536, remaining))
+            if not data:
+                break
+            self._digest.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+
+
+class IdempotencyStore:
+    """
+    Respuestas de las escrituras marcadas con @idempotent, por cliente e Idempotency-Key
+    La primera petición con una clave la reserva (escritura atómica si no
+    existe) y guarda su respuesta durante IDEMPOTENCY_TTL segundos. Un
+    reintento con el mismo cuerpo recibe la respuesta guardada sin ejecutar la
+    vista (ni validaciones ni escrituras en la BD); con otro cuerpo, 422. Un
+    duplicado que llega mientras la original está en curso recibe 409 con
+    Retry-After. Las respuestas 5xx no se guardan: el cliente puede reintentar.
+    Las claves van ligadas al cliente (su IP, ver TRUSTED_PROXY_COUNT): otro
+    cliente con la misma clave no recibe la respuesta ajena. Backend
+    configurable con IDEMPOTENCY_BACKEND: 'memory' (por proceso: con varios
+    workers un reintento que cae en otro worker se ejecuta de nuevo) o 'redis'
+    (entre workers).
+    """
+
+    def __init__(self, app=None):
+        self.backend = MemoryCacheBackend()
+        self.ttl = 86400
+        self.lock_timeout = 30
+        self.retry_after = 1
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', 86400)
+        self.lock_timeout = app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 30)
+        self.retry_after = app.config.get('IDEMPOTENCY_RETRY_AFTER', 1)
+        if app.config.get('IDEMPOTENCY_BACKEND') == 'redis':
+            self.backend = RedisCacheBackend(app.config['IDEMPOTENCY_REDIS_URL'], namespace='idempotency', indexed=False)
+        else:
+            self.backend = MemoryCacheBackend(app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+        app.extensions['idempotency'] = self
+
+        app.before_request(self._claim_or_replay)
+        app.after_request(self._store)
+        app.teardown_request(self._release)
+
+    @staticmethod
+    def _hash_body(digest, consume):
+        """
+        Añade el cuerpo de la petición a la huella
+        Los cuerpos CSV/NDJSON se leen en streaming y una sola vez: si la vista se
+        va a ejecutar (consume=False) se resumen a medida que ella los lee.
+        """
+        if request.mimetype not in STREAMED_MIMETYPES:
+            digest.update(request.get_data(cache=True))
+        elif consume:
+            for chunk in iter(lambda: request.stream.read(65536), b''):
+                digest.update(chunk)
+        else:
+            request.environ['wsgi.input'] = _HashingReader(request.environ['wsgi.input'], digest)
+
+    def _claim_or_replay(self):
+        view = current_app.view_functions.get(request.endpoint)
+        if not getattr(view, 'idempotent', False) or HEADER not in request.headers:
+            return None
+
+        key = request.headers[HEADER]
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'success': False,
+                'message': f'La cabecera {HEADER} debe tener entre 1 y {MAX_KEY_LENGTH} caracteres'
+            }), 400
+
+        store_key = f'{client_identity()}:{request.method}:{request.path}:{key}'
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.01
+
+        while True:
+            # La marca "en curso" caduca a los lock_timeout segundos si el worker muere
+            if self.backend.add(store_key, {'fingerprint': None, 'response': None}, self.lock_timeout):
+                digest = hashlib.sha256(request.full_path.encode())
+                self._hash_body(digest, consume=False)
+                g.idempotency = (store_key, digest)
+                return None
+
+            entry = self.backend.get(store_key)
+            if entry is not None:
+                break
+            # La marca caducó o se liberó entre add y get: se vuelve a intentar reservarla
+            if time.monotonic() >= deadline:
+                return self._in_progress()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+        if entry['response'] is None:
+            return self._in_progress()
+
+        digest = hashlib.sha256(request.full_path.encode())
+        self._hash_body(digest, consume=True)
+        if entry['fingerprint'] != digest.hexdigest():
+            return jsonify({
+                'success': False,
+                'message': f'La {HEADER} ya se usó con otra petición'
+            }), 422
+        return self._replay(entry['response'])
+
+    def _in_progress(self):
+        return retry_later(409, f'Hay una petición con la misma {HEADER} en curso', self.retry_after)
+
+    @staticmethod
+    def _replay(stored):
+        response = current_app.response_class(stored['body'], status=stored['status'], content_type=stored['content_type'])
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _store(self, response):
+        state = g.pop('idempotency', None)
+        if state is None:
+            return response
+
+        store_key, digest = state
+        if response.status_code >= 500 or response.is_streamed:
+            self.backend.delete(store_key)
+            return response
+
+        reader = request.environ.get('wsgi.input')
+        if isinstance(reader, _HashingReader):
+            # Sin Content-Length solo se lee hasta el final si el servidor marca el fin de la entrada
+            if request.content_length is not None:
+                reader.drain(request.content_length - reader.consumed)
+            elif request.environ.get('wsgi.input_terminated'):
+                reader.drain(None)
+
+        self.backend.set(store_key, {
+            'fingerprint': digest.hexdigest(),
+            'response': {
+                'status': response.status_code,
+                'body': response.get_data(as_text=True),
+                'content_type': response.content_type
+            }
+        }, self.ttl)
+        return response
+
+    def _release(self, exc):
+        """Si la vista falló sin llegar a after_request, la clave queda libre para reintentar"""
+        state = g.pop('idempotency', None)
+        if state is not None:
+            self.backend.delete(state[0])
+
+
+# Instancia compartida, inicializada en create_app
+idempotency_store = IdempotencyStore()
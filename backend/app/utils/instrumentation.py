@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models import db
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Cuenta las sentencias SQL ejecutadas dentro del bloque
+    Pensado para tests: permite comprobar que un endpoint de listado
+    lanza un número constante de queries sea cual sea el número de filas
+
+    Uso:
+        with app.app_context(), count_queries() as statements:
+            client.get('/api/reservations')
+        assert len(statements) == 1
+    """
+    engine = engine or db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
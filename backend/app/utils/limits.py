@@ -0,0 +1,191 @@
+import threading
+import time
+from sqlalchemy import case, delete, func, select, tuple_
+from app.models import db, ALL_RESTAURANTS, CapacityLimit, CapacityLimitOverride
+
+
+class CapacityLimits:
+    """
+    Límites de reservas por restaurante y fecha, en memoria del proceso
+    Resolución: límite de la fecha (capacity_limit_overrides) > límite del
+    restaurante (capacity_limits) > MAX_TABLES_PER_RESTAURANT o, para el total
+    del día (ALL_RESTAURANTS), MAX_RESERVATIONS_PER_DAY.
+        - Las dos tablas se cargan enteras (una fila por restaurante y festivo)
+        - Un cambio por la API invalida la caché del proceso que lo hace
+        - Los demás workers recargan cada CAPACITY_LIMITS_RELOAD_INTERVAL segundos
+    La caché sirve las lecturas (disponibilidad, calendario, analítica). La
+    admisión compara con los límites guardados en la BD (limit_clause y
+    stored_limits) dentro de su transacción, así que un cambio hecho en otro
+    worker se aplica aunque esta caché aún no se haya recargado.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._defaults = {}
+        self._overrides = {}
+        self._restaurant_default = 15
+        self._daily_default = 20
+        self._reload_interval = 60
+        self._loaded_at = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._restaurant_default = app.config['MAX_TABLES_PER_RESTAURANT']
+        self._daily_default = app.config['MAX_RESERVATIONS_PER_DAY']
+        self._reload_interval = app.config.get('CAPACITY_LIMITS_RELOAD_INTERVAL', 60)
+        self._loaded_at = None
+        app.extensions['capacity_limits'] = self
+
+    def stale(self):
+        """True si hay que recargar (nunca cargada, invalidada o pasado el intervalo)"""
+        if self._loaded_at is None:
+            return True
+        return bool(self._reload_interval) and time.monotonic() - self._loaded_at >= self._reload_interval
+
+    def reload(self, session=None):
+        """
+        Carga los límites con dos SELECT
+        Args:
+            session: sesión síncrona (por defecto db.session; en ASGI la de run_sync)
+        """
+        session = session or db.session
+        defaults = dict(session.execute(select(CapacityLimit.restaurant_id, CapacityLimit.max_reservations)).all())
+        overrides = {
+            (restaurant_id, limit_date): max_reservations
+            for restaurant_id, limit_date, max_reservations in session.execute(select(
+                CapacityLimitOverride.restaurant_id, CapacityLimitOverride.limit_date, CapacityLimitOverride.max_reservations
+            ))
+        }
+        with self._lock:
+            self._defaults = defaults
+            self._overrides = overrides
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Fuerza la recarga en la próxima consulta (tras un cambio de límites)"""
+        self._loaded_at = None
+
+    def limit(self, restaurant_id, reservation_date, reload=True):
+        """
+        Límite de reservas de un restaurante (o del total, ALL_RESTAURANTS) en una fecha
+        Con reload=False no se consulta la BD aunque la caché esté caducada (event loop ASGI)
+        """
+        if reload and self.stale():
+            self.reload()
+        override = self._overrides.get((restaurant_id, reservation_date))
+        if override is not None:
+            return override
+        default = self._defaults.get(restaurant_id)
+        if default is not None:
+            return default
+        return self.fallback(restaurant_id)
+
+    def limit_clause(self, restaurant_id, reservation_date):
+        """
+        Límite guardado en la BD como expresión SQL, con la misma resolución que limit()
+        (dos subconsultas por clave primaria, para el UPDATE condicional de la admisión)
+        restaurant_id y la fecha pueden ser valores o columnas (capacidad de daily_occupancy).
+        """
+        override = select(CapacityLimitOverride.max_reservations).where(
+            CapacityLimitOverride.restaurant_id == restaurant_id,
+            CapacityLimitOverride.limit_date == reservation_date
+        ).scalar_subquery()
+        default = select(CapacityLimit.max_reservations).where(CapacityLimit.restaurant_id == restaurant_id).scalar_subquery()
+        if isinstance(restaurant_id, int):
+            fallback = self.fallback(restaurant_id)
+        else:
+            fallback = case((restaurant_id == ALL_RESTAURANTS, self._daily_default), else_=self._restaurant_default)
+        return func.coalesce(override, default, fallback)
+
+    def stored_limits(self, session, keys):
+        """
+        Límites guardados en la BD de varios (restaurant_id, fecha), con dos SELECT
+        Returns:
+            dict: {(restaurant_id, fecha): límite}
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        defaults = dict(session.execute(
+            select(CapacityLimit.restaurant_id, CapacityLimit.max_reservations)
+            .where(CapacityLimit.restaurant_id.in_({restaurant_id for restaurant_id, _ in keys}))
+        ).all())
+        overrides = {
+            (restaurant_id, limit_date): max_reservations
+            for restaurant_id, limit_date, max_reservations in session.execute(
+                select(CapacityLimitOverride.restaurant_id, CapacityLimitOverride.limit_date, CapacityLimitOverride.max_reservations)
+                .where(tuple_(CapacityLimitOverride.restaurant_id, CapacityLimitOverride.limit_date).in_(keys))
+            )
+        }
+        return {
+            (restaurant_id, limit_date): overrides.get(
+                (restaurant_id, limit_date), defaults.get(restaurant_id, self.fallback(restaurant_id))
+            )
+            for restaurant_id, limit_date in keys
+        }
+
+    def fallback(self, restaurant_id=None):
+        """Límite sin filas en la BD: MAX_RESERVATIONS_PER_DAY (total del día) o MAX_TABLES_PER_RESTAURANT"""
+        return self._daily_default if restaurant_id == ALL_RESTAURANTS else self._restaurant_default
+
+    def capacities(self, restaurant_ids, date_from, date_to, covered=None):
+        """
+        Suma de los límites diarios de cada restaurante (o del total) entre dos fechas incluidas
+        El límite del restaurante por los días del rango, corregido en las fechas con límite propio.
+
+        Args:
+            covered: {restaurant_id: (días, fechas con límite propio)} que no se suman
+                (días con la capacidad ya guardada en daily_occupancy)
+
+        Returns:
+            dict: {restaurant_id: reservas admisibles en el rango}
+        """
+        if self.stale():
+            self.reload()
+        covered = covered or {}
+        days = (date_to - date_from).days + 1
+        base = {restaurant_id: self._defaults.get(restaurant_id, self.fallback(restaurant_id)) for restaurant_id in restaurant_ids}
+        capacities = {
+            restaurant_id: limit * (days - covered.get(restaurant_id, (0, ()))[0])
+            for restaurant_id, limit in base.items()
+        }
+        for (restaurant_id, limit_date), max_reservations in self._overrides.items():
+            if restaurant_id not in capacities or not date_from <= limit_date <= date_to:
+                continue
+            if limit_date not in covered.get(restaurant_id, (0, ()))[1]:
+                capacities[restaurant_id] += max_reservations - base[restaurant_id]
+        return capacities
+
+    def override_keys(self, restaurant_ids, date_from, date_to):
+        """(restaurant_id, fecha) con límite propio entre dos fechas incluidas"""
+        if self.stale():
+            self.reload()
+        restaurant_ids = set(restaurant_ids)
+        return [
+            (restaurant_id, limit_date) for restaurant_id, limit_date in self._overrides
+            if restaurant_id in restaurant_ids and date_from <= limit_date <= date_to
+        ]
+
+    def limits(self, restaurant_id, reservation_date, reload=True):
+        """(límite del restaurante, límite del total del día) para una fecha"""
+        return (
+            self.limit(restaurant_id, reservation_date, reload),
+            self.limit(ALL_RESTAURANTS, reservation_date, reload)
+        )
+
+
+def delete_limits(db, restaurant_id):
+    """Borra los límites de un restaurante eliminado (el llamador hace commit e invalida la caché)"""
+    db.session.execute(
+        delete(CapacityLimit).where(CapacityLimit.restaurant_id == restaurant_id).execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(CapacityLimitOverride)
+        .where(CapacityLimitOverride.restaurant_id == restaurant_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Instancia compartida, inicializada en create_app
+capacity_limits = CapacityLimits()
@@ -0,0 +1,209 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites superiores de los buckets de los histogramas
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Métricas de la petición en curso atendida fuera de Flask (handlers de app/asgi.py)
+_native_request = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos (formato Prometheus)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """
+    Instrumentación por petición: endpoint, nº de sentencias SQL, tiempo en BD,
+    tiempo de serialización y tiempo total, agregados en histogramas por endpoint
+    y expuestos en /metrics con formato de texto de Prometheus.
+    Modo opcional de profiling muestreado: con PROFILE_SAMPLE_RATE > 0 se
+    perfila una fracción de las peticiones y se vuelcan las estadísticas de
+    cProfile de las que superan PROFILE_SLOW_MS en PROFILE_DIR.
+    Las peticiones que el modo ASGI atiende sin pasar por Flask se miden con
+    begin/end y se agregan con el mismo nombre de endpoint que la vista Flask.
+    """
+
+    SERIES = (
+        ('http_request_duration_seconds', 'Tiempo total de la petición', SECONDS_BUCKETS),
+        ('db_query_duration_seconds', 'Tiempo en la base de datos por petición', SECONDS_BUCKETS),
+        ('serialization_duration_seconds', 'Tiempo de serialización por petición', SECONDS_BUCKETS),
+        ('sql_statements_per_request', 'Sentencias SQL por petición', STATEMENT_BUCKETS)
+    )
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        self.profile_sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+        self.profile_slow_seconds = app.config.get('PROFILE_SLOW_MS', 500) / 1000
+        self.profile_dir = app.config.get('PROFILE_DIR')
+        self.enabled = True
+
+        # Listeners a nivel de clase Engine: cubren también los engines de réplicas
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+        app.extensions['request_metrics'] = self
+
+    @staticmethod
+    def _new_request():
+        return {'start': time.perf_counter(), 'statements': 0, 'db': 0.0, 'serialization': 0.0, 'depth': 0}
+
+    def _start_request(self):
+        if request.endpoint == 'metrics':
+            return
+        g.metrics = self._new_request()
+        if self.profile_sample_rate and random.random() < self.profile_sample_rate:
+            g.metrics['profiler'] = cProfile.Profile()
+            g.metrics['profiler'].enable()
+
+    def _finish_request(self, exc=None):
+        current = g.pop('metrics', None)
+        if current is None:
+            return
+        duration = self._record(current, request.endpoint or 'not_found', request.method)
+
+        profiler = current.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+            if duration >= self.profile_slow_seconds and self.profile_dir:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f'{endpoint}-{int(time.time() * 1000)}.prof'))
+
+    def _record(self, current, endpoint, method):
+        """Agrega una petición terminada; devuelve su duración"""
+        duration = time.perf_counter() - current['start']
+        with self._lock:
+            self._requests[(endpoint, method)] = self._requests.get((endpoint, method), 0) + 1
+            for (name, _, buckets), value in zip(self.SERIES, (duration, current['db'], current['serialization'], current['statements'])):
+                histogram = self._histograms.get((name, endpoint))
+                if histogram is None:
+                    histogram = self._histograms[(name, endpoint)] = Histogram(buckets)
+                histogram.observe(value)
+        return duration
+
+    def begin(self):
+        """
+        Empieza a medir una petición atendida fuera de Flask (modo ASGI)
+        Las sentencias SQL y los bloques serialization() del mismo contexto
+        (la corrutina del handler) cuentan para ella. Sin profiling.
+
+        Returns:
+            token para end(), o None si las métricas están desactivadas
+        """
+        if not self.enabled:
+            return None
+        current = self._new_request()
+        return current, _native_request.set(current)
+
+    def end(self, token, endpoint, method, record=True):
+        """Termina la medición de begin(); con record=False se descarta (p. ej. petición delegada en Flask)"""
+        if token is None:
+            return
+        current, context_token = token
+        _native_request.reset(context_token)
+        if record:
+            self._record(current, endpoint, method)
+
+    def render(self):
+        """Métricas en formato de texto de Prometheus"""
+        lines = [
+            '# HELP http_requests_total Peticiones atendidas',
+            '# TYPE http_requests_total counter'
+        ]
+        with self._lock:
+            for (endpoint, method), total in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}"}} {total}')
+
+            for name, description, buckets in self.SERIES:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (series, endpoint), histogram in sorted(self._histograms.items()):
+                    if series != name:
+                        continue
+                    cumulative = 0
+                    for upper, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{upper}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.total:.6f}')
+                    lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+        return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def _current():
+    return g.get('metrics') if has_request_context() else _native_request.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    if current is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    starts = conn.info.get('query_start')
+    if current is not None and starts:
+        current['db'] += time.perf_counter() - starts.pop()
+        current['statements'] += 1
+
+
+@contextmanager
+def serialization():
+    """Acumula el tiempo del bloque como serialización de la petición en curso"""
+    current = _current()
+    if current is None:
+        yield
+        return
+    # Solo cuenta el bloque más externo (dump de schema dentro de un listado, etc.)
+    current['depth'] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current['depth'] -= 1
+        if current['depth'] == 0:
+            current['serialization'] += time.perf_counter() - start
+
+
+# Instancia compartida, inicializada en create_app
+request_metrics = RequestMetrics()
@@ -0,0 +1,28 @@
+import base64
+import json
+from datetime import date, datetime
+
+
+def encode_cursor(reservation):
+    """
+    Genera el cursor opaco de la última reserva de una página
+    Contiene la clave de ordenación: (reservation_date, created_at, id)
+    """
+    payload = [reservation.reservation_date.isoformat(), reservation.created_at.isoformat(), reservation.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica un cursor generado por encode_cursor
+    Returns:
+        tuple: (reservation_date: date, created_at: datetime, id: int)
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        reservation_date, created_at, reservation_id = json.loads(base64.urlsafe_b64decode(padded))
+        return date.fromisoformat(reservation_date), datetime.fromisoformat(created_at), int(reservation_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as err:
+        raise ValueError('Cursor inválido') from err
@@ -0,0 +1,102 @@
+"""
+Consultas y cuerpos de respuesta de los listados de lectura
+Compartidos por las vistas Flask y los handlers asíncronos de app/asgi.py: las
+dos rutas construyen la misma query y el mismo JSON, y solo cambia cómo se
+ejecuta la query (sesión síncrona o asíncrona).
+"""
+from datetime import datetime
+from sqlalchemy import tuple_
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.serializers import restaurant_row_to_dict, reservation_row_to_dict, reservations_select
+
+INVALID_DATE_MESSAGE = 'Formato de fecha inválido. Use YYYY-MM-DD'
+
+
+def parse_date(value):
+    """
+    Fecha YYYY-MM-DD de la URL o de un query param
+    Raises:
+        ValueError: con el mensaje del 400
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError) as err:
+        raise ValueError(INVALID_DATE_MESSAGE) from err
+
+
+def reservations_list_query(source, restaurant_id=None, date_str=None, cursor=None):
+    """
+    SELECT del listado de reservas: filtros, cursor keyset y orden
+    (reservation_date, created_at, id descendentes, más recientes primero)
+
+    Args:
+        source: tabla de reservations_source() (viva o unida al histórico)
+    Raises:
+        ValueError: fecha o cursor inválidos, con el mensaje del 400
+    """
+    # Columnas como tuplas, con el restaurante anidado por JOIN (sin N+1)
+    query = reservations_select(source)
+
+    if restaurant_id:
+        query = query.where(source.c.restaurant_id == restaurant_id)
+
+    if date_str:
+        query = query.where(source.c.reservation_date == parse_date(date_str))
+
+    # Continuar tras la última reserva de la página anterior
+    if cursor:
+        query = query.where(
+            tuple_(source.c.reservation_date, source.c.created_at, source.c.id) < decode_cursor(cursor)
+        )
+
+    return query.order_by(
+        source.c.reservation_date.desc(),
+        source.c.created_at.desc(),
+        source.c.id.desc()
+    )
+
+
+def reservations_page_size(limit, config):
+    """
+    Tamaño de página del listado (limit acotado a RESERVATIONS_MAX_PAGE_SIZE)
+    Raises:
+        ValueError: limit menor que 1
+    """
+    if limit is not None and limit < 1:
+        raise ValueError('El parámetro limit debe ser mayor que 0')
+    return min(limit or config['RESERVATIONS_PAGE_SIZE'], config['RESERVATIONS_MAX_PAGE_SIZE'])
+
+
+def reservations_page(rows, page_size):
+    """
+    Cuerpo de una página del listado de reservas
+    rows trae una fila extra (query con limit page_size + 1) para saber si hay página siguiente
+    """
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        'success': True,
+        'data': [reservation_row_to_dict(row) for row in rows],
+        'count': len(rows),
+        'next_cursor': encode_cursor(rows[-1]) if has_more else None
+    }
+
+
+def restaurants_list_filters(args):
+    """
+    Filtros normalizados del listado de restaurantes y su clave en restaurants_cache
+    Returns:
+        tuple: (letter en mayúsculas, city en minúsculas, clave de caché)
+    """
+    letter = args.get('letter', '').strip().upper()
+    city = args.get('city', '').strip().lower()
+    return letter, city, f'{letter}|{city}'
+
+
+def restaurants_list(rows):
+    """Cuerpo del listado de restaurantes (filas de restaurants_list_select)"""
+    return {
+        'success': True,
+        'data': [restaurant_row_to_dict(row) for row in rows],
+        'count': len(rows)
+    }
@@ -0,0 +1,121 @@
+import itertools
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+# Prefijo de las claves de SQLALCHEMY_BINDS que corresponden a réplicas
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def use_primary(view):
+    """Marca una vista GET que debe leer siempre del primario (validación de capacidad)"""
+    view.use_primary = True
+    return view
+
+
+@contextmanager
+def primary():
+    """Fuerza el primario para las queries del bloque (p. ej. al rellenar una caché compartida)"""
+    if not has_request_context():
+        yield
+        return
+    g.primary_depth = g.get('primary_depth', 0) + 1
+    try:
+        yield
+    finally:
+        g.primary_depth -= 1
+
+
+class ReplicaRouter:
+    """
+    Enrutado de lecturas a réplicas (opcional, SQLALCHEMY_REPLICA_URIS)
+    Cada réplica se registra como un bind de Flask-SQLAlchemy; las peticiones
+    GET/HEAD se reparten entre ellas en round-robin (una réplica por petición)
+    y todo lo demás usa el primario: escrituras, vistas marcadas con
+    @use_primary, código fuera de una petición (arranque, CLI, hilos de fondo) y las
+    peticiones de un cliente que ha escrito hace menos de REPLICA_STICKY_SECONDS
+    (cookie de read-your-writes).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Debe llamarse antes de db.init_app: añade las réplicas a SQLALCHEMY_BINDS"""
+        uris = [
+            uri.replace('postgres://', 'postgresql://', 1) if uri.startswith('postgres://') else uri
+            for uri in app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+        ]
+        if not uris:
+            return
+
+        keys = [f'{REPLICA_BIND_PREFIX}{i}' for i in range(len(uris))]
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.update(zip(keys, uris))
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        app.extensions['replica_router'] = {
+            'cycle': itertools.cycle(keys),
+            'sticky_seconds': app.config.get('REPLICA_STICKY_SECONDS', 5),
+            'cookie_name': app.config.get('REPLICA_STICKY_COOKIE', 'read_primary_until')
+        }
+        app.after_request(self._mark_writer)
+
+    @staticmethod
+    def _mark_writer(response):
+        """Tras una escritura correcta, el cliente lee del primario durante la ventana configurada"""
+        state = current_app.extensions['replica_router']
+        if request.method not in READ_METHODS + ('OPTIONS',) and response.status_code < 400 and state['sticky_seconds']:
+            response.set_cookie(
+                state['cookie_name'],
+                str(time.time() + state['sticky_seconds']),
+                max_age=state['sticky_seconds'],
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+def _is_sticky(state):
+    """True si el cliente escribió hace menos de REPLICA_STICKY_SECONDS"""
+    try:
+        return float(request.cookies.get(state['cookie_name'], 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_bind_key():
+    """Bind de réplica para la petición en curso, o None si debe usarse el primario"""
+    if not has_request_context() or request.method not in READ_METHODS or g.get('primary_depth'):
+        return None
+
+    state = current_app.extensions.get('replica_router')
+    if state is None:
+        return None
+
+    if 'replica_bind' not in g:
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'use_primary', False) or _is_sticky(state):
+            g.replica_bind = None
+        else:
+            g.replica_bind = next(state['cycle'])
+    return g.replica_bind
+
+
+class RoutingSession(Session):
+    """Session de Flask-SQLAlchemy que envía las lecturas de las peticiones GET a una réplica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            key = replica_bind_key()
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# Instancia compartida, inicializada en create_app
+replica_router = ReplicaRouter()
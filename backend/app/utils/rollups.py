@@ -0,0 +1,178 @@
+from datetime import date, datetime
+from sqlalchemy import Date, Integer, case, cast, delete, func, insert, literal, select, union_all, update
+from app.models import ALL_RESTAURANTS, ArchivedReservation, DailyOccupancy, Reservation
+from app.utils.database import dialect_insert
+from app.utils.limits import capacity_limits
+
+# Tramos de antelación: (días máximos incluidos, columna); None = sin límite
+LEAD_BUCKETS = (
+    (0, 'lead_same_day'),
+    (1, 'lead_1_day'),
+    (7, 'lead_2_7_days'),
+    (30, 'lead_8_30_days'),
+    (None, 'lead_over_30_days')
+)
+
+COUNTERS = ('reservations', 'covers', 'lead_days') + tuple(column for _, column in LEAD_BUCKETS)
+
+UPSERT_BATCH_SIZE = 500
+
+
+def lead_days(reservation_date, created_at=None):
+    """Días de antelación de una reserva (0 si se hizo el mismo día); sin created_at, hoy"""
+    booked_on = (created_at or datetime.utcnow()).date()
+    return max((reservation_date - booked_on).days, 0)
+
+
+def lead_bucket(days):
+    """Columna del tramo de antelación"""
+    for max_days, column in LEAD_BUCKETS:
+        if max_days is None or days <= max_days:
+            return column
+
+
+def record_rollups(db, changes):
+    """
+    Aplica altas (+1) y bajas (-1) al resumen diario (restaurante y total del día)
+    Debe llamarse dentro de la transacción de la escritura, antes del commit.
+
+    Args:
+        changes: (restaurant_id, fecha, personas, created_at | None, +1 / -1)
+    """
+    deltas = {}
+    for restaurant_id, reservation_date, number_of_people, created_at, sign in changes:
+        days = lead_days(reservation_date, created_at)
+        for key in ((restaurant_id, reservation_date), (ALL_RESTAURANTS, reservation_date)):
+            row = deltas.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            row['reservations'] += sign
+            row['covers'] += sign * number_of_people
+            row['lead_days'] += sign * days
+            row[lead_bucket(days)] += sign
+    _apply(db, deltas)
+
+
+def _apply(db, deltas):
+    """
+    Suma {(restaurant_id, fecha): contadores} al resumen con upserts multifila
+    Las filas se escriben ordenadas por clave: dos escrituras concurrentes
+    bloquean las filas en el mismo orden (sin interbloqueos en PostgreSQL).
+    La capacidad se lee de los límites guardados en la BD dentro del mismo
+    upsert y solo se actualiza en fechas que no han pasado.
+    """
+    rows = [
+        {
+            'restaurant_id': restaurant_id,
+            'reservation_date': reservation_date,
+            **counters,
+            'capacity': capacity_limits.limit_clause(restaurant_id, reservation_date)
+        }
+        for (restaurant_id, reservation_date), counters in sorted(deltas.items())
+        if any(counters.values())
+    ]
+    # Lotes acotados: SQLite limita el número de parámetros por sentencia
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        statement = dialect_insert(db, DailyOccupancy).values(rows[start:start + UPSERT_BATCH_SIZE])
+        set_ = {column: getattr(DailyOccupancy, column) + getattr(statement.excluded, column) for column in COUNTERS}
+        set_['capacity'] = case(
+            (DailyOccupancy.reservation_date >= date.today(), statement.excluded.capacity),
+            else_=DailyOccupancy.capacity
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['restaurant_id', 'reservation_date'],
+            set_=set_
+        ))
+
+
+def refresh_capacity(connection, *conditions):
+    """
+    Copia los límites guardados en la BD a la capacidad de las filas de daily_occupancy
+    que cumplen las condiciones (tras cambiar un límite, solo fechas que no han pasado).
+    Recibe la conexión de la transacción en curso; el llamador hace commit.
+    """
+    connection.execute(
+        update(DailyOccupancy)
+        .where(*conditions)
+        .values(capacity=capacity_limits.limit_clause(DailyOccupancy.restaurant_id, DailyOccupancy.reservation_date))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _lead_days_column(connection, model):
+    """Antelación en días calculada en la BD (fecha de reserva - fecha de created_at, mínimo 0)"""
+    if connection.dialect.name == 'postgresql':
+        days = model.reservation_date - cast(model.created_at, Date)
+    else:
+        days = cast(func.julianday(model.reservation_date) - func.julianday(func.date(model.created_at)), Integer)
+    days = func.coalesce(days, 0)
+    return case((days < 0, 0), else_=days)
+
+
+def rebuild_rollups(connection):
+    """
+    Reconstruye daily_occupancy desde las reservas vivas y archivadas con un INSERT ... SELECT
+    Tras una carga masiva que no pasa por la API (flask seed) o al crear la
+    tabla sobre una BD con histórico. La capacidad de todas las filas pasa a
+    ser la de los límites actuales. Recibe la conexión de la transacción en
+    curso (db.session.connection() o la de una migración); el llamador hace commit.
+    """
+    connection.execute(delete(DailyOccupancy).execution_options(synchronize_session=False))
+
+    sources = [
+        select(
+            model.restaurant_id,
+            model.reservation_date,
+            model.number_of_people,
+            _lead_days_column(connection, model).label('lead_days')
+        )
+        for model in (Reservation, ArchivedReservation)
+    ]
+    source = union_all(*sources).subquery()
+
+    buckets = []
+    lower = 0
+    for max_days, column in LEAD_BUCKETS:
+        condition = source.c.lead_days >= lower if max_days is None else source.c.lead_days.between(lower, max_days)
+        buckets.append(func.sum(case((condition, 1), else_=0)).label(column))
+        lower = (max_days or 0) + 1
+
+    columns = ['restaurant_id', 'reservation_date', *COUNTERS]
+    connection.execute(insert(DailyOccupancy).from_select(columns, (
+        select(
+            source.c.restaurant_id,
+            source.c.reservation_date,
+            func.count(),
+            func.sum(source.c.number_of_people),
+            func.sum(source.c.lead_days),
+            *buckets
+        ).group_by(source.c.restaurant_id, source.c.reservation_date)
+    )))
+    # Totales del día a partir de las filas por restaurante ya agregadas
+    connection.execute(insert(DailyOccupancy).from_select(columns, (
+        select(
+            literal(ALL_RESTAURANTS),
+            DailyOccupancy.reservation_date,
+            *(func.sum(getattr(DailyOccupancy, column)) for column in COUNTERS)
+        ).group_by(DailyOccupancy.reservation_date)
+    )))
+    # Sin otro registro de los límites pasados, la capacidad se toma de los límites actuales
+    refresh_capacity(connection)
+
+
+def delete_rollups(db, restaurant_id):
+    """
+    Borra el resumen de un restaurante eliminado y lo descuenta del total de cada día
+    (sus reservas vivas y archivadas también se borran). El llamador hace commit.
+    """
+    rows = db.session.execute(
+        select(DailyOccupancy.reservation_date, *(getattr(DailyOccupancy, column) for column in COUNTERS))
+        .where(DailyOccupancy.restaurant_id == restaurant_id)
+    )
+    _apply(db, {
+        (ALL_RESTAURANTS, reservation_date): {column: -value for column, value in zip(COUNTERS, values)}
+        for reservation_date, *values in rows
+    })
+    db.session.execute(
+        delete(DailyOccupancy)
+        .where(DailyOccupancy.restaurant_id == restaurant_id)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,501 @@
+import heapq
+import itertools
+import math
+import re
+import threading
+import time
+import unicodedata
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import func, select
+from app.models import db, Restaurant
+from app.utils.replicas import primary
+from app.utils.serializers import RESTAURANT_COLUMNS, restaurant_row_to_dict
+
+# Peso de cada campo en la puntuación
+FIELD_WEIGHTS = (('name', 3.0), ('city', 2.0), ('description', 1.0))
+# Calidad de cada tipo de coincidencia de un término de la búsqueda
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.6
+MIN_PREFIX_LENGTH = 2
+# Palabras vacías: no se indexan ni cuentan en la búsqueda
+STOPWORDS = frozenset('a al con de del e el en la las lo los o para por un una y'.split())
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Minúsculas y sin acentos ('Málaga' -> 'malaga')"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(normalize(text)) if token not in STOPWORDS] if text else []
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Distancia de Damerau-Levenshtein (transposiciones incluidas) entre a y b
+    Corta en cuanto supera limit (devuelve limit + 1)
+    """
+    previous_previous, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """
+    Índice invertido en memoria de restaurantes (nombre, ciudad y descripción)
+        - Término -> {peso del campo: ids de restaurantes}; cada término de un
+          restaurante cuenta una sola vez, con el peso de su campo más relevante
+        - Trigrama -> términos del vocabulario, para tolerar errores de escritura
+        - Vocabulario ordenado para coincidencias por prefijo (búsqueda mientras se escribe)
+    Los conjuntos de ids son inmutables (frozenset): cada alta, modificación o baja
+    sustituye los conjuntos afectados. Una búsqueda solo expande sus términos y toma
+    referencias a esos conjuntos bajo el lock, y puntúa fuera de él con operaciones
+    de conjuntos (en C), sin bloquear las escrituras. SEARCH_MAX_TERMS y
+    SEARCH_MAX_EXPANSIONS acotan el trabajo de cada búsqueda.
+    Se construye al arrancar (con LAZY_STARTUP, en la primera búsqueda), se actualiza en el alta, modificación y baja de
+    restaurantes y se sincroniza con la BD cada SEARCH_REFRESH_INTERVAL segundos
+    (cambios hechos por otros workers) leyendo las filas con updated_at posterior a
+    la última sincronización menos SEARCH_REFRESH_OVERLAP segundos (transacciones que
+    confirman tarde) y comparando los ids si no cuadran su número y su suma.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self._refreshing = threading.Lock()
+        self._reset()
+        self._built = False
+        self._refresh_interval = 60
+        self._refresh_overlap = timedelta(seconds=300)
+        self._max_terms = 8
+        self._max_expansions = 500
+        self._max_combinations = 64
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self._documents = {}
+        self._sort_keys = {}
+        self._terms = {}
+        self._tiers = defaultdict(dict)
+        # id() de un conjunto de ids del índice -> (weakref, ids ordenados por nombre);
+        # la entrada desaparece cuando el conjunto se sustituye y ninguna búsqueda lo usa
+        self._ordered = {}
+        self._trigrams = defaultdict(set)
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._watermark = None
+        self._last_sync = 0.0
+
+    def init_app(self, app):
+        """Registra el índice en la app y lo construye desde la BD (salvo con LAZY_STARTUP)"""
+        self._refresh_interval = app.config.get('SEARCH_REFRESH_INTERVAL', 60)
+        self._refresh_overlap = timedelta(seconds=app.config.get('SEARCH_REFRESH_OVERLAP', 300))
+        self._max_terms = app.config.get('SEARCH_MAX_TERMS', 8)
+        self._max_expansions = app.config.get('SEARCH_MAX_EXPANSIONS', 500)
+        self._max_combinations = app.config.get('SEARCH_MAX_COMBINATIONS', 64)
+        app.extensions['restaurant_search'] = self
+        self._built = False
+        if not app.config.get('LAZY_STARTUP'):
+            with app.app_context():
+                self.rebuild()
+
+    def rebuild(self):
+        """Reconstruye el índice completo con una sola query"""
+        rows = db.session.execute(select(*RESTAURANT_COLUMNS, Restaurant.updated_at)).all()
+        with self._lock:
+            self._reset()
+            # Conjuntos mutables durante la carga y congelados al final (sin una copia por fila)
+            for row in rows:
+                self._index(row, bulk=True)
+            for tiers in self._tiers.values():
+                for weight, ids in tiers.items():
+                    tiers[weight] = frozenset(ids)
+            self._watermark = max((row.updated_at for row in rows if row.updated_at), default=None)
+            self._last_sync = time.monotonic()
+            self._built = True
+
+    def maybe_refresh(self):
+        """Aplica los cambios de otros workers si ha pasado el intervalo configurado"""
+        if not self._built:
+            # Primera búsqueda con LAZY_STARTUP: las búsquedas concurrentes esperan al índice
+            with self._refreshing:
+                if not self._built:
+                    with primary():
+                        self.rebuild()
+            return
+        if not self._refresh_interval or time.monotonic() - self._last_sync < self._refresh_interval:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            with primary():
+                self._refresh()
+        finally:
+            self._refreshing.release()
+
+    def _refresh(self):
+        query = select(*RESTAURANT_COLUMNS, Restaurant.updated_at)
+        if self._watermark is not None:
+            # Ventana solapada: una transacción que confirma después de la última
+            # sincronización puede traer un updated_at anterior a la marca
+            query = query.where(Restaurant.updated_at >= self._watermark - self._refresh_overlap)
+        changed = db.session.execute(query).all()
+        # Huella de los ids (cuántos y su suma): un alta recibe un id mayor que los
+        # existentes, así que una baja compensada por un alta también la cambia
+        fingerprint = tuple(db.session.execute(
+            select(func.count(Restaurant.id), func.coalesce(func.sum(Restaurant.id), 0))
+        ).one())
+
+        with self._lock:
+            for row in changed:
+                self._index(row)
+                if row.updated_at and (self._watermark is None or row.updated_at > self._watermark):
+                    self._watermark = row.updated_at
+            self._last_sync = time.monotonic()
+            # Bajas en otros workers o altas fuera de la ventana: solo se comparan los ids si no cuadra la huella
+            if fingerprint == (len(self._documents), sum(self._documents)):
+                return
+
+        existing = set(db.session.execute(select(Restaurant.id)).scalars())
+        with self._lock:
+            for restaurant_id in [rid for rid in self._documents if rid not in existing]:
+                self._unindex(restaurant_id)
+            missing = existing.difference(self._documents)
+        if missing:
+            rows = db.session.execute(
+                select(*RESTAURANT_COLUMNS, Restaurant.updated_at).where(Restaurant.id.in_(missing))
+            ).all()
+            with self._lock:
+                for row in rows:
+                    self._index(row)
+
+    def invalidate(self):
+        """Descarta el índice (cargas masivas fuera de la API): se reconstruye en la próxima búsqueda"""
+        with self._lock:
+            self._built = False
+
+    def add(self, restaurant):
+        """Indexa (o reindexa) un restaurante ya confirmado en la BD"""
+        with self._lock:
+            self._index(tuple(getattr(restaurant, column.key) for column in RESTAURANT_COLUMNS))
+
+    def remove(self, restaurant_id):
+        """Quita del índice un restaurante eliminado"""
+        with self._lock:
+            self._unindex(restaurant_id)
+
+    def _index(self, row, bulk=False):
+        document = restaurant_row_to_dict(row)
+        restaurant_id = document['id']
+        if self._documents.get(restaurant_id) == document:
+            return
+        self._unindex(restaurant_id)
+
+        terms = {}
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(document[field]):
+                terms[term] = max(terms.get(term, 0.0), weight)
+
+        self._documents[restaurant_id] = document
+        self._sort_keys[restaurant_id] = (normalize(document['name']), restaurant_id)
+        self._terms[restaurant_id] = terms
+        for term, weight in terms.items():
+            tiers = self._tiers[term]
+            if not tiers:
+                self._add_term(term)
+            if bulk:
+                tiers.setdefault(weight, set()).add(restaurant_id)
+            else:
+                tiers[weight] = tiers.get(weight, frozenset()) | {restaurant_id}
+
+    def _unindex(self, restaurant_id):
+        if self._documents.pop(restaurant_id, None) is None:
+            return
+        del self._sort_keys[restaurant_id]
+        for term, weight in self._terms.pop(restaurant_id).items():
+            tiers = self._tiers[term]
+            remaining = tiers[weight] - {restaurant_id}
+            if remaining:
+                tiers[weight] = remaining
+            else:
+                del tiers[weight]
+            if not tiers:
+                del self._tiers[term]
+                self._remove_term(term)
+
+    def _add_term(self, term):
+        self._vocabulary_dirty = True
+        # Los números no se buscan con errores
+        if not term.isalpha() or len(term) < 3:
+            return
+        for trigram in trigrams(term):
+            self._trigrams[trigram].add(term)
+
+    def _remove_term(self, term):
+        self._vocabulary_dirty = True
+        for trigram in trigrams(term):
+            terms = self._trigrams.get(trigram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._trigrams[trigram]
+
+    def _too_many(self, token):
+        return ValueError(
+            f'El término "{token}" coincide con demasiadas palabras (máximo {self._max_expansions}); '
+            'añada más letras'
+        )
+
+    def _expand(self, token):
+        """
+        Términos del vocabulario que casan con un término de la búsqueda
+        Returns:
+            list: [(término, calidad)] exacto y por prefijo o, si no hay ninguno, aproximados
+        Raises:
+            ValueError: más de SEARCH_MAX_EXPANSIONS términos
+        """
+        matches = [(token, EXACT)] if token in self._tiers else []
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            if self._vocabulary_dirty:
+                self._vocabulary = sorted(self._tiers)
+                self._vocabulary_dirty = False
+            position = bisect_left(self._vocabulary, token)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(token):
+                if self._vocabulary[position] != token:
+                    if len(matches) >= self._max_expansions:
+                        raise self._too_many(token)
+                    matches.append((self._vocabulary[position], PREFIX))
+                position += 1
+
+        if matches or len(token) < 3:
+            return matches
+
+        # Sin coincidencias: candidatos que comparten trigramas, verificados con distancia de edición
+        max_distance = 1 if len(token) <= 4 else 2
+        query_trigrams = trigrams(token)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for term in self._trigrams.get(trigram, ()):
+                shared[term] += 1
+
+        # Cada edición altera como mucho 3 trigramas del término
+        min_shared = max(1, len(query_trigrams) - 3 * max_distance)
+        fuzzy = []
+        for term, common in shared.items():
+            if common < min_shared or abs(len(term) - len(token)) > max_distance:
+                continue
+            distance = edit_distance(token, term, max_distance)
+            if distance <= max_distance:
+                if len(fuzzy) >= self._max_expansions:
+                    raise self._too_many(token)
+                fuzzy.append((term, FUZZY * (1 - distance / max(len(term), len(token)))))
+        return fuzzy
+
+    def _levels(self, token):
+        """
+        Restaurantes que casan con un término de la búsqueda, por nivel de puntuación
+        Returns:
+            list: [_Level] de mayor a menor puntuación; cada restaurante está solo
+                  en el nivel de su mejor coincidencia
+        """
+        sources = defaultdict(list)
+        for term, quality in self._expand(token):
+            for weight, ids in self._tiers[term].items():
+                sources[round(weight * quality, 3)].append(ids)
+
+        levels = []
+        excluded = []
+        for score in sorted(sources, reverse=True):
+            levels.append(_Level(score, sources[score], excluded))
+            excluded = excluded + levels[-1].sets
+        return levels
+
+    def _ordered_ids(self, ids, sort_key):
+        """Ids de un conjunto del índice ordenados por nombre (cacheados mientras el conjunto siga vivo)"""
+        # Por identidad: comparar dos frozenset por igualdad recorre sus elementos
+        key = id(ids)
+        entry = self._ordered.get(key)
+        if entry is not None and entry[0]() is ids:
+            return entry[1]
+        ordered = sorted(ids, key=sort_key)
+        self._ordered[key] = (weakref.ref(ids, lambda _, key=key: self._ordered.pop(key, None)), ordered)
+        return ordered
+
+    def _first_by_name(self, combination, limit, sort_key):
+        """
+        Los `limit` primeros ids por nombre que están en todos los niveles de la combinación
+        Si algún nivel procede de un solo conjunto del índice se recorre ya ordenado
+        comprobando la pertenencia al resto; si no, se materializa el menor nivel
+        """
+        sourced = [level for level in combination if len(level.sets) == 1]
+        if sourced:
+            driver = min(sourced, key=lambda level: level.size)
+            candidates = self._ordered_ids(driver.sets[0], sort_key)
+        else:
+            driver = min(combination, key=lambda level: level.size)
+            candidates = driver.ids()
+
+        # Filtros encadenados con métodos de set (la iteración no pasa por código Python)
+        matching = iter(candidates)
+        for level in combination:
+            if level is not driver:
+                matching = filter((level.sets[0] if len(level.sets) == 1 else level.ids()).__contains__, matching)
+            for ids in level.excluded:
+                matching = itertools.filterfalse(ids.__contains__, matching)
+
+        if sourced:
+            return list(itertools.islice(matching, limit))
+        return heapq.nsmallest(limit, matching, key=sort_key)
+
+    def _rank_combinations(self, per_token, limit, sort_key):
+        """
+        Ranking recorriendo las combinaciones de niveles (uno por término) de mayor a
+        menor puntuación total, hasta completar `limit` (pocas combinaciones)
+        """
+        totals = defaultdict(list)
+        for combination in itertools.product(*per_token):
+            totals[round(sum(level.score for level in combination), 3)].append(combination)
+
+        ranked = []
+        for total in sorted(totals, reverse=True):
+            pending = limit - len(ranked)
+            first = [rid for combination in totals[total] for rid in self._first_by_name(combination, pending, sort_key)]
+            if len(totals[total]) > 1:
+                first = heapq.nsmallest(pending, first, key=sort_key)
+            ranked += [(total, restaurant_id) for restaurant_id in first]
+            if len(ranked) >= limit:
+                break
+        return ranked
+
+    def _rank_groups(self, per_token, limit, sort_key):
+        """
+        Ranking por grupos de puntuación total (muchas combinaciones de niveles)
+        Cada término reparte los candidatos de cada grupo según su mejor coincidencia
+        y los grupos con la misma suma se funden: como mucho tantos grupos como
+        puntuaciones totales distintas, con operaciones de conjuntos lineales en las
+        coincidencias. Cada grupo recuerda el conjunto del índice más pequeño que lo
+        contiene, si lo hay, para recorrerlo ya ordenado.
+        """
+        unions = sorted((frozenset().union(*(level.ids() for level in levels)) for levels in per_token), key=len)
+        groups = {0.0: (unions[0].intersection(*unions[1:]), None)}
+        for levels in per_token:
+            regrouped = {}
+            for total, (members, source) in groups.items():
+                for level in levels:
+                    matched = members & level.ids()
+                    if not matched:
+                        continue
+                    superset = source
+                    if len(level.sets) == 1 and (source is None or level.size < len(source)):
+                        superset = level.sets[0]
+                    key = round(total + level.score, 3)
+                    if key in regrouped:
+                        merged, merged_source = regrouped[key]
+                        regrouped[key] = (merged | matched, merged_source if merged_source is superset else None)
+                    else:
+                        regrouped[key] = (matched, superset)
+                    members = members - matched
+                    if not members:
+                        break
+            groups = regrouped
+
+        ranked = []
+        for total in sorted(groups, reverse=True):
+            members, source = groups[total]
+            pending = limit - len(ranked)
+            # Recorrido esperado de la lista ordenada (pending * len(source) / len(members)) frente a ordenar members
+            if source is None or pending * len(source) >= len(members) ** 2:
+                first = heapq.nsmallest(pending, members, key=sort_key)
+            else:
+                ordered = self._ordered_ids(source, sort_key)
+                first = list(itertools.islice(filter(members.__contains__, ordered), pending))
+            ranked += [(total, restaurant_id) for restaurant_id in first]
+            if len(ranked) >= limit:
+                break
+        return ranked
+
+    def search(self, query, limit=20):
+        """
+        Busca restaurantes por nombre, ciudad y descripción
+        Puntuación: suma por término de la búsqueda del mejor peso de campo x calidad
+        de la coincidencia (exacta, prefijo o aproximada). Deben casar todos los
+        términos que existen en el índice; a igual puntuación se ordena por nombre.
+
+        Returns:
+            list: [(score, restaurant_dict)] ordenada por relevancia y nombre
+        Raises:
+            ValueError: más de SEARCH_MAX_TERMS términos o un término demasiado genérico
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if len(tokens) > self._max_terms:
+            raise ValueError(f'Demasiados términos en la búsqueda (máximo {self._max_terms})')
+        self.maybe_refresh()
+
+        # Bajo el lock solo se expanden los términos y se toman referencias a conjuntos inmutables
+        with self._lock:
+            per_token = [levels for levels in map(self._levels, tokens) if levels]
+            documents, sort_keys = self._documents, self._sort_keys
+        if not per_token:
+            return []
+
+        def sort_key(restaurant_id):
+            # Un restaurante dado de baja mientras se puntuaba va al final y se descarta
+            return sort_keys.get(restaurant_id) or (_LAST, restaurant_id)
+
+        if math.prod(map(len, per_token)) <= self._max_combinations:
+            ranked = self._rank_combinations(per_token, limit, sort_key)
+        else:
+            ranked = self._rank_groups(per_token, limit, sort_key)
+        results = [(total, documents.get(restaurant_id)) for total, restaurant_id in ranked]
+        return [(total, document) for total, document in results if document is not None]
+
+
+class _Level:
+    """
+    Restaurantes de un término de la búsqueda con una misma puntuación
+    Se representa sin copiar conjuntos: unión de conjuntos del índice (sets) menos
+    los de los niveles superiores del mismo término (excluded)
+    """
+
+    __slots__ = ('score', 'sets', 'excluded', 'size', '_union')
+
+    def __init__(self, score, sets, excluded):
+        self.score = score
+        self.sets = sets
+        self.excluded = excluded
+        self.size = sum(map(len, sets))
+        self._union = None
+
+    def ids(self):
+        """Unión de los conjuntos del nivel (sin descontar excluded)"""
+        if self._union is None:
+            self._union = self.sets[0] if len(self.sets) == 1 else frozenset().union(*self.sets)
+        return self._union
+
+
+# Clave de orden de un restaurante que ya no está en el índice
+_LAST = chr(0x10FFFF)
+
+
+# Índice compartido, inicializado en create_app
+restaurant_search = SearchIndex()
@@ -0,0 +1,151 @@
+from functools import partial
+from flask import current_app
+from sqlalchemy import func, select, union_all
+from app.models import Restaurant, Reservation, ArchivedReservation
+
+try:
+    import orjson
+except ImportError:  # encoder rápido opcional
+    orjson = None
+
+# Columnas que se leen como tuplas (mismo orden que los campos de los schemas)
+RESTAURANT_COLUMNS = (
+    Restaurant.id, Restaurant.name, Restaurant.description, Restaurant.address,
+    Restaurant.city, Restaurant.photo_url, Restaurant.created_at
+)
+RESERVATION_COLUMNS = (
+    Reservation.id, Reservation.restaurant_id, Reservation.customer_name, Reservation.customer_email,
+    Reservation.customer_phone, Reservation.reservation_date, Reservation.number_of_people, Reservation.start_time,
+    Reservation.duration_minutes, Reservation.table_id, Reservation.created_at
+)
+# Prefijo de las columnas del restaurante anidado (evita choques de nombre con la reserva)
+NESTED_PREFIX = 'restaurant__'
+
+# Carácter de escape de los patrones LIKE construidos con texto del usuario
+LIKE_ESCAPE = '\\'
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _hhmm(value):
+    return value.strftime('%H:%M') if value is not None else None
+
+
+def restaurants_select():
+    """SELECT de las columnas de RestaurantSchema"""
+    return select(*RESTAURANT_COLUMNS)
+
+
+def escape_like(value):
+    """Escapa los comodines de LIKE (% y _) para que value se compare literalmente"""
+    return value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace('%', f'{LIKE_ESCAPE}%').replace('_', f'{LIKE_ESCAPE}_')
+
+
+def restaurants_list_select(letter='', city=''):
+    """
+    Listado de restaurantes por inicial del nombre y subcadena de la ciudad, ordenado por nombre
+    Los filtros son literales (sin comodines), igual que la comprobación en
+    Python con la que se invalidan los listados cacheados.
+    """
+    query = restaurants_select()
+    if letter:
+        # lower(name) LIKE 'x%' usa el índice de prefijo en PostgreSQL
+        query = query.where(func.lower(Restaurant.name).like(f'{escape_like(letter.lower())}%', escape=LIKE_ESCAPE))
+    if city:
+        query = query.where(Restaurant.city.ilike(f'%{escape_like(city)}%', escape=LIKE_ESCAPE))
+    return query.order_by(Restaurant.name)
+
+
+def reservations_source(include_archived=False):
+    """
+    Tabla de la que se leen las reservas: solo las vivas o, con include_archived,
+    la unión con el histórico archivado (mismas columnas, accesibles por .c)
+    """
+    if not include_archived:
+        return Reservation.__table__
+    archived = [getattr(ArchivedReservation, column.key) for column in RESERVATION_COLUMNS]
+    return union_all(select(*RESERVATION_COLUMNS), select(*archived)).subquery('reservations')
+
+
+def reservations_select(source=None):
+    """SELECT de las columnas de ReservationSchema + restaurante anidado (LEFT JOIN)"""
+    source = Reservation.__table__ if source is None else source
+    nested = [column.label(f'{NESTED_PREFIX}{column.key}') for column in RESTAURANT_COLUMNS]
+    columns = [source.c[column.key] for column in RESERVATION_COLUMNS]
+    return select(*columns, *nested).select_from(source).outerjoin(Restaurant, source.c.restaurant_id == Restaurant.id)
+
+
+def restaurant_row_to_dict(row, offset=0):
+    """Tupla de RESTAURANT_COLUMNS -> mismo dict que RestaurantSchema().dump()"""
+    id, name, description, address, city, photo_url, created_at = row[offset:offset + 7]
+    if id is None:
+        return None
+    return {
+        'id': id,
+        'name': name,
+        'description': description,
+        'address': address,
+        'city': city,
+        'photo_url': photo_url,
+        'created_at': _iso(created_at)
+    }
+
+
+def reservation_row_to_dict(row, restaurants=None):
+    """
+    Tupla de reservations_select() -> mismo dict que ReservationSchema().dump()
+    Con restaurants (dict), el restaurante anidado se serializa una vez por id y se reutiliza
+    """
+    (id, restaurant_id, customer_name, customer_email, customer_phone, reservation_date, number_of_people,
+     start_time, duration_minutes, table_id, created_at) = row[:11]
+    if restaurants is None:
+        restaurant = restaurant_row_to_dict(row, offset=11)
+    elif restaurant_id in restaurants:
+        restaurant = restaurants[restaurant_id]
+    else:
+        restaurant = restaurants[restaurant_id] = restaurant_row_to_dict(row, offset=11)
+    return {
+        'id': id,
+        'restaurant_id': restaurant_id,
+        'customer_name': customer_name,
+        'customer_email': customer_email,
+        'customer_phone': customer_phone,
+        'reservation_date': _iso(reservation_date),
+        'number_of_people': number_of_people,
+        'start_time': _hhmm(start_time),
+        'duration_minutes': duration_minutes,
+        'table_id': table_id,
+        'created_at': _iso(created_at),
+        'restaurant': restaurant
+    }
+
+
+def _fast_encoder_enabled():
+    return orjson is not None and current_app.config.get('FAST_JSON_ENCODER') == 'orjson'
+
+
+def encode_json(payload):
+    """
+    Codifica a bytes igual que jsonify (claves ordenadas, compacto, ASCII)
+    Con FAST_JSON_ENCODER = 'orjson' usa orjson si está instalado: mismo JSON,
+    pero los caracteres no ASCII se emiten en UTF-8 en lugar de escaparse
+    """
+    if _fast_encoder_enabled():
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    provider = current_app.json
+    if (provider.compact is None and current_app.debug) or provider.compact is False:
+        return f'{provider.dumps(payload, indent=2)}\n'.encode()
+    return f'{provider.dumps(payload, separators=(",", ":"))}\n'.encode()
+
+
+def ndjson_encoder():
+    """
+    Función objeto -> línea NDJSON (siempre compacta)
+    Se resuelve una vez por respuesta, con contexto de app, y se usa en el bucle de filas o eventos
+    """
+    if _fast_encoder_enabled():
+        return partial(orjson.dumps, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    dumps = current_app.json.dumps
+    return lambda payload: f'{dumps(payload, separators=(",", ":"))}\n'.encode()
@@ -0,0 +1,285 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import g, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Camino de escritura: métodos protegidos por defecto (THROTTLE_METHODS)
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# Peso de cada sentencia nueva en la media móvil de latencia de la BD
+LATENCY_SMOOTHING = 0.2
+
+
+def retry_later(status, message, retry_after):
+    """Respuesta 429/503 con Retry-After (segundos enteros, mínimo 1)"""
+    seconds = max(1, math.ceil(retry_after))
+    response = jsonify({
+        'success': False,
+        'message': message,
+        'retry_after': seconds
+    })
+    response.status_code = status
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+
+def client_identity():
+    """IP del cliente (detrás de un proxy, la de X-Forwarded-For con TRUSTED_PROXY_COUNT)"""
+    return request.remote_addr
+
+
+def _restaurant_identity():
+    """restaurant_id de la URL o del cuerpo JSON; None si la petición no lo trae (p. ej. /bulk)"""
+    restaurant_id = (request.view_args or {}).get('restaurant_id')
+    if restaurant_id is None:
+        # Los cuerpos CSV/NDJSON no son JSON: get_json devuelve None sin leerlos
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            restaurant_id = body.get('restaurant_id')
+    return restaurant_id
+
+
+# Ámbitos de RATE_LIMITS: (clave del bucket, mensaje del 429)
+SCOPES = {
+    'client': (client_identity, 'Demasiadas peticiones desde este cliente'),
+    'restaurant': (_restaurant_identity, 'Demasiadas peticiones para este restaurante')
+}
+
+
+class MemoryTokenBuckets:
+    """Token buckets en memoria del proceso, con desalojo LRU de las claves inactivas"""
+
+    def __init__(self, max_keys=10000):
+        self._max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Consume un token de key; devuelve 0 si lo había o los segundos hasta el siguiente"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisTokenBuckets:
+    """
+    Token buckets compartidos entre workers (requiere el paquete redis)
+    Un script Lua rellena y descuenta el bucket de forma atómica con el reloj
+    de Redis; la clave caduca cuando el bucket volvería a estar lleno.
+    """
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, namespace='rate-limit'):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._namespace = namespace
+        self._take = self._client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst):
+        # Los números de Lua llegan truncados a entero: la espera vuelve como texto
+        return float(self._take(keys=[f'{self._namespace}:{key}'], args=[rate, burst]))
+
+    def clear(self):
+        for key in self._client.scan_iter(f'{self._namespace}:*'):
+            self._client.delete(key)
+
+
+class RateLimiter:
+    """
+    Rate limiting de las escrituras con token buckets, por cliente y por restaurante
+    RATE_LIMITS configura cada blueprint: {blueprint: {ámbito: (tokens por
+    segundo, ráfaga)}}, con los ámbitos 'client' (IP del cliente) y
+    'restaurant' (restaurant_id de la URL o del cuerpo JSON). Una petición de
+    THROTTLE_METHODS que encuentra un bucket vacío recibe 429 con Retry-After
+    sin ejecutar la vista. Backend configurable con RATE_LIMIT_BACKEND:
+    'memory' (por proceso: con N workers el límite efectivo es N veces el
+    configurado) o 'redis' (compartido entre workers). Desactivado salvo con
+    RATE_LIMIT_ENABLED; el ámbito 'client' exige TRUSTED_PROXY_COUNT detrás
+    de un proxy, o todos los clientes comparten su IP (ver init_app).
+    """
+
+    def __init__(self, app=None):
+        self.backend = MemoryTokenBuckets()
+        self.limits = {}
+        self.methods = WRITE_METHODS
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('RATE_LIMIT_ENABLED', False):
+            return
+
+        self.limits = app.config.get('RATE_LIMITS') or {}
+        for blueprint, scopes in self.limits.items():
+            unknown = set(scopes) - set(SCOPES)
+            if unknown:
+                raise ValueError(f'RATE_LIMITS[{blueprint!r}]: ámbitos desconocidos {sorted(unknown)}')
+        if not app.config.get('TRUSTED_PROXY_COUNT') and any('client' in scopes for scopes in self.limits.values()):
+            # Sin proxies de confianza remote_addr es la IP del cliente solo si nadie se interpone
+            app.logger.warning(
+                'Rate limiting por cliente con TRUSTED_PROXY_COUNT=0: detrás de un proxy '
+                'todos los clientes comparten el bucket de su IP'
+            )
+        self.methods = tuple(app.config.get('THROTTLE_METHODS', WRITE_METHODS))
+        if app.config.get('RATE_LIMIT_BACKEND') == 'redis':
+            self.backend = RedisTokenBuckets(app.config['RATE_LIMIT_REDIS_URL'])
+        else:
+            self.backend = MemoryTokenBuckets(app.config.get('RATE_LIMIT_MAX_KEYS', 10000))
+        app.extensions['rate_limiter'] = self
+
+        app.before_request(self._check)
+
+    def _check(self):
+        if request.method not in self.methods:
+            return None
+        scopes = self.limits.get(request.blueprint)
+        if not scopes:
+            return None
+
+        for scope, (rate, burst) in scopes.items():
+            identity_func, message = SCOPES[scope]
+            identity = identity_func()
+            if identity is None:
+                continue
+            wait = self.backend.take(f'{request.blueprint}:{scope}:{identity}', rate, burst)
+            if wait:
+                return retry_later(429, message, wait)
+        return None
+
+
+class LoadShedder:
+    """
+    Load shedding de las escrituras: 503 inmediato con Retry-After si el worker está saturado
+    Dos señales, medidas en cada proceso:
+        - cola: escrituras en curso (LOAD_SHED_MAX_INFLIGHT); con gunicorn
+          --threads, deja hilos libres para las lecturas
+        - latencia de la BD: media móvil del tiempo por sentencia SQL
+          (LOAD_SHED_DB_LATENCY_MS). Una media sin muestras en los últimos
+          LOAD_SHED_LATENCY_WINDOW segundos no cuenta: las lecturas, que no se
+          descartan, la bajan, y sin tráfico el camino se reabre solo.
+    Se aplica a THROTTLE_METHODS de los blueprints de LOAD_SHED_BLUEPRINTS,
+    antes del rate limiting (una petición descartada no gasta tokens).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.latency = 0.0
+        self.sampled_at = 0.0
+        self.blueprints = set()
+        self.methods = WRITE_METHODS
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('LOAD_SHED_ENABLED', False):
+            return
+
+        self.blueprints = set(app.config.get('LOAD_SHED_BLUEPRINTS') or ())
+        self.methods = tuple(app.config.get('THROTTLE_METHODS', WRITE_METHODS))
+        self.max_inflight = app.config.get('LOAD_SHED_MAX_INFLIGHT', 8)
+        self.latency_threshold = app.config.get('LOAD_SHED_DB_LATENCY_MS', 250) / 1000
+        self.latency_window = app.config.get('LOAD_SHED_LATENCY_WINDOW', 5)
+        self.retry_after = app.config.get('LOAD_SHED_RETRY_AFTER', 1)
+
+        # Listeners a nivel de clase Engine, como las métricas: cubren también las réplicas
+        if self.latency_threshold and not event.contains(Engine, 'before_cursor_execute', _start_statement):
+            event.listen(Engine, 'before_cursor_execute', _start_statement)
+            event.listen(Engine, 'after_cursor_execute', _end_statement)
+            event.listen(Engine, 'handle_error', _failed_statement)
+        app.extensions['load_shedder'] = self
+
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def observe(self, seconds):
+        """Añade la duración de una sentencia a la media (sin lock: perder una muestra no la cambia)"""
+        self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+        self.sampled_at = time.monotonic()
+
+    def _slow_database(self):
+        return (
+            self.latency_threshold
+            and self.latency > self.latency_threshold
+            and time.monotonic() - self.sampled_at < self.latency_window
+        )
+
+    def _admit(self):
+        if request.method not in self.methods or request.blueprint not in self.blueprints:
+            return None
+
+        with self._lock:
+            if self.max_inflight and self.inflight >= self.max_inflight:
+                message = 'Servidor saturado: demasiadas escrituras en curso'
+            elif self._slow_database():
+                message = 'Servidor saturado: la base de datos responde con retraso'
+            else:
+                self.inflight += 1
+                g.load_shed_slot = True
+                return None
+        return retry_later(503, message, self.retry_after)
+
+    def _release(self, exc=None):
+        if g.pop('load_shed_slot', False):
+            with self._lock:
+                self.inflight -= 1
+
+
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('shed_statement_start', []).append(time.perf_counter())
+
+
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('shed_statement_start')
+    if starts:
+        load_shedder.observe(time.perf_counter() - starts.pop())
+
+
+def _failed_statement(context):
+    """Una sentencia que falla (p. ej. 'database is locked' tras el busy timeout) también cuenta"""
+    starts = context.connection.info.get('shed_statement_start') if context.connection is not None else None
+    if starts:
+        load_shedder.observe(time.perf_counter() - starts.pop())
+
+
+# Instancias compartidas, inicializadas en create_app
+load_shedder = LoadShedder()
+rate_limiter = RateLimiter()
@@ -1,43 +1,70 @@
-from app.models import Reservation
-from config import Config
-from sqlalchemy import func
+from app.utils.admission import calendar_counts
+from app.utils.limits import capacity_limits
 
-def validate_restaurant_availability(db, restaurant_id, reservation_date):
-    """
-    Valida que el restaurante tenga mesas disponibles para la fecha
-    Regla: Máximo 15 reservas por día por restaurante
-    
-    Returns:
-        tuple: (is_valid: bool, message: str, available_tables: int)
-    """
-    # Contar reservas existentes para ese restaurante en esa fecha
-    existing_reservations = db.session.query(func.count(Reservation.id)).filter(
-        Reservation.restaurant_id == restaurant_id,
-        Reservation.reservation_date == reservation_date
-    ).scalar()
+def restaurant_availability(existing_reservations, max_reservations):
+    """Disponibilidad del restaurante a partir de sus reservas del día (ya contadas) y su límite"""
+    available_tables = max(max_reservations - existing_reservations, 0)
     
-    available_tables = Config.MAX_TABLES_PER_RESTAURANT - existing_reservations
-    
-    if existing_reservations >= Config.MAX_TABLES_PER_RESTAURANT:
+    if existing_reservations >= max_reservations:
         return False, f'No hay mesas disponibles en este restaurante para la fecha seleccionada', 0
     
     return True, 'Mesa disponible', available_tables
 
 
-def validate_daily_reservation_limit(db, reservation_date):
+def daily_limit(total_reservations, max_reservations):
+    """Límite diario a partir de las reservas totales del día (ya contadas) y su límite"""
+    if total_reservations >= max_reservations:
+        return False, f'Se ha alcanzado el límite de {max_reservations} reservas para esta fecha', total_reservations
+    
+    return True, 'Dentro del límite diario', total_reservations
+
+
+def availability_summary(existing_reservations, total_reservations, limits):
     """
-    Valida que no se excedan las 20 reservas totales del día
-    Regla: Máximo 20 reservas por día en TODOS los restaurantes
+    Cuerpo de la consulta de disponibilidad a partir de los contadores (ya contados)
+    Compartido por check_availability, su versión ASGI y el stream de disponibilidad
+
+    Args:
+        limits: (límite del restaurante, límite del día) de capacity_limits.limits()
+    """
+    restaurant_limit, day_limit = limits
+    is_valid_restaurant, msg_restaurant, available = restaurant_availability(existing_reservations, restaurant_limit)
+    is_valid_daily, msg_daily, total = daily_limit(total_reservations, day_limit)
     
-    Returns:
-        tuple: (is_valid: bool, message: str, total_reservations: int)
+    return {
+        'available': is_valid_restaurant and is_valid_daily,
+        'restaurant': {
+            'available_tables': available,
+            'message': msg_restaurant
+        },
+        'daily_limit': {
+            'total_reservations': total,
+            'remaining': max(day_limit - total, 0),
+            'message': msg_daily
+        }
+    }
+
+
+def availability_calendar(db, restaurant_id, date_from, date_to):
     """
-    # Contar todas las reservas para esa fecha (todos los restaurantes)
-    total_reservations = db.session.query(func.count(Reservation.id)).filter(
-        Reservation.reservation_date == reservation_date
-    ).scalar()
+    Calcula la disponibilidad de un restaurante para cada día de un rango
+    Las reservas salen de los contadores de daily_capacity (calendar_counts),
+    igual que la consulta de un día; solo se cuentan en reservations los días
+    que aún no tienen contador.
     
-    if total_reservations >= Config.MAX_RESERVATIONS_PER_DAY:
-        return False, f'Se ha alcanzado el límite de {Config.MAX_RESERVATIONS_PER_DAY} reservas para esta fecha', total_reservations
+    Returns:
+        list: [{'date', 'available', 'available_tables', 'remaining_daily'}] por día
+    """
+    calendar = []
+    for day, (restaurant_total, daily_total) in calendar_counts(db, restaurant_id, date_from, date_to).items():
+        restaurant_limit, day_limit = capacity_limits.limits(restaurant_id, day)
+        available_tables = max(restaurant_limit - restaurant_total, 0)
+        remaining_daily = max(day_limit - daily_total, 0)
+        calendar.append({
+            'date': day.isoformat(),
+            'available': available_tables > 0 and remaining_daily > 0,
+            'available_tables': available_tables,
+            'remaining_daily': remaining_daily
+        })
     
-    return True, 'Dentro del límite diario', total_reservations
\ No newline at end of file
+    return calendar
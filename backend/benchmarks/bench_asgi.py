@@ -0,0 +1,183 @@
+"""
+Throughput con muchas conexiones concurrentes: WSGI (gunicorn, run:app) frente a ASGI (uvicorn, asgi:app)
+Siembra una BD, arranca cada servidor en un subproceso contra ella (DATABASE_URL)
+y lanza peticiones de lectura (listado/detalle de restaurantes, listado de
+reservas y disponibilidad) desde un cliente asyncio con N conexiones simultáneas.
+
+Uso (desde backend/, requiere requirements-asgi.txt):
+    python -m benchmarks.bench_asgi --connections 200 --requests 5000 --workers 4
+    python -m benchmarks.bench_asgi --database-url postgresql://localhost/bench --output asgi.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from benchmarks.common import make_config, seed
+from benchmarks.run import percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(kind, port, args):
+    if kind == 'wsgi':
+        command = ['gunicorn', '-w', str(args.workers), '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+        if args.threads > 1:
+            command += ['--threads', str(args.threads)]
+        return command + ['run:app']
+    return ['uvicorn', 'asgi:app', '--workers', str(args.workers), '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'warning', '--no-access-log']
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'el servidor terminó al arrancar (código {process.returncode})')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'el servidor no escucha en el puerto {port}')
+
+
+async def fetch(port, path):
+    """GET HTTP/1.1 mínimo (una conexión por petición); devuelve el código de estado"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def load(port, paths, connections):
+    latencies = []
+    statuses = Counter()
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    async def client():
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                statuses[await fetch(port, path)] += 1
+            except (OSError, IndexError, ValueError):
+                statuses['error'] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        'requests': len(paths),
+        'connections': connections,
+        'throughput_rps': round(len(paths) / elapsed, 1),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'status_codes': {str(code): total for code, total in sorted(statuses.items(), key=str)}
+    }
+
+
+def build_paths(restaurant_ids, args):
+    """Mezcla de lecturas de la app móvil (misma secuencia para los dos servidores)"""
+    rng = random.Random(7)
+    letters = [chr(65 + i) for i in range(26)]
+    days = [date(2030, 1, 1) + timedelta(days=i) for i in range(365)]
+    paths = []
+    for i in range(args.requests):
+        kind = i % 4
+        if kind == 0:
+            paths.append(f'/api/restaurants?letter={rng.choice(letters)}')
+        elif kind == 1:
+            paths.append(f'/api/restaurants/{rng.choice(restaurant_ids)}')
+        elif kind == 2:
+            paths.append(f'/api/reservations?limit={args.page_size}&restaurant_id={rng.choice(restaurant_ids)}')
+        else:
+            paths.append(f'/api/reservations/availability/{rng.choice(restaurant_ids)}/{rng.choice(days).isoformat()}')
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='BD de pruebas (por defecto un SQLite temporal)')
+    parser.add_argument('--restaurants', type=int, default=100)
+    parser.add_argument('--reservations', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--connections', type=int, default=200, help='conexiones simultáneas del cliente')
+    parser.add_argument('--workers', type=int, default=2, help='procesos de cada servidor')
+    parser.add_argument('--threads', type=int, default=1, help='hilos por worker de gunicorn')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--servers', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+    parser.add_argument('--output', help='fichero JSON de resultados (por defecto stdout)')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models import db, Restaurant
+
+    app = create_app(make_config(args.database_url))
+    with app.app_context():
+        seed(db, args.restaurants, args.reservations)
+        restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id).order_by(Restaurant.id)]
+        database_url = db.engine.url.render_as_string(hide_password=False)
+        db.engine.dispose()
+
+    paths = build_paths(restaurant_ids, args)
+    results = {
+        'meta': {
+            'database': database_url.split(':', 1)[0],
+            'restaurants': args.restaurants,
+            'reservations': args.reservations,
+            'workers': args.workers
+        },
+        'servers': {}
+    }
+
+    env = {**os.environ, 'DATABASE_URL': database_url, 'METRICS_ENABLED': 'false'}
+    for kind in args.servers:
+        port = free_port()
+        process = subprocess.Popen(server_command(kind, port, args), cwd=BACKEND_DIR, env=env)
+        try:
+            wait_for_port(port, process)
+            # Calentamiento: cachés de respuestas y pools de conexiones de todos los workers
+            asyncio.run(load(port, paths[:args.connections], args.connections))
+            results['servers'][kind] = asyncio.run(load(port, paths, args.connections))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        summary = results['servers'][kind]
+        print(f'{kind:<5} {summary["throughput_rps"]:>9} req/s  p50 {summary["p50_ms"]:>8}ms  '
+              f'p95 {summary["p95_ms"]:>8}ms  p99 {summary["p99_ms"]:>8}ms  {summary["status_codes"]}', file=sys.stderr)
+
+    if len(results['servers']) == 2:
+        results['asgi_speedup'] = round(results['servers']['asgi']['throughput_rps'] / results['servers']['wsgi']['throughput_rps'], 2)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
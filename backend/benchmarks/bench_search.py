@@ -0,0 +1,66 @@
+"""
+Benchmark de la búsqueda de restaurantes en memoria (app.utils.search)
+Construye el índice sobre N restaurantes sintéticos con nombres y descripciones
+variados y mide la latencia de búsquedas exactas, por prefijo y con errores.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_search --restaurants 100000
+"""
+import argparse
+import random
+import time
+from sqlalchemy import insert
+from benchmarks.common import CITIES, make_config
+from benchmarks.run import percentile
+
+WORDS = (
+    'casa bar taberna asador marisqueria meson bodega cocina tasca terraza jardin puerto plaza mercado '
+    'sol luna mar olivo naranjo romero tomillo azafran pimiento sardina gamba pulpo bacalao cordero '
+    'arroz paella tapas vinos brasa horno leña fuego sal huerta campo rio monte isla faro molino'
+).split()
+QUERIES = ('paella', 'marisqueria madrid', 'tapas sevilla', 'pul', 'bacalo', 'asdor granada', 'horno de leña', 'zzz')
+
+
+def restaurant_rows(total, rng):
+    for i in range(total):
+        words = rng.sample(WORDS, 3)
+        yield {
+            'name': f'{words[0].capitalize()} {words[1]} {i}',
+            'address': f'Calle {i}',
+            'city': CITIES[i % len(CITIES)],
+            'description': f'{words[2].capitalize()} y {rng.choice(WORDS)} de temporada'
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restaurants', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=200, help='repeticiones de cada búsqueda')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models import db, Restaurant
+    from app.utils.search import restaurant_search
+
+    app = create_app(make_config())
+    with app.app_context():
+        db.session.execute(insert(Restaurant), list(restaurant_rows(args.restaurants, random.Random(42))))
+        db.session.commit()
+
+        start = time.perf_counter()
+        restaurant_search.rebuild()
+        print(f'índice construido con {args.restaurants} restaurantes en {time.perf_counter() - start:.2f}s')
+
+        for query in QUERIES:
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = restaurant_search.search(query)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            print(f'{query!r:<24} {len(results):>3} resultados  p50 {percentile(latencies, 0.5) * 1000:7.3f}ms  '
+                  f'p95 {percentile(latencies, 0.95) * 1000:7.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark de serialización de listados: marshmallow + jsonify vs ruta rápida
+Uso (desde backend/):
+    python -m benchmarks.bench_serializers --rows 10000 100000
+"""
+import argparse
+import time
+from sqlalchemy.orm import joinedload
+from benchmarks.common import make_config, seed
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models import db, Restaurant, Reservation
+    from app.schemas import reservations_schema
+    from app.utils.serializers import reservations_select, reservation_row_to_dict, encode_json
+    from flask import jsonify
+
+    app = create_app(make_config())
+    with app.test_request_context():
+        seeded = 0
+        for rows in sorted(args.rows):
+            seed(db, restaurants=50 if not seeded else 0, reservations=rows - seeded)
+            seeded = rows
+            order = (Reservation.reservation_date.desc(), Reservation.created_at.desc(), Reservation.id.desc())
+
+            def schema_path():
+                reservations = Reservation.query.options(joinedload(Reservation.restaurant)).order_by(*order).all()
+                body = jsonify({'data': reservations_schema.dump(reservations), 'count': len(reservations)}).get_data()
+                db.session.expunge_all()
+                return body
+
+            def fast_path():
+                result = db.session.execute(reservations_select().order_by(*order)).all()
+                return encode_json({'data': [reservation_row_to_dict(row) for row in result], 'count': len(result)})
+
+            schema_time, schema_body = timed(schema_path)
+            fast_time, fast_body = timed(fast_path)
+            print(f'{rows:>8} filas | marshmallow {schema_time:7.3f}s | ruta rápida {fast_time:7.3f}s | '
+                  f'x{schema_time / fast_time:4.1f} | bytes idénticos: {schema_body == fast_body}')
+
+
+if __name__ == '__main__':
+    main()
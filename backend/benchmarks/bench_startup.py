@@ -0,0 +1,159 @@
+"""
+Tiempo hasta la primera petición: arranque clásico frente a arranque diferido
+Siembra una BD y arranca la app varias veces en subprocesos nuevos (intérprete
+sin módulos cargados), midiendo import de la app, create_app y la primera
+petición de disponibilidad y de búsqueda:
+    - eager: AUTO_MIGRATE=true (create_all + migraciones en cada arranque)
+    - lazy: AUTO_MIGRATE=false + LAZY_STARTUP=true (esquema con `flask upgrade-db`)
+    - preload: app lazy creada una vez y workers por fork, como gunicorn con
+      preload_app; se mide lo que tarda cada worker nuevo en responder
+
+Uso (desde backend/):
+    python -m benchmarks.bench_startup --restaurants 2000 --reservations 1000000
+    python -m benchmarks.bench_startup --database-url postgresql://localhost/bench --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.common import make_config, seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'eager': {'AUTO_MIGRATE': 'true', 'LAZY_STARTUP': 'false'},
+    'lazy': {'AUTO_MIGRATE': 'false', 'LAZY_STARTUP': 'true'},
+    'preload': {'AUTO_MIGRATE': 'false', 'LAZY_STARTUP': 'true'}
+}
+
+# Proceso hijo: solo la librería estándar antes de importar la app
+CHILD = '''
+import json, os, statistics, sys, time
+start = time.perf_counter()
+
+def first_requests(app):
+    client = app.test_client()
+    begin = time.perf_counter()
+    assert client.get(sys.argv[1]).status_code == 200
+    availability = time.perf_counter() - begin
+    responded_at = time.time()
+    begin = time.perf_counter()
+    assert client.get('/api/restaurants/search?q=restaurante').status_code == 200
+    return availability, time.perf_counter() - begin, responded_at
+
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+
+if os.environ.get('BENCH_PRELOAD'):
+    from app.utils.database import dispose_engines
+    results = []
+    # Un worker cada vez: se mide el coste de cada uno sin competir por la CPU
+    for _ in range(int(os.environ['BENCH_PRELOAD'])):
+        read_end, write_end = os.pipe()
+        forked = time.perf_counter()
+        if os.fork() == 0:
+            dispose_engines(app)
+            availability, search, _ = first_requests(app)
+            os.write(write_end, json.dumps([time.perf_counter() - forked - search, availability, search]).encode())
+            os._exit(0)
+        os.close(write_end)
+        results.append(json.loads(os.read(read_end, 4096)))
+        os.wait()
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'worker_first_request_ms': statistics.median(r[0] for r in results) * 1000,
+        'availability_ms': statistics.median(r[1] for r in results) * 1000,
+        'search_ms': statistics.median(r[2] for r in results) * 1000
+    }))
+else:
+    availability, search, responded_at = first_requests(app)
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'availability_ms': availability * 1000,
+        'search_ms': search * 1000,
+        'responded_at': responded_at
+    }))
+'''
+
+
+def run_once(mode, env, path, workers):
+    env = {**env, **MODES[mode]}
+    if mode == 'preload':
+        env['BENCH_PRELOAD'] = str(workers)
+    launched = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, path], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    if mode == 'preload':
+        # Lo que tarda un worker nuevo en responder: fork + primera petición
+        timings['time_to_first_request_ms'] = timings.pop('worker_first_request_ms')
+    else:
+        # Desde que se lanza el intérprete hasta la respuesta a la primera petición
+        timings['time_to_first_request_ms'] = (timings.pop('responded_at') - launched) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='BD de pruebas (por defecto un SQLite temporal)')
+    parser.add_argument('--restaurants', type=int, default=500)
+    parser.add_argument('--reservations', type=int, default=200_000)
+    parser.add_argument('--runs', type=int, default=5, help='arranques por modo (se informa la mediana)')
+    parser.add_argument('--workers', type=int, default=4, help='workers por fork en el modo preload')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--output', help='fichero JSON de resultados (por defecto stdout)')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models import db, Restaurant
+
+    app = create_app(make_config(args.database_url))
+    with app.app_context():
+        seed(db, args.restaurants, args.reservations)
+        restaurant_id = db.session.query(Restaurant.id).order_by(Restaurant.id).limit(1).scalar()
+        database_url = db.engine.url.render_as_string(hide_password=False)
+        db.engine.dispose()
+
+    path = f'/api/reservations/availability/{restaurant_id}/2030-01-15'
+    env = {**os.environ, 'DATABASE_URL': database_url, 'METRICS_ENABLED': 'false', 'ARCHIVE_INTERVAL': '0'}
+    results = {
+        'meta': {
+            'database': database_url.split(':', 1)[0],
+            'restaurants': args.restaurants,
+            'reservations': args.reservations,
+            'runs': args.runs
+        },
+        'modes': {}
+    }
+
+    for mode in args.modes:
+        runs = [run_once(mode, env, path, args.workers) for _ in range(args.runs)]
+        summary = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+        results['modes'][mode] = summary
+        print(f'{mode:<8} primera petición {summary["time_to_first_request_ms"]:>8}ms  '
+              f'import {summary["import_ms"]:>7}ms  create_app {summary["create_app_ms"]:>8}ms  '
+              f'disponibilidad {summary["availability_ms"]:>7}ms  búsqueda {summary["search_ms"]:>7}ms', file=sys.stderr)
+
+    if 'eager' in results['modes'] and 'lazy' in results['modes']:
+        results['lazy_speedup'] = round(
+            results['modes']['eager']['time_to_first_request_ms'] / results['modes']['lazy']['time_to_first_request_ms'], 2
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Latencia de las lecturas durante una tormenta de escrituras, con y sin protección del camino de escritura
+Siembra una BD y, para cada modo, arranca gunicorn (workers con --threads) en un
+subproceso contra ella. Un cliente asyncio mantiene --readers conexiones de
+lectura (detalle de restaurante, disponibilidad y listado de reservas) durante
+--duration segundos y, salvo en el modo reads, --writers conexiones que crean
+reservas sin pausa en unos pocos restaurantes populares desde muchos clientes
+(X-Forwarded-For distintos, TRUSTED_PROXY_COUNT=1):
+    - reads: solo lecturas (referencia)
+    - storm: lecturas + escrituras sin rate limiting ni load shedding
+    - protected: lo mismo con RATE_LIMIT_ENABLED y LOAD_SHED_ENABLED
+
+Uso (desde backend/):
+    python -m benchmarks.bench_write_storm --duration 10 --writers 64 --output tormenta.json
+    python -m benchmarks.bench_write_storm --database-url postgresql://localhost/bench --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from benchmarks.bench_asgi import free_port, wait_for_port
+from benchmarks.common import make_config, seed
+from benchmarks.run import percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'reads': {'RATE_LIMIT_ENABLED': 'false', 'LOAD_SHED_ENABLED': 'false'},
+    'storm': {'RATE_LIMIT_ENABLED': 'false', 'LOAD_SHED_ENABLED': 'false'},
+    'protected': {'RATE_LIMIT_ENABLED': 'true', 'LOAD_SHED_ENABLED': 'true'}
+}
+
+
+async def send(port, method, path, body=None, headers=None):
+    """Petición HTTP/1.1 mínima (una conexión por petición); devuelve el código de estado y Retry-After"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    lines = [f'{method} {path} HTTP/1.1', 'Host: localhost', 'Connection: close']
+    if body is not None:
+        lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head = response.split(b'\r\n\r\n', 1)[0].decode('latin-1').lower()
+    retry_after = next((line.split(':', 1)[1] for line in head.split('\r\n') if line.startswith('retry-after:')), 0)
+    return int(head.split(' ', 2)[1]), float(retry_after)
+
+
+async def client(port, next_request, deadline, latencies, statuses, honor_retry_after=True):
+    """
+    Bucle cerrado: una petición detrás de otra hasta el final de la prueba
+    Tras un 429/503 espera lo que indica Retry-After (como la app cliente)
+    salvo con honor_retry_after=False (clientes agresivos)
+    """
+    while time.perf_counter() < deadline:
+        method, path, body, headers = next_request()
+        start = time.perf_counter()
+        retry_after = 0
+        try:
+            status, retry_after = await send(port, method, path, body, headers)
+            statuses[status] += 1
+        except (OSError, IndexError, ValueError):
+            statuses['error'] += 1
+        latencies.append(time.perf_counter() - start)
+        if honor_retry_after and retry_after:
+            await asyncio.sleep(min(retry_after, deadline - time.perf_counter()))
+
+
+def summarize(latencies, statuses, elapsed):
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'requests': 0}
+    return {
+        'requests': len(ordered),
+        'throughput_rps': round(len(ordered) / elapsed, 1),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'status_codes': {str(code): total for code, total in sorted(statuses.items(), key=str)}
+    }
+
+
+async def storm(port, restaurant_ids, args, duration, writes):
+    rng = random.Random(11)
+    days = [date(2031, 1, 1) + timedelta(days=i) for i in range(365)]
+    hot = restaurant_ids[:args.hot_restaurants]
+
+    def read_request():
+        kind = rng.randrange(3)
+        if kind == 0:
+            path = f'/api/restaurants/{rng.choice(restaurant_ids)}'
+        elif kind == 1:
+            path = f'/api/reservations/availability/{rng.choice(restaurant_ids)}/{rng.choice(days).isoformat()}'
+        else:
+            path = f'/api/reservations?limit=20&restaurant_id={rng.choice(restaurant_ids)}'
+        return 'GET', path, None, None
+
+    def write_request():
+        body = {
+            'restaurant_id': rng.choice(hot),
+            'customer_name': 'Cliente tormenta',
+            'reservation_date': rng.choice(days).isoformat(),
+            'number_of_people': rng.randint(1, 8)
+        }
+        client_number = rng.randrange(args.clients)
+        headers = {'X-Forwarded-For': f'10.0.{client_number // 256}.{client_number % 256}'}
+        return 'POST', '/api/reservations', body, headers
+
+    reads, writes_done = ([], Counter()), ([], Counter())
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(
+        *(client(port, read_request, deadline, *reads) for _ in range(args.readers)),
+        *(client(port, write_request, deadline, *writes_done, not args.ignore_retry_after)
+          for _ in range(args.writers if writes else 0))
+    )
+    elapsed = time.perf_counter() - start
+    return {'reads': summarize(*reads, elapsed), 'writes': summarize(*writes_done, elapsed) if writes else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='BD de pruebas (por defecto un SQLite temporal)')
+    parser.add_argument('--restaurants', type=int, default=200)
+    parser.add_argument('--reservations', type=int, default=50_000)
+    parser.add_argument('--duration', type=float, default=10, help='segundos de carga por modo')
+    parser.add_argument('--readers', type=int, default=16, help='conexiones de lectura simultáneas')
+    parser.add_argument('--writers', type=int, default=64, help='conexiones de escritura simultáneas')
+    parser.add_argument('--hot-restaurants', type=int, default=5, help='restaurantes que reciben la tormenta')
+    parser.add_argument('--clients', type=int, default=1000, help='clientes distintos (X-Forwarded-For)')
+    parser.add_argument('--ignore-retry-after', action='store_true', help='los escritores reintentan sin esperar')
+    parser.add_argument('--workers', type=int, default=2, help='procesos de gunicorn')
+    parser.add_argument('--threads', type=int, default=16, help='hilos por worker')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--output', help='fichero JSON de resultados (por defecto stdout)')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models import db, Restaurant
+
+    app = create_app(make_config(args.database_url))
+    with app.app_context():
+        seed(db, args.restaurants, args.reservations)
+        restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id).order_by(Restaurant.id)]
+        database_url = db.engine.url.render_as_string(hide_password=False)
+        db.engine.dispose()
+
+    results = {
+        'meta': {
+            'database': database_url.split(':', 1)[0],
+            'restaurants': args.restaurants,
+            'reservations': args.reservations,
+            'workers': args.workers,
+            'threads': args.threads,
+            'readers': args.readers,
+            'writers': args.writers,
+            'honor_retry_after': not args.ignore_retry_after,
+            'duration_s': args.duration
+        },
+        'modes': {}
+    }
+
+    base_env = {
+        **os.environ, 'DATABASE_URL': database_url, 'METRICS_ENABLED': 'false', 'AUTO_MIGRATE': 'false',
+        'TRUSTED_PROXY_COUNT': '1'
+    }
+    command = ['gunicorn', '-w', str(args.workers), '--threads', str(args.threads), '-b', '127.0.0.1:{port}',
+               '--log-level', 'warning', 'run:app']
+    for mode in args.modes:
+        port = free_port()
+        process = subprocess.Popen(
+            [part.format(port=port) for part in command], cwd=BACKEND_DIR, env={**base_env, **MODES[mode]}
+        )
+        try:
+            wait_for_port(port, process)
+            # Calentamiento: pools de conexiones y cachés de todos los workers
+            asyncio.run(storm(port, restaurant_ids, args, 1, writes=False))
+            results['modes'][mode] = asyncio.run(storm(port, restaurant_ids, args, args.duration, writes=mode != 'reads'))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        reads, writes = results['modes'][mode]['reads'], results['modes'][mode]['writes']
+        line = (f'{mode:<10} lecturas {reads["throughput_rps"]:>7} req/s  p50 {reads["p50_ms"]:>8}ms  '
+                f'p99 {reads["p99_ms"]:>8}ms  máx {reads["max_ms"]:>8}ms')
+        if writes:
+            line += f'  | escrituras {writes["throughput_rps"]:>7} req/s  p99 {writes["p99_ms"]:>8}ms  {writes["status_codes"]}'
+        print(line, file=sys.stderr)
+
+    modes = results['modes']
+    if 'storm' in modes and 'protected' in modes:
+        results['read_p99_improvement'] = round(modes['storm']['reads']['p99_ms'] / modes['protected']['reads']['p99_ms'], 2)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Utilidades compartidas por los benchmarks: configuración aislada y datos sintéticos"""
+import os
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert
+from config import Config
+
+CITIES = ['Madrid', 'Barcelona', 'Sevilla', 'Valencia', 'Bilbao', 'Málaga', 'Zaragoza', 'Granada']
+
+
+def make_config(database_url=None, **overrides):
+    """
+    Config de la app contra una BD propia (SQLite temporal si no se indica otra)
+    Sin rate limiting ni load shedding: los escenarios de escritura miden el
+    coste de la escritura, no los rechazos (bench_write_storm los activa).
+    """
+    attributes = {
+        'SQLALCHEMY_DATABASE_URI': database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'),
+        'RATE_LIMIT_ENABLED': False,
+        'LOAD_SHED_ENABLED': False,
+        **overrides
+    }
+    return type('BenchConfig', (Config,), attributes)
+
+
+def seed(db, restaurants, reservations, start=date(2030, 1, 1), days=365, seed_value=42, chunk_size=10_000):
+    """
+    Inserta restaurantes y reservas sintéticas con INSERT en bloque
+    Las reservas se reparten al azar entre todos los restaurantes existentes
+    (los datos de histórico no pasan por la admisión, como una carga inicial)
+    """
+    from app.models import Restaurant, Reservation
+
+    rng = random.Random(seed_value)
+    if restaurants:
+        db.session.execute(insert(Restaurant), [
+            {
+                'name': f'{chr(65 + i % 26)}restaurante {i}',
+                'address': f'Calle {i}',
+                'city': CITIES[i % len(CITIES)],
+                'description': 'Cocina de mercado'
+            }
+            for i in range(restaurants)
+        ])
+    restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id)]
+
+    rows = []
+    for i in range(reservations):
+        rows.append({
+            'restaurant_id': rng.choice(restaurant_ids),
+            'customer_name': f'Cliente {i}',
+            'customer_email': f'cliente{i}@example.com',
+            'reservation_date': start + timedelta(days=i % days),
+            'number_of_people': rng.randint(1, 8),
+            'created_at': datetime(2029, 1, 1) + timedelta(seconds=i)
+        })
+        if len(rows) == chunk_size:
+            db.session.execute(insert(Reservation), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Reservation), rows)
+    db.session.commit()
@@ -0,0 +1,247 @@
+"""
+Suite de benchmarks de la API de reservas (offline, contra create_app)
+Siembra un dataset sintético y mide throughput y latencias p50/p95/p99 de:
+    get_restaurants, get_reservations, check_availability, analytics_occupancy
+    y create_reservation
+    (este último con contención: muchos clientes reservando las mismas fechas)
+
+Uso (desde backend/):
+    python -m benchmarks.run --restaurants 200 --reservations 50000 --output resultados.json
+    python -m benchmarks.run --database-url postgresql://localhost/bench
+    python -m benchmarks.run --baseline resultados.json --max-regression 0.25
+
+Con --baseline el proceso termina con código 1 si el p95 de algún escenario
+empeora más de --max-regression respecto a la ejecución de referencia.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from benchmarks.common import make_config, seed
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(app, make_request, requests, concurrency):
+    """
+    Lanza `requests` peticiones repartidas entre `concurrency` hilos
+    make_request(client, i) devuelve la respuesta del test client
+    """
+    local = threading.local()
+    latencies = [0.0] * requests
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        response = make_request(client, i)
+        latencies[i] = time.perf_counter() - start
+        with lock:
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughput_rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'status_codes': {str(code): total for code, total in sorted(statuses.items())}
+    }
+
+
+def check_overbooking(db):
+    """Comprueba que ningún restaurante ni día supera los límites tras el escenario de contención"""
+    from sqlalchemy import func, select
+    from app.models import Reservation
+    from config import Config
+
+    def max_group(*columns):
+        groups = select(func.count(Reservation.id).label('total')).where(
+            Reservation.reservation_date >= CONTENTION_START
+        ).group_by(*columns).subquery()
+        return db.session.execute(select(func.max(groups.c.total))).scalar() or 0
+
+    per_restaurant = max_group(Reservation.restaurant_id, Reservation.reservation_date)
+    per_day = max_group(Reservation.reservation_date)
+
+    return {
+        'max_per_restaurant_day': per_restaurant,
+        'max_per_day': per_day,
+        'overbooked': per_restaurant > Config.MAX_TABLES_PER_RESTAURANT or per_day > Config.MAX_RESERVATIONS_PER_DAY
+    }
+
+
+# Fechas fuera del dataset sembrado, reservadas para el escenario de contención
+CONTENTION_START = date(2032, 1, 1)
+
+
+def build_scenarios(restaurant_ids, args):
+    rng = random.Random(7)
+    letters = [chr(65 + i) for i in range(26)]
+    cities = ['madrid', 'sevilla', 'bar', '']
+    seeded_dates = [date(2030, 1, 1) + timedelta(days=i) for i in range(365)]
+    contention_dates = [CONTENTION_START + timedelta(days=i) for i in range(args.contention_days)]
+    hot_restaurants = restaurant_ids[:args.contention_restaurants]
+
+    def get_restaurants(client, i):
+        letter = rng.choice(letters)
+        return client.get('/api/restaurants', query_string={'letter': letter, 'city': rng.choice(cities)})
+
+    def get_reservations(client, i):
+        params = {'limit': args.page_size}
+        if i % 2:
+            params['restaurant_id'] = rng.choice(restaurant_ids)
+        return client.get('/api/reservations', query_string=params)
+
+    def check_availability(client, i):
+        day = rng.choice(seeded_dates).isoformat()
+        return client.get(f'/api/reservations/availability/{rng.choice(restaurant_ids)}/{day}')
+
+    def analytics_occupancy(client, i):
+        start = rng.choice(seeded_dates[:-30])
+        params = {'from': start.isoformat(), 'to': (start + timedelta(days=29)).isoformat()}
+        if i % 2:
+            params['restaurant_id'] = rng.choice(restaurant_ids)
+        return client.get('/api/analytics/occupancy', query_string=params)
+
+    def create_reservation(client, i):
+        return client.post('/api/reservations', json={
+            'restaurant_id': hot_restaurants[i % len(hot_restaurants)],
+            'customer_name': f'Benchmark {i}',
+            'reservation_date': contention_dates[(i // len(hot_restaurants)) % len(contention_dates)].isoformat(),
+            'number_of_people': 2
+        })
+
+    return {
+        'get_restaurants': get_restaurants,
+        'get_reservations': get_reservations,
+        'check_availability': check_availability,
+        'analytics_occupancy': analytics_occupancy,
+        'create_reservation': create_reservation
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """Devuelve la lista de escenarios cuyo p95 empeora más de max_regression"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous.get('p95_ms'):
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+        current['p95_change'] = round(change, 3)
+        if change > max_regression:
+            regressions.append(f'{name}: p95 {previous["p95_ms"]}ms -> {current["p95_ms"]}ms (+{change:.0%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='BD de pruebas (por defecto un SQLite temporal)')
+    parser.add_argument('--restaurants', type=int, default=100)
+    parser.add_argument('--reservations', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=500, help='peticiones por escenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--contention-days', type=int, default=3)
+    parser.add_argument('--contention-restaurants', type=int, default=3)
+    parser.add_argument('--scenarios', nargs='+', help='subconjunto de escenarios a ejecutar')
+    parser.add_argument('--output', help='fichero JSON de resultados (por defecto stdout)')
+    parser.add_argument('--baseline', help='resultados JSON de referencia para detectar regresiones')
+    parser.add_argument('--max-regression', type=float, default=0.25, help='empeoramiento máximo del p95 (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models import db, Restaurant
+    from app.utils.rollups import rebuild_rollups
+
+    app = create_app(make_config(args.database_url))
+    with app.app_context():
+        seed_start = time.perf_counter()
+        seed(db, args.restaurants, args.reservations)
+        rebuild_rollups(db.session.connection())
+        db.session.commit()
+        seed_seconds = time.perf_counter() - seed_start
+        restaurant_ids = [restaurant_id for (restaurant_id,) in db.session.query(Restaurant.id).order_by(Restaurant.id)]
+
+    scenarios = build_scenarios(restaurant_ids, args)
+    selected = args.scenarios or list(scenarios)
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'restaurants': args.restaurants,
+            'reservations': args.reservations,
+            'seed_seconds': round(seed_seconds, 3)
+        },
+        'scenarios': {}
+    }
+
+    for name in selected:
+        results['scenarios'][name] = run_scenario(app, scenarios[name], args.requests, args.concurrency)
+        print(f'{name:<20} {results["scenarios"][name]["throughput_rps"]:>9} req/s  '
+              f'p50 {results["scenarios"][name]["p50_ms"]:>8}ms  p95 {results["scenarios"][name]["p95_ms"]:>8}ms  '
+              f'p99 {results["scenarios"][name]["p99_ms"]:>8}ms', file=sys.stderr)
+
+    if 'create_reservation' in selected:
+        with app.app_context():
+            results['scenarios']['create_reservation']['capacity'] = check_overbooking(db)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.max_regression)
+        results['regressions'] = regressions
+        for regression in regressions:
+            print(f'REGRESIÓN {regression}', file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    if results['scenarios'].get('create_reservation', {}).get('capacity', {}).get('overbooked'):
+        print('ERROR: se han superado los límites de capacidad', file=sys.stderr)
+        exit_code = 1
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,5 +18,140 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Arranque: AUTO_MIGRATE=false deja el esquema a `flask upgrade-db` (paso de despliegue)
+    # y create_app no abre ninguna conexión; LAZY_STARTUP construye el índice de búsqueda
+    # en la primera búsqueda en lugar de al arrancar
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'true').lower() == 'true'
+    LAZY_STARTUP = os.environ.get('LAZY_STARTUP', 'false').lower() == 'true'
+    
+    # Engine / pool de conexiones (SQLALCHEMY_ENGINE_OPTIONS se calcula en create_app)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # PgBouncer u otro pooler externo en modo transacción
+    DB_EXTERNAL_POOLER = os.environ.get('DB_EXTERNAL_POOLER', 'false').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    
+    # Réplicas de lectura (URIs separadas por comas): las GET se reparten entre ellas
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+    # Segundos que un cliente lee del primario después de escribir (read-your-writes)
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    
+    # Límites por defecto: se ajustan por restaurante y por fecha en /api/limits
     MAX_TABLES_PER_RESTAURANT = 15
-    MAX_RESERVATIONS_PER_DAY = 20
\ No newline at end of file
+    MAX_RESERVATIONS_PER_DAY = 20
+    # Segundos entre recargas de la caché de límites en cada worker (0 = solo al invalidar)
+    CAPACITY_LIMITS_RELOAD_INTERVAL = int(os.environ.get('CAPACITY_LIMITS_RELOAD_INTERVAL', 60))
+    
+    # Asignación de mesas por horario (restaurantes con inventario de mesas)
+    # Horario de servicio: primera y última hora de llegada (HH:MM)
+    SERVICE_OPENS = os.environ.get('SERVICE_OPENS', '12:00')
+    LAST_SEATING = os.environ.get('LAST_SEATING', '22:30')
+    # Rejilla de horas ofrecidas en /slots y duración por defecto de una reserva (minutos)
+    SLOT_INTERVAL_MINUTES = 15
+    DEFAULT_RESERVATION_MINUTES = 90
+    AVAILABLE_SLOTS_MAX = 20
+    
+    # Paginación de GET /api/reservations
+    RESERVATIONS_PAGE_SIZE = 100
+    RESERVATIONS_MAX_PAGE_SIZE = 1000
+    
+    # Archivado de reservas pasadas (reservations_archive)
+    # Se archivan las de hace más de ARCHIVE_AFTER_DAYS días; ARCHIVE_INTERVAL en segundos (0 = solo CLI)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+    ARCHIVE_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', 0))
+    
+    # Importación en lote (POST /api/reservations/bulk)
+    BULK_MAX_ROWS = 1000
+    BULK_CHUNK_SIZE = 500
+    
+    # Protección del camino de escritura: métodos afectados por el rate limiting y el load shedding
+    THROTTLE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+    # Proxies de confianza delante de la app (Render, nginx): la IP del cliente sale de X-Forwarded-For
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+    
+    # Rate limiting (429): token bucket por blueprint y ámbito, (tokens por segundo, ráfaga)
+    # Backend 'memory' (por proceso: límite x nº de workers) o 'redis' (compartido)
+    # Desactivado por defecto: detrás de un proxy sin TRUSTED_PROXY_COUNT todos los clientes
+    # comparten la IP del proxy y, con ella, un único bucket
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    RATE_LIMIT_MAX_KEYS = 10000
+    RATE_LIMIT_CLIENT = (float(os.environ.get('RATE_LIMIT_CLIENT_RATE', 5)), int(os.environ.get('RATE_LIMIT_CLIENT_BURST', 20)))
+    RATE_LIMIT_RESTAURANT = (float(os.environ.get('RATE_LIMIT_RESTAURANT_RATE', 20)), int(os.environ.get('RATE_LIMIT_RESTAURANT_BURST', 40)))
+    RATE_LIMITS = {
+        'reservations': {'client': RATE_LIMIT_CLIENT, 'restaurant': RATE_LIMIT_RESTAURANT},
+        'restaurants': {'client': RATE_LIMIT_CLIENT},
+        'limits': {'client': RATE_LIMIT_CLIENT}
+    }
+    
+    # Load shedding (503), por worker: escrituras en curso y latencia media por sentencia SQL
+    # (0 desactiva cada señal); con gunicorn --threads, MAX_INFLIGHT por debajo del nº de hilos
+    # Desactivado por defecto, como el rate limiting: se activa junto con él al configurar el despliegue
+    LOAD_SHED_ENABLED = os.environ.get('LOAD_SHED_ENABLED', 'false').lower() == 'true'
+    LOAD_SHED_BLUEPRINTS = ('reservations', 'restaurants', 'limits')
+    LOAD_SHED_MAX_INFLIGHT = int(os.environ.get('LOAD_SHED_MAX_INFLIGHT', 8))
+    LOAD_SHED_DB_LATENCY_MS = int(os.environ.get('LOAD_SHED_DB_LATENCY_MS', 250))
+    LOAD_SHED_LATENCY_WINDOW = 5
+    LOAD_SHED_RETRY_AFTER = 1
+    
+    # Idempotency-Key en las escrituras ('memory' por proceso o 'redis' compartido entre workers;
+    # con varios workers y 'memory' un reintento que cae en otro worker se ejecuta de nuevo)
+    IDEMPOTENCY_BACKEND = os.environ.get('IDEMPOTENCY_BACKEND', 'memory')
+    IDEMPOTENCY_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 86400))
+    IDEMPOTENCY_MAX_ENTRIES = 10000
+    # Caducidad de la marca "en curso" si el worker muere (segundos)
+    IDEMPOTENCY_LOCK_TIMEOUT = 30
+    # Retry-After del 409 a un duplicado que llega con la petición original en curso
+    IDEMPOTENCY_RETRY_AFTER = 1
+    
+    # Calendario de disponibilidad (GET /api/reservations/availability/<restaurant_id>)
+    AVAILABILITY_CALENDAR_MAX_DAYS = 92
+    AVAILABILITY_CALENDAR_MAX_AGE = 30
+    
+    # Analítica de ocupación (GET /api/analytics/occupancy): rango máximo y restaurantes por respuesta
+    ANALYTICS_MAX_DAYS = 366
+    ANALYTICS_DEFAULT_LIMIT = 50
+    ANALYTICS_MAX_LIMIT = 500
+    
+    # Stream SSE de disponibilidad (GET /api/reservations/availability/stream)
+    # Pub/sub entre workers: 'memory' (un proceso) o 'redis' (compartido)
+    AVAILABILITY_EVENTS_BACKEND = os.environ.get('AVAILABILITY_EVENTS_BACKEND', 'memory')
+    AVAILABILITY_EVENTS_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    AVAILABILITY_STREAM_MAX_KEYS = 50
+    AVAILABILITY_STREAM_KEEPALIVE = int(os.environ.get('AVAILABILITY_STREAM_KEEPALIVE', 15))
+    
+    # Caché de respuestas de GET /api/restaurants ('memory' por proceso o 'redis' compartido)
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_MAX_ENTRIES = 256
+    
+    # Búsqueda de restaurantes (GET /api/restaurants/search): índice en memoria
+    SEARCH_REFRESH_INTERVAL = int(os.environ.get('SEARCH_REFRESH_INTERVAL', 60))
+    # Segundos que solapa cada sincronización con la anterior (transacciones que confirman tarde)
+    SEARCH_REFRESH_OVERLAP = int(os.environ.get('SEARCH_REFRESH_OVERLAP', 300))
+    SEARCH_DEFAULT_LIMIT = 20
+    SEARCH_MAX_LIMIT = 100
+    # Límites de trabajo por búsqueda (400 si se superan)
+    SEARCH_MAX_TERMS = 8
+    SEARCH_MAX_EXPANSIONS = 500  # palabras del vocabulario por término (prefijo o aproximadas)
+    # Con más combinaciones de niveles de puntuación se puntúa por grupos (lineal en las coincidencias)
+    SEARCH_MAX_COMBINATIONS = 64
+    
+    # Encoder JSON de los listados: 'json' (idéntico a jsonify) u 'orjson' (opcional, más rápido)
+    FAST_JSON_ENCODER = os.environ.get('FAST_JSON_ENCODER', 'json')
+    
+    # Instrumentación por petición y endpoint /metrics (formato Prometheus)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    # Profiling muestreado: fracción de peticiones perfiladas (0 = desactivado)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', 500))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Configuración de gunicorn (se lee sola desde este directorio: gunicorn run:app)
+Con preload_app el proceso padre importa y crea la app una vez y los workers
+nacen por fork ya inicializados. Para que el padre no abra conexiones, usar
+AUTO_MIGRATE=false y aplicar el esquema antes con `flask upgrade-db`.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def post_fork(server, worker):
+    """Cada worker descarta las conexiones heredadas del padre y abre las suyas"""
+    if not server.cfg.preload_app:
+        return
+    from app.utils.database import dispose_engines
+
+    app = server.app.wsgi()
+    # run:app (Flask) o asgi:app (AsyncReadApp, con su engine asíncrono)
+    dispose_engines(getattr(app, 'flask_app', app))
+    if hasattr(app, 'engine'):
+        app.engine.sync_engine.dispose(close=False)
+
+
+def when_ready(server):
+    """Avisa si Idempotency-Key no se comparte entre workers (backend en memoria)"""
+    if server.cfg.workers > 1 and os.environ.get('IDEMPOTENCY_BACKEND', 'memory') == 'memory':
+        server.log.warning(
+            'IDEMPOTENCY_BACKEND=memory con %s workers: un reintento con la misma Idempotency-Key '
+            'que cae en otro worker se ejecuta de nuevo (use IDEMPOTENCY_BACKEND=redis)', server.cfg.workers
+        )
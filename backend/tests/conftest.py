@@ -0,0 +1,61 @@
+"""
+Fixtures compartidas: una app con su propia BD SQLite temporal por test
+Con TEST_DATABASE_URL (p. ej. postgresql://localhost/test) los tests usan esa
+BD, que se vacía al terminar cada uno.
+"""
+import os
+import pytest
+from config import Config
+from app import create_app
+from app.models import db
+
+
+def make_config(tmp_path, **overrides):
+    """Config de pruebas: BD temporal y sin rate limiting ni load shedding (salvo que el test los active)"""
+    return type('TestConfig', (Config,), {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{tmp_path / "test.db"}',
+        'RATE_LIMIT_ENABLED': False,
+        'LOAD_SHED_ENABLED': False,
+        **overrides
+    })
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(make_config(tmp_path))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        if os.environ.get('TEST_DATABASE_URL'):
+            db.drop_all(bind_key=None)
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_restaurant(client):
+    """Crea un restaurante por la API y devuelve su id"""
+    def make(name='Restaurante', city='Madrid'):
+        response = client.post('/api/restaurants', json={'name': name, 'address': 'Calle Mayor 1', 'city': city})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['data']['id']
+    return make
+
+
+@pytest.fixture
+def make_reservation(client):
+    """Crea una reserva por la API y devuelve la respuesta"""
+    def make(restaurant_id, reservation_date, number_of_people=2, **fields):
+        return client.post('/api/reservations', json={
+            'restaurant_id': restaurant_id,
+            'customer_name': 'Cliente',
+            'reservation_date': reservation_date,
+            'number_of_people': number_of_people,
+            **fields
+        })
+    return make
@@ -0,0 +1,61 @@
+"""Ocupación de /api/analytics/occupancy con la capacidad guardada en daily_occupancy"""
+from datetime import date
+from sqlalchemy import insert
+from app.models import db, ALL_RESTAURANTS, DailyOccupancy
+from app.utils.rollups import record_rollups
+
+PAST = date(2020, 1, 1)
+FUTURE = '2031-01-01'
+
+
+def occupancy(client, date_from, date_to, restaurant_id=None):
+    query = {'from': date_from, 'to': date_to}
+    if restaurant_id is not None:
+        query['restaurant_id'] = restaurant_id
+    response = client.get('/api/analytics/occupancy', query_string=query)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_future_days_follow_limit_changes(client, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant()
+    assert client.put(f'/api/limits/{restaurant_id}', json={'max_reservations': 4}).status_code == 200
+    for _ in range(2):
+        assert make_reservation(restaurant_id, FUTURE).status_code == 201
+
+    report = occupancy(client, FUTURE, FUTURE, restaurant_id)
+    assert report['days'][0]['occupancy'] == 0.5
+
+    # Un día que no ha pasado toma el límite nuevo sin esperar a otra reserva
+    assert client.put(f'/api/limits/{restaurant_id}', json={'max_reservations': 8}).status_code == 200
+    report = occupancy(client, FUTURE, FUTURE, restaurant_id)
+    assert report['days'][0]['occupancy'] == 0.25
+    assert report['restaurants'][0]['occupancy'] == 0.25
+
+
+def test_past_days_keep_their_capacity(app, client, make_restaurant):
+    """Cambiar límites no reescribe la ocupación de días pasados; los días sin resumen usan el límite actual"""
+    restaurant_id = make_restaurant()
+    with app.app_context():
+        db.session.execute(insert(DailyOccupancy), [
+            {'restaurant_id': restaurant_id, 'reservation_date': PAST, 'reservations': 2, 'covers': 4, 'capacity': 4},
+            {'restaurant_id': ALL_RESTAURANTS, 'reservation_date': PAST, 'reservations': 2, 'covers': 4, 'capacity': 10}
+        ])
+        db.session.commit()
+
+    assert client.put(f'/api/limits/{restaurant_id}', json={'max_reservations': 8}).status_code == 200
+    assert client.put(f'/api/limits/{restaurant_id}/2020-01-01', json={'max_reservations': 100}).status_code == 200
+    assert client.put(f'/api/limits/{restaurant_id}/2020-01-02', json={'max_reservations': 2}).status_code == 200
+    with app.app_context():
+        # Una escritura tardía sobre el día pasado tampoco cambia su capacidad
+        record_rollups(db, [(restaurant_id, PAST, 2, None, 1)])
+        db.session.commit()
+        assert db.session.get(DailyOccupancy, (restaurant_id, PAST)).capacity == 4
+
+    report = occupancy(client, '2020-01-01', '2020-01-01', restaurant_id)
+    assert report['days'][0]['occupancy'] == 0.75
+
+    # 3 reservas / (4 guardada el día 1 + 2 del límite actual del día 2, sin resumen)
+    report = occupancy(client, '2020-01-01', '2020-01-02', restaurant_id)
+    assert report['summary']['occupancy']['average'] == 0.5
+    assert report['restaurants'][0]['occupancy'] == 0.5
@@ -0,0 +1,135 @@
+"""Archivado de reservas pasadas: lotes, lecturas con include_archived, comando CLI e ids ya archivados"""
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import func, insert, select
+from app.models import db, ArchivedReservation, CapacityLimitOverride, Reservation
+from app.utils.archive import ArchiveConflict, archive_reservations
+
+BEFORE = date(2020, 2, 1)
+
+
+@pytest.fixture
+def past(app, make_restaurant):
+    """Cinco reservas pasadas y una futura de un restaurante; devuelve (restaurant_id, ids pasados)"""
+    restaurant_id = make_restaurant('Casa Pepe', 'Madrid')
+    with app.app_context():
+        rows = [
+            Reservation(restaurant_id=restaurant_id, customer_name=f'Cliente {day}',
+                        reservation_date=date(2020, 1, 1) + timedelta(days=day), number_of_people=2)
+            for day in range(5)
+        ]
+        rows.append(Reservation(restaurant_id=restaurant_id, customer_name='Futura',
+                                reservation_date=date(2031, 1, 1), number_of_people=2))
+        db.session.add_all(rows)
+        db.session.commit()
+        return restaurant_id, [row.id for row in rows[:5]]
+
+
+def counts():
+    return (
+        db.session.execute(select(func.count(Reservation.id))).scalar(),
+        db.session.execute(select(func.count(ArchivedReservation.id))).scalar()
+    )
+
+
+def test_batches(app, past):
+    _, ids = past
+    totals = []
+    with app.app_context():
+        assert archive_reservations(db, BEFORE, batch_size=2, max_batches=1) == 2
+        assert counts() == (4, 2)
+
+        # Último lote incompleto: 2 + 1
+        assert archive_reservations(db, BEFORE, batch_size=2, progress=totals.append) == 3
+        assert totals == [2, 3]
+        assert counts() == (1, 5)
+        assert sorted(db.session.execute(select(ArchivedReservation.id)).scalars()) == ids
+
+        # Nada pendiente
+        assert archive_reservations(db, BEFORE, batch_size=2) == 0
+
+
+def test_exact_batch_multiple(app, past):
+    with app.app_context():
+        assert archive_reservations(db, BEFORE, batch_size=5) == 5
+        assert counts() == (1, 5)
+
+
+def test_archived_reads(app, client, past):
+    restaurant_id, ids = past
+    with app.app_context():
+        archive_reservations(db, BEFORE)
+
+    assert client.get('/api/reservations').get_json()['count'] == 1
+    listed = client.get(f'/api/reservations?include_archived=true&restaurant_id={restaurant_id}').get_json()
+    assert listed['count'] == 6
+    assert {row['id'] for row in listed['data']} >= set(ids)
+
+    assert client.get(f'/api/reservations/{ids[0]}').status_code == 404
+    detail = client.get(f'/api/reservations/{ids[0]}?include_archived=true')
+    assert detail.status_code == 200
+    assert detail.get_json()['data']['customer_name'] == 'Cliente 0'
+
+
+def test_limits_are_kept(app, past):
+    """Los límites de fechas archivadas se conservan (ocupación histórica)"""
+    restaurant_id, _ = past
+    with app.app_context():
+        db.session.add(CapacityLimitOverride(restaurant_id=restaurant_id, limit_date=date(2020, 1, 1), max_reservations=3))
+        db.session.commit()
+        archive_reservations(db, BEFORE)
+        assert db.session.get(CapacityLimitOverride, (restaurant_id, date(2020, 1, 1))).max_reservations == 3
+
+
+def test_ids_are_not_reused(app, client, past):
+    """Borrar la reserva con el id más alto no hace que la siguiente reutilice su id"""
+    with app.app_context():
+        newest = db.session.execute(select(func.max(Reservation.id))).scalar()
+        db.session.delete(db.session.get(Reservation, newest))
+        db.session.commit()
+        db.session.add(Reservation(restaurant_id=past[0], customer_name='Nueva',
+                                   reservation_date=date(2031, 1, 2), number_of_people=2))
+        db.session.commit()
+        assert db.session.execute(select(func.max(Reservation.id))).scalar() > newest
+
+
+def test_conflicting_id_fails_without_deleting(app, past):
+    """Una reserva viva con un id ya archivado no se borra: el lote se deshace con un error"""
+    restaurant_id, ids = past
+    with app.app_context():
+        db.session.execute(insert(ArchivedReservation).values(
+            id=ids[1], restaurant_id=restaurant_id, customer_name='Otra reserva',
+            reservation_date=date(2019, 1, 1), number_of_people=4
+        ))
+        db.session.commit()
+
+        with pytest.raises(ArchiveConflict, match=str(ids[1])):
+            archive_reservations(db, BEFORE, batch_size=10)
+
+        assert counts() == (6, 1)
+        assert db.session.get(ArchivedReservation, ids[1]).customer_name == 'Otra reserva'
+
+
+def test_cli_command(app, past):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['archive-reservations', '--before', BEFORE.isoformat(), '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert '  2 reservas archivadas' in result.output
+    assert 'Reservas archivadas: 5' in result.output
+
+    with app.app_context():
+        assert counts() == (1, 5)
+
+
+def test_cli_command_conflict(app, past):
+    restaurant_id, ids = past
+    with app.app_context():
+        db.session.execute(insert(ArchivedReservation).values(
+            id=ids[0], restaurant_id=restaurant_id, customer_name='Otra reserva',
+            reservation_date=date(2019, 1, 1), number_of_people=4
+        ))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['archive-reservations', '--before', BEFORE.isoformat()])
+    assert result.exit_code != 0
+    assert 'ya archivado' in result.output
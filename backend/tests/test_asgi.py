@@ -0,0 +1,123 @@
+"""El modo ASGI responde igual que las vistas Flask en las rutas de lectura nativas"""
+import asyncio
+import json
+import pytest
+from app.asgi import AsyncReadApp
+from app.utils.cache import restaurants_cache
+
+DAY = '2031-01-01'
+
+
+def asgi_get(asgi, path, headers=None):
+    """GET contra la app ASGI; devuelve (status, cabeceras en minúsculas, cuerpo)"""
+    path, _, query_string = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 1234)
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi(scope, receive, send))
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], {name.decode().lower(): value.decode() for name, value in start['headers']}, body
+
+
+@pytest.fixture
+def asgi(app):
+    asgi = AsyncReadApp(app)
+    yield asgi
+    asyncio.run(asgi.engine.dispose())
+
+
+@pytest.fixture
+def data(client, make_restaurant, make_reservation):
+    """Dos restaurantes con reservas en varias fechas; devuelve sus ids"""
+    madrid = make_restaurant('Casa Pepe', 'Madrid')
+    sevilla = make_restaurant('El Patio', 'Sevilla')
+    for day in ('2031-01-01', '2031-01-02', '2031-01-03'):
+        for restaurant_id in (madrid, sevilla):
+            assert make_reservation(restaurant_id, day).status_code == 201
+    return madrid, sevilla
+
+
+def flask_paths(madrid, sevilla, cursor):
+    return [
+        '/api/restaurants',
+        '/api/restaurants?letter=c',
+        '/api/restaurants?city=SEV',
+        '/api/restaurants?city=%',
+        f'/api/restaurants/{madrid}',
+        '/api/restaurants/999',
+        '/api/reservations',
+        '/api/reservations?limit=2',
+        f'/api/reservations?limit=2&cursor={cursor}',
+        f'/api/reservations?restaurant_id={sevilla}',
+        f'/api/reservations?date={DAY}',
+        '/api/reservations?date=01-01-2031',
+        '/api/reservations?limit=0',
+        '/api/reservations?cursor=roto',
+        f'/api/reservations/availability/{madrid}/{DAY}',
+        f'/api/reservations/availability/999/{DAY}',
+        f'/api/reservations/availability/{madrid}/mañana'
+    ]
+
+
+def test_parity_with_flask(client, asgi, data):
+    cursor = client.get('/api/reservations?limit=2').get_json()['next_cursor']
+    assert cursor
+
+    for path in flask_paths(*data, cursor):
+        flask_response = client.get(path)
+        # Sin la entrada que ha dejado Flask: el handler ASGI ejecuta su propia query
+        restaurants_cache.clear()
+        status, headers, body = asgi_get(asgi, path)
+
+        assert status == flask_response.status_code, path
+        assert json.loads(body) == flask_response.get_json(), path
+        # El listado de restaurantes lleva el ETag del cuerpo cacheado (mismo cuerpo, mismo ETag)
+        if 'ETag' in flask_response.headers:
+            assert headers['etag'] == flask_response.headers['ETag'], path
+
+
+def test_conditional_parity(client, asgi, data):
+    madrid, _ = data
+    for path in ('/api/restaurants', f'/api/restaurants/{madrid}', '/api/reservations?limit=2'):
+        etag = client.get(path).headers['ETag']
+        status, headers, body = asgi_get(asgi, path, {'If-None-Match': etag})
+        assert (status, body) == (304, b''), path
+        assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+
+def metric(client, name, endpoint):
+    """Valor de una serie de /metrics (request_metrics es compartido por todo el proceso)"""
+    prefix = f'{name}{{endpoint="{endpoint}"'
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_native_requests_are_measured(client, asgi, data):
+    """Las lecturas nativas cuentan en /metrics con el endpoint de la vista Flask (y sus sentencias SQL)"""
+    madrid, _ = data
+    endpoints = ('reservations.get_reservations', 'reservations.check_availability')
+    requests_before = [metric(client, 'http_requests_total', endpoint) for endpoint in endpoints]
+    statements_before = metric(client, 'sql_statements_per_request_sum', endpoints[0])
+
+    asgi_get(asgi, '/api/reservations?limit=2')
+    asgi_get(asgi, f'/api/reservations/availability/{madrid}/{DAY}')
+
+    assert [metric(client, 'http_requests_total', endpoint) for endpoint in endpoints] == [
+        total + 1 for total in requests_before
+    ]
+    # Versión (ETag) + página
+    assert metric(client, 'sql_statements_per_request_sum', endpoints[0]) - statements_before == 2
@@ -0,0 +1,218 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import insert, update
+from app.models import db, CapacityLimit, CapacityLimitOverride, DailyCapacity, Reservation
+from app.utils.events import availability_events
+from app.utils.limits import capacity_limits
+
+FUTURE = date(2031, 3, 14)
+
+
+def test_parallel_posts_do_not_overbook(app, make_restaurant):
+    restaurant_id = make_restaurant()
+    limit = app.config['MAX_TABLES_PER_RESTAURANT']
+
+    def book(i):
+        # Un cliente por hilo, como peticiones de workers distintos contra la misma BD
+        return app.test_client().post('/api/reservations', json={
+            'restaurant_id': restaurant_id,
+            'customer_name': f'Cliente {i}',
+            'reservation_date': FUTURE.isoformat(),
+            'number_of_people': 2
+        }).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(pool.map(book, range(3 * limit)))
+
+    assert statuses.count(201) == limit
+    assert statuses.count(400) == 2 * limit
+    with app.app_context():
+        assert Reservation.query.filter_by(restaurant_id=restaurant_id).count() == limit
+        assert db.session.get(DailyCapacity, (restaurant_id, FUTURE)).reserved == limit
+
+
+def test_daily_limit_across_restaurants(app, make_restaurant, make_reservation):
+    daily_limit = app.config['MAX_RESERVATIONS_PER_DAY']
+    restaurant_ids = [make_restaurant(f'R{i}') for i in range(3)]
+
+    statuses = [make_reservation(restaurant_ids[i % 3], FUTURE.isoformat()).status_code for i in range(daily_limit + 5)]
+
+    assert statuses.count(201) == daily_limit
+    with app.app_context():
+        assert Reservation.query.count() == daily_limit
+
+
+def test_admission_uses_stored_limits(app, client, make_restaurant, make_reservation):
+    """Límites cambiados por otro worker: la admisión los aplica aunque la caché de este proceso no se haya recargado"""
+    restaurant_id = make_restaurant()
+    other_id = make_restaurant('Otro')
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+    # La consulta de disponibilidad carga la caché de límites del proceso
+    assert client.get(f'/api/reservations/availability/{restaurant_id}/{FUTURE}').status_code == 200
+    assert not capacity_limits.stale()
+
+    with app.app_context():
+        db.session.execute(insert(CapacityLimit).values(restaurant_id=restaurant_id, max_reservations=2))
+        db.session.execute(insert(CapacityLimitOverride).values(restaurant_id=other_id, limit_date=FUTURE, max_reservations=1))
+        db.session.commit()
+    assert not capacity_limits.stale()
+
+    admitted = make_reservation(restaurant_id, FUTURE.isoformat())
+    assert admitted.status_code == 201
+    assert admitted.get_json()['available_tables_remaining'] == 0
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 400
+
+    # Lote: el límite de la fecha se lee de la BD con los contadores bloqueados
+    bulk = client.post('/api/reservations/bulk', json=[
+        {'restaurant_id': other_id, 'customer_name': f'Cliente {i}', 'reservation_date': FUTURE.isoformat(), 'number_of_people': 2}
+        for i in range(2)
+    ]).get_json()
+    assert (bulk['accepted'], bulk['rejected']) == (1, 1)
+
+
+def test_availability_reads_shared_counters(app, client, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant()
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+
+    body = client.get(f'/api/reservations/availability/{restaurant_id}/{FUTURE}').get_json()
+    assert body['restaurant']['available_tables'] == app.config['MAX_TABLES_PER_RESTAURANT'] - 1
+    assert body['daily_limit']['total_reservations'] == 1
+
+    # Admisiones hechas por otro worker: solo cambian los contadores de la BD
+    with app.app_context():
+        db.session.execute(
+            update(DailyCapacity)
+            .where(DailyCapacity.reservation_date == FUTURE)
+            .values(reserved=DailyCapacity.reserved + 4)
+        )
+        db.session.commit()
+
+    body = client.get(f'/api/reservations/availability/{restaurant_id}/{FUTURE}').get_json()
+    assert body['restaurant']['available_tables'] == app.config['MAX_TABLES_PER_RESTAURANT'] - 5
+    assert body['daily_limit']['total_reservations'] == 5
+
+
+def test_availability_without_counters_counts_reservations(app, client, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant()
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+    with app.app_context():
+        # Histórico cargado antes de existir los contadores
+        DailyCapacity.query.delete()
+        db.session.commit()
+
+    body = client.get(f'/api/reservations/availability/{restaurant_id}/{FUTURE}').get_json()
+    assert body['daily_limit']['total_reservations'] == 1
+    assert body['restaurant']['available_tables'] == app.config['MAX_TABLES_PER_RESTAURANT'] - 1
+
+
+def calendar(client, restaurant_id, **query):
+    response = client.get(f'/api/reservations/availability/{restaurant_id}', query_string=query)
+    assert response.status_code == 200, response.get_json()
+    return {day['date']: day for day in response.get_json()['data']}
+
+
+def test_calendar_reads_counters_and_counts_days_without_them(app, client, make_restaurant, make_reservation):
+    restaurant_id, other_id = make_restaurant('Uno'), make_restaurant('Dos')
+    next_day = FUTURE + timedelta(days=1)
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+    assert make_reservation(other_id, FUTURE.isoformat()).status_code == 201
+    assert make_reservation(restaurant_id, next_day.isoformat()).status_code == 201
+    with app.app_context():
+        # Admisiones de otro worker en el primer día; el segundo, cargado sin contadores
+        db.session.execute(
+            update(DailyCapacity)
+            .where(DailyCapacity.reservation_date == FUTURE)
+            .values(reserved=DailyCapacity.reserved + 2)
+        )
+        DailyCapacity.query.filter_by(reservation_date=next_day).delete()
+        db.session.commit()
+
+    tables, daily = app.config['MAX_TABLES_PER_RESTAURANT'], app.config['MAX_RESERVATIONS_PER_DAY']
+    days = calendar(client, restaurant_id, **{'from': FUTURE.isoformat(), 'to': (FUTURE + timedelta(days=2)).isoformat()})
+    assert list(days) == [(FUTURE + timedelta(days=offset)).isoformat() for offset in range(3)]
+    assert days[FUTURE.isoformat()]['available_tables'] == tables - 3
+    assert days[FUTURE.isoformat()]['remaining_daily'] == daily - 4
+    assert days[next_day.isoformat()]['available_tables'] == tables - 1
+    assert days[next_day.isoformat()]['remaining_daily'] == daily - 1
+    last = days[(FUTURE + timedelta(days=2)).isoformat()]
+    assert last == {'date': last['date'], 'available': True, 'available_tables': tables, 'remaining_daily': daily}
+
+
+def test_calendar_marks_full_days(client, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant()
+    assert client.put(f'/api/limits/{restaurant_id}/{FUTURE}', json={'max_reservations': 1}).status_code == 200
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+
+    days = calendar(client, restaurant_id, **{'from': FUTURE.isoformat(), 'to': (FUTURE + timedelta(days=1)).isoformat()})
+    assert days[FUTURE.isoformat()]['available'] is False
+    assert days[FUTURE.isoformat()]['available_tables'] == 0
+    assert days[(FUTURE + timedelta(days=1)).isoformat()]['available'] is True
+
+
+def test_calendar_default_range_and_conditional_get(client, make_restaurant):
+    restaurant_id = make_restaurant()
+    url = f'/api/reservations/availability/{restaurant_id}'
+    response = client.get(url, query_string={'from': FUTURE.isoformat()})
+    body = response.get_json()
+    assert body['to'] == (FUTURE + timedelta(days=30)).isoformat()
+    assert len(body['data']) == 31
+    assert client.get(url, query_string={'from': FUTURE.isoformat()},
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('query', [
+    {'from': '14/03/2031'},
+    {'from': '2031-03-14', 'to': '2031-02-30'},
+    {'from': '2031-03-14', 'to': '2031-03-13'},
+    {'from': '2031-01-01', 'to': '2031-04-03'}
+])
+def test_calendar_range_validation(client, make_restaurant, query):
+    restaurant_id = make_restaurant()
+    response = client.get(f'/api/reservations/availability/{restaurant_id}', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_calendar_range_limits(app, client, make_restaurant):
+    restaurant_id = make_restaurant()
+    max_days = app.config['AVAILABILITY_CALENDAR_MAX_DAYS']
+    last = (FUTURE + timedelta(days=max_days - 1)).isoformat()
+    assert len(calendar(client, restaurant_id, **{'from': FUTURE.isoformat(), 'to': last})) == max_days
+    assert len(calendar(client, restaurant_id, **{'from': FUTURE.isoformat(), 'to': FUTURE.isoformat()})) == 1
+    assert client.get('/api/reservations/availability/999', query_string={'from': FUTURE.isoformat()}).status_code == 404
+
+
+def test_subscription_starts_from_counters_and_keeps_newer_events(app, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant()
+    other_id = make_restaurant('Otro')
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+
+    received = []
+    with app.app_context():
+        subscription = availability_events.subscribe(db, [(restaurant_id, FUTURE)], lambda key, counts: received.append(counts))
+    try:
+        assert subscription.counts == {(restaurant_id, FUTURE): (1, 1)}
+        assert make_reservation(other_id, FUTURE.isoformat()).status_code == 201
+        assert received == [(1, 2)]
+    finally:
+        availability_events.unsubscribe(subscription)
+
+
+def test_deleting_a_restaurant_publishes_day_totals(app, client, make_restaurant, make_reservation):
+    """Borrar un restaurante baja el total del día que ven los suscriptores de los demás"""
+    restaurant_id = make_restaurant()
+    deleted_id = make_restaurant('Cerrado')
+    assert make_reservation(restaurant_id, FUTURE.isoformat()).status_code == 201
+    for _ in range(2):
+        assert make_reservation(deleted_id, FUTURE.isoformat()).status_code == 201
+
+    received = []
+    with app.app_context():
+        subscription = availability_events.subscribe(db, [(restaurant_id, FUTURE)], lambda key, counts: received.append(counts))
+    try:
+        assert subscription.counts == {(restaurant_id, FUTURE): (1, 3)}
+        assert client.delete(f'/api/restaurants/{deleted_id}').status_code == 200
+        assert received == [(1, 1)]
+    finally:
+        availability_events.unsubscribe(subscription)
@@ -0,0 +1,177 @@
+"""Comandos de flask para cargas masivas: seed, export-reservations e import-restaurants"""
+import csv
+import json
+import pytest
+from sqlalchemy import func, inspect, select
+from app.models import db, ALL_RESTAURANTS, DailyCapacity, DailyOccupancy, Reservation, Restaurant
+from app.utils import bulk
+
+SEED = ['seed', '--restaurants', '3', '--reservations', '40', '--start', '2031-01-01', '--days', '5',
+        '--seed-value', '7', '--chunk-size', '15']
+
+
+@pytest.fixture
+def runner(app):
+    return app.test_cli_runner()
+
+
+def invoke(runner, *args):
+    result = runner.invoke(args=list(args))
+    assert result.exit_code == 0, result.output
+    return result
+
+
+@pytest.fixture
+def index_log(app, monkeypatch):
+    """Índices de reservations presentes en la BD al insertar cada bloque de reservas"""
+    log = []
+    insert_chunks = bulk.insert_chunks
+
+    def record(db, table, rows, *args, **kwargs):
+        if table is Reservation.__table__:
+            log.append({index['name'] for index in inspect(db.session.get_bind()).get_indexes(table.name)})
+        return insert_chunks(db, table, rows, *args, **kwargs)
+
+    monkeypatch.setattr(bulk, 'insert_chunks', record)
+    return log
+
+
+def reservation_indexes(app):
+    with app.app_context():
+        return {index['name'] for index in inspect(db.engine).get_indexes(Reservation.__tablename__)}
+
+
+def test_seed_defers_indexes_and_rebuilds_counters(app, runner, index_log):
+    indexes = reservation_indexes(app)
+    assert {index.name for index in Reservation.__table__.indexes} <= indexes
+
+    invoke(runner, *SEED)
+    # Sin índices secundarios durante la carga y recreados al terminar
+    assert len(index_log) == 1
+    assert not index_log[0] & {index.name for index in Reservation.__table__.indexes}
+    assert reservation_indexes(app) == indexes
+
+    with app.app_context():
+        assert db.session.scalar(select(func.count(Restaurant.id))) == 3
+        assert db.session.scalar(select(func.count(Reservation.id))) == 40
+        per_day = dict(db.session.execute(
+            select(Reservation.reservation_date, func.count(Reservation.id)).group_by(Reservation.reservation_date)
+        ).all())
+        day_counters = dict(db.session.execute(
+            select(DailyCapacity.reservation_date, DailyCapacity.reserved).where(DailyCapacity.restaurant_id == ALL_RESTAURANTS)
+        ).all())
+        assert day_counters == per_day
+        assert db.session.scalar(
+            select(func.sum(DailyCapacity.reserved)).where(DailyCapacity.restaurant_id != ALL_RESTAURANTS)
+        ) == 40
+        covers = db.session.scalar(select(func.sum(Reservation.number_of_people)))
+        assert tuple(db.session.execute(
+            select(func.sum(DailyOccupancy.reservations), func.sum(DailyOccupancy.covers))
+            .where(DailyOccupancy.restaurant_id != ALL_RESTAURANTS)
+        ).one()) == (40, covers)
+
+
+def test_seed_keep_indexes(app, runner, index_log):
+    indexes = reservation_indexes(app)
+    invoke(runner, *SEED, '--keep-indexes')
+    assert index_log == [indexes]
+
+
+def test_seed_without_restaurants_fails(runner):
+    result = runner.invoke(args=['seed', '--reservations', '10'])
+    assert result.exit_code == 1
+    assert 'No hay restaurantes' in result.output
+
+
+def test_deferred_indexes_recreates_after_errors(app):
+    indexes = reservation_indexes(app)
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with bulk.deferred_indexes(db, Reservation.__table__):
+                assert reservation_indexes(app) == indexes - {index.name for index in Reservation.__table__.indexes}
+                raise RuntimeError('carga interrumpida')
+    assert reservation_indexes(app) == indexes
+
+
+def database_reservations(app):
+    with app.app_context():
+        restaurants = dict(db.session.execute(select(Restaurant.id, Restaurant.name)).all())
+        return [
+            {**row._asdict(), 'restaurant_name': restaurants[row.restaurant_id]}
+            for row in db.session.execute(select(*(getattr(Reservation, key) for key in bulk.EXPORT_CSV_COLUMNS[:-1]))
+                                          .order_by(Reservation.id))
+        ]
+
+
+def test_export_csv_round_trip(app, runner, tmp_path, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant('Casa, "Pepe"')
+    assert make_reservation(restaurant_id, '2031-01-01', customer_email='ana@example.com').status_code == 201
+    invoke(runner, *SEED)
+    output = tmp_path / 'reservas.csv'
+    result = invoke(runner, 'export-reservations', str(output))
+    assert '41 reservas exportadas' in result.output
+
+    with output.open(encoding='utf-8', newline='') as file:
+        exported = list(csv.DictReader(file))
+    expected = database_reservations(app)
+    assert list(exported[0]) == list(bulk.EXPORT_CSV_COLUMNS)
+    assert len(exported) == len(expected) == 41
+    for row, reservation in zip(exported, expected):
+        assert row == {
+            key: '' if value is None else (value.isoformat(' ') if key == 'created_at' else str(value))
+            for key, value in reservation.items()
+        }
+
+
+def test_export_ndjson_round_trip_with_filters(app, client, runner, tmp_path):
+    invoke(runner, *SEED)
+    output = tmp_path / 'reservas.ndjson'
+    invoke(runner, 'export-reservations', str(output), '--restaurant-id', '2', '--from', '2031-01-02', '--to', '2031-01-03')
+
+    exported = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    expected = [
+        reservation for reservation in database_reservations(app)
+        if reservation['restaurant_id'] == 2 and '2031-01-02' <= reservation['reservation_date'].isoformat() <= '2031-01-03'
+    ]
+    assert [reservation['id'] for reservation in exported] == [reservation['id'] for reservation in expected]
+    # Mismo cuerpo que la API, restaurante anidado incluido
+    for reservation in exported:
+        assert reservation == client.get(f'/api/reservations/{reservation["id"]}').get_json()['data']
+
+
+def test_import_restaurants_refreshes_cached_reads(runner, client, tmp_path, make_restaurant):
+    make_restaurant('Casa Vieja')
+    # Listado cacheado e índice de búsqueda construidos antes de la importación
+    assert [restaurant['name'] for restaurant in client.get('/api/restaurants').get_json()['data']] == ['Casa Vieja']
+    assert client.get('/api/restaurants/search', query_string={'q': 'marisqueria'}).get_json()['data'] == []
+
+    source = tmp_path / 'restaurantes.csv'
+    source.write_text(
+        'name,address,city,description\n'
+        'Marisqueria Puerto,Calle Mar 1,Vigo,Pescado del día\n'
+        ',Sin nombre 2,Vigo,\n'
+        'Asador Norte,Calle Monte 3,Bilbao,\n',
+        encoding='utf-8'
+    )
+    result = invoke(runner, 'import-restaurants', str(source), '--chunk-size', '2')
+    assert 'Fila 1 descartada' in result.output
+    assert 'Restaurantes importados: 2, descartados: 1' in result.output
+
+    names = [restaurant['name'] for restaurant in client.get('/api/restaurants').get_json()['data']]
+    assert names == ['Asador Norte', 'Casa Vieja', 'Marisqueria Puerto']
+    found = client.get('/api/restaurants/search', query_string={'q': 'marisqueria'}).get_json()['data']
+    assert [restaurant['name'] for restaurant in found] == ['Marisqueria Puerto']
+
+
+def test_import_restaurants_ndjson_and_bad_files(app, runner, tmp_path):
+    source = tmp_path / 'restaurantes.jsonl'
+    source.write_text(json.dumps({'name': 'Tasca Sur', 'address': 'Calle 1', 'city': 'Cádiz'}) + '\n', encoding='utf-8')
+    invoke(runner, 'import-restaurants', str(source))
+    with app.app_context():
+        assert db.session.scalar(select(Restaurant.city).where(Restaurant.name == 'Tasca Sur')) == 'Cádiz'
+
+    broken = tmp_path / 'roto.ndjson'
+    broken.write_text('{"name": "Sin cerrar"\n', encoding='utf-8')
+    result = runner.invoke(args=['import-restaurants', str(broken)])
+    assert result.exit_code == 1
+    assert 'Error leyendo el fichero' in result.output
@@ -0,0 +1,109 @@
+"""ETags de las colecciones: contadores de versión (por restaurante en las reservas) incrementados en el commit de cada escritura"""
+from datetime import date
+from app.models import db, DataVersion, Reservation
+from app.utils.bulk import seed
+from app.utils.instrumentation import count_queries
+
+LIST = '/api/reservations'
+
+
+def etag(client, path=LIST):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def not_modified(client, tag, path=LIST):
+    return client.get(path, headers={'If-None-Match': tag}).status_code == 304
+
+
+def test_unchanged_collection_is_not_modified(client, make_restaurant, make_reservation):
+    make_reservation(make_restaurant(), '2031-01-01')
+    tag = etag(client)
+    assert not_modified(client, tag)
+    assert not_modified(client, etag(client, f'{LIST}?limit=1'), f'{LIST}?limit=1')
+
+
+def test_writes_change_the_collection_etag(client, make_restaurant, make_reservation):
+    restaurant_id = make_restaurant()
+    tag = etag(client)
+
+    assert make_reservation(restaurant_id, '2031-01-01').status_code == 201
+    assert not not_modified(client, tag)
+
+    tag = etag(client)
+    response = client.post(f'{LIST}/bulk', json=[
+        {'restaurant_id': restaurant_id, 'customer_name': 'Lote', 'reservation_date': '2031-01-02', 'number_of_people': 2}
+    ])
+    assert response.status_code in (200, 201), response.get_json()
+    assert not not_modified(client, tag)
+
+    # Los restaurantes van anidados en las reservas
+    tag = etag(client)
+    assert client.put(f'/api/restaurants/{restaurant_id}', json={'name': 'Nuevo nombre'}).status_code == 200
+    assert not not_modified(client, tag)
+
+    tag = etag(client)
+    assert client.delete(f'/api/restaurants/{restaurant_id}').status_code == 200
+    assert not not_modified(client, tag)
+
+
+def test_rejected_write_keeps_the_etag(app, client, make_restaurant, make_reservation):
+    """Una escritura deshecha (rollback) no incrementa la versión, aunque llegara a volcarse"""
+    restaurant_id = make_restaurant()
+    assert client.put(f'/api/limits/{restaurant_id}', json={'max_reservations': 1}).status_code == 200
+    assert make_reservation(restaurant_id, '2031-01-01').status_code == 201
+    tag = etag(client)
+
+    assert make_reservation(restaurant_id, '2031-01-01').status_code == 400
+    assert not_modified(client, tag)
+
+    with app.app_context():
+        db.session.add(Reservation(restaurant_id=restaurant_id, customer_name='Deshecha',
+                                   reservation_date=date(2031, 1, 2), number_of_people=2))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+    assert not_modified(client, tag)
+
+    assert client.get(f'/api/restaurants/{restaurant_id}').status_code == 200
+    assert not_modified(client, tag)
+
+
+def test_driver_level_inserts_change_the_etag(app, client):
+    """La carga masiva va directa al driver (exec_driver_sql) y también cuenta"""
+    tag = etag(client)
+    with app.app_context():
+        seed(db, restaurants=2, reservations=10)
+    assert not not_modified(client, tag)
+
+
+def test_version_lookup_does_not_scan_tables(app, client, make_restaurant, make_reservation):
+    make_reservation(make_restaurant(), '2031-01-01')
+    tag = etag(client)
+    with app.app_context(), count_queries() as statements:
+        assert not_modified(client, tag)
+    assert len(statements) == 1
+    assert 'data_versions' in statements[0]
+    assert 'FROM reservations' not in statements[0] and 'FROM restaurants' not in statements[0]
+
+
+def test_reservation_writes_bump_their_restaurant_row(app, client, make_restaurant, make_reservation):
+    """Las reservas de restaurantes distintos incrementan filas distintas: no hay una fila global caliente"""
+    first, second = make_restaurant('Uno'), make_restaurant('Dos')
+    tag = etag(client)
+    assert make_reservation(first, '2031-01-01').status_code == 201
+    assert make_reservation(second, '2031-01-01').status_code == 201
+    assert make_reservation(second, '2031-01-02').status_code == 201
+    assert not not_modified(client, tag)
+
+    with app.app_context():
+        versions = dict(db.session.query(DataVersion.name, DataVersion.version).all())
+    assert versions[f'reservations:{first}'] == 1
+    assert versions[f'reservations:{second}'] == 2
+    assert 'reservations' not in versions
+
+    tag = etag(client)
+    assert not_modified(client, tag)
+    assert make_reservation(first, '2031-01-03').status_code == 201
+    assert not not_modified(client, tag)
@@ -0,0 +1,94 @@
+"""Idempotency-Key: reintentos, cuerpos distintos, duplicados en curso, clientes distintos y cuerpos en streaming"""
+import time
+from sqlalchemy import func, select
+from app.models import db, Reservation, Restaurant
+from app.utils.idempotency import idempotency_store
+
+RESTAURANT = {'name': 'Casa Pepe', 'address': 'Calle Mayor 1', 'city': 'Madrid'}
+
+
+def restaurants(app):
+    with app.app_context():
+        return db.session.execute(select(func.count(Restaurant.id))).scalar()
+
+
+def test_retry_replays_response(app, client):
+    first = client.post('/api/restaurants', json=RESTAURANT, headers={'Idempotency-Key': 'alta-1'})
+    retry = client.post('/api/restaurants', json=RESTAURANT, headers={'Idempotency-Key': 'alta-1'})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert restaurants(app) == 1
+
+
+def test_same_key_other_body(client):
+    assert client.post('/api/restaurants', json=RESTAURANT, headers={'Idempotency-Key': 'alta-1'}).status_code == 201
+    other = client.post('/api/restaurants', json={**RESTAURANT, 'name': 'Otro'}, headers={'Idempotency-Key': 'alta-1'})
+    assert other.status_code == 422
+
+
+def test_keys_are_scoped_to_the_client(app, client):
+    for address in ('10.0.0.1', '10.0.0.2'):
+        response = client.post('/api/restaurants', json=RESTAURANT, headers={'Idempotency-Key': 'alta-1'},
+                               environ_base={'REMOTE_ADDR': address})
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
+    assert restaurants(app) == 2
+
+
+def test_duplicate_in_flight_gets_409(app, client):
+    """Con la petición original en curso el duplicado no espera: 409 con Retry-After"""
+    idempotency_store.backend.add('127.0.0.1:POST:/api/restaurants:alta-1', {'fingerprint': None, 'response': None}, 30)
+
+    start = time.monotonic()
+    response = client.post('/api/restaurants', json=RESTAURANT, headers={'Idempotency-Key': 'alta-1'})
+    assert time.monotonic() - start < 1
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert restaurants(app) == 0
+
+
+def test_vanishing_claim_does_not_spin(app, client, monkeypatch):
+    """Si la marca desaparece entre add y get se reintenta con espera hasta el plazo"""
+    calls = []
+    monkeypatch.setattr(idempotency_store, 'lock_timeout', 0.3)
+    monkeypatch.setattr(idempotency_store.backend, 'add', lambda *args: False)
+    monkeypatch.setattr(idempotency_store.backend, 'get', lambda key: calls.append(key))
+
+    response = client.post('/api/restaurants', json=RESTAURANT, headers={'Idempotency-Key': 'alta-1'})
+    assert response.status_code == 409
+    assert len(calls) < 20
+
+
+def test_delete_is_idempotent(client, make_restaurant):
+    restaurant_id = make_restaurant()
+    first = client.delete(f'/api/restaurants/{restaurant_id}', headers={'Idempotency-Key': 'baja-1'})
+    retry = client.delete(f'/api/restaurants/{restaurant_id}', headers={'Idempotency-Key': 'baja-1'})
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    # Sin clave, el segundo borrado ya no encuentra el restaurante
+    assert client.delete(f'/api/restaurants/{restaurant_id}').status_code == 404
+
+
+def test_streamed_body_fingerprint(app, client, make_restaurant):
+    """Un CSV se resume mientras la vista lo lee: el reintento idéntico se repite y otro CSV da 422"""
+    restaurant_id = make_restaurant()
+    csv = f'restaurant_id,customer_name,reservation_date,number_of_people\n{restaurant_id},Ana,2031-01-01,2\n'
+
+    def upload(body):
+        return client.post('/api/reservations/bulk', data=body, content_type='text/csv',
+                           headers={'Idempotency-Key': 'lote-1'})
+
+    first = upload(csv)
+    assert first.status_code == 200, first.get_json()
+    assert first.get_json()['accepted'] == 1
+
+    retry = upload(csv)
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert upload(csv.replace('Ana', 'Eva')).status_code == 422
+
+    with app.app_context():
+        assert db.session.execute(select(func.count(Reservation.id))).scalar() == 1
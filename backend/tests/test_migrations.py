@@ -0,0 +1,106 @@
+"""Migraciones de esquema: se registran una vez y pueden volver a aplicarse"""
+from datetime import date
+import pytest
+from sqlalchemy import delete, insert, inspect, select, text
+from app.migrations import MIGRATIONS, upgrade
+from app.models import db, ALL_RESTAURANTS, ArchivedReservation, DailyOccupancy, Reservation, SchemaMigration
+
+
+def test_upgrade_is_idempotent(app):
+    with app.app_context():
+        assert upgrade() == []
+        assert {row.version for row in SchemaMigration.query} == {version for version, _, _ in MIGRATIONS}
+
+
+def test_daily_occupancy_backfill(app, make_restaurant, make_reservation):
+    """La migración 4 reconstruye el resumen diario con la conexión de la migración"""
+    restaurant_id = make_restaurant()
+    for people in (2, 4):
+        assert make_reservation(restaurant_id, '2031-01-01', people).status_code == 201
+
+    with app.app_context():
+        db.session.execute(delete(DailyOccupancy))
+        db.session.execute(delete(SchemaMigration).where(SchemaMigration.version == 4))
+        db.session.commit()
+
+        assert upgrade() == [4]
+        rows = db.session.execute(
+            select(DailyOccupancy.restaurant_id, DailyOccupancy.reservations, DailyOccupancy.covers)
+            .where(DailyOccupancy.reservation_date == date(2031, 1, 1))
+            .order_by(DailyOccupancy.restaurant_id)
+        ).all()
+    assert rows == [(ALL_RESTAURANTS, 2, 6), (restaurant_id, 2, 6)]
+
+
+def test_reservations_autoincrement_rebuild(app, make_restaurant):
+    """La migración 5 reconstruye en SQLite una tabla de reservas sin AUTOINCREMENT conservando filas e índices"""
+    restaurant_id = make_restaurant()
+    with app.app_context():
+        connection = db.session.connection()
+        if connection.dialect.name != 'sqlite':
+            pytest.skip('AUTOINCREMENT solo aplica a SQLite')
+
+        # Tabla como la creaban las versiones anteriores (mismas columnas, sin AUTOINCREMENT)
+        table_sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'reservations'")).scalar()
+        connection.execute(text('DROP TABLE reservations'))
+        connection.execute(text(table_sql.replace(' AUTOINCREMENT', '')))
+        for index in Reservation.__table__.indexes:
+            index.create(bind=connection)
+        connection.execute(insert(Reservation), [
+            {'id': 7, 'restaurant_id': restaurant_id, 'customer_name': 'Viva', 'reservation_date': date(2031, 1, 1)}
+        ])
+        connection.execute(insert(ArchivedReservation), [
+            {'id': 9, 'restaurant_id': restaurant_id, 'customer_name': 'Archivada', 'reservation_date': date(2020, 1, 1)}
+        ])
+        db.session.execute(delete(SchemaMigration).where(SchemaMigration.version == 5))
+        db.session.commit()
+
+        assert upgrade() == [5]
+        connection = db.session.connection()
+        assert 'AUTOINCREMENT' in connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE name = 'reservations'")
+        ).scalar()
+        assert {index['name'] for index in inspect(connection).get_indexes('reservations')} >= {
+            index.name for index in Reservation.__table__.indexes
+        }
+        assert db.session.get(Reservation, 7).customer_name == 'Viva'
+
+        # Los ids nuevos siguen al mayor archivado
+        reservation = Reservation(restaurant_id=restaurant_id, customer_name='Nueva', reservation_date=date(2031, 1, 2))
+        db.session.add(reservation)
+        db.session.commit()
+        assert reservation.id == 10
+
+
+def test_daily_occupancy_capacity(app, make_restaurant, make_reservation):
+    """La migración 6 rellena la capacidad con los límites actuales y amplía el índice cubriente"""
+    restaurant_id = make_restaurant()
+    assert make_reservation(restaurant_id, '2031-01-01').status_code == 201
+
+    with app.app_context():
+        connection = db.session.connection()
+        if connection.dialect.name != 'sqlite':
+            pytest.skip('Reconstruye la tabla anterior con SQL de SQLite')
+
+        # Tabla e índice como los creaba la migración 4 (sin capacity)
+        connection.execute(text('DROP INDEX ix_daily_occupancy_date'))
+        connection.execute(text('ALTER TABLE daily_occupancy DROP COLUMN capacity'))
+        connection.execute(text(
+            'CREATE INDEX ix_daily_occupancy_date ON daily_occupancy '
+            '(reservation_date, restaurant_id, reservations, covers, lead_days)'
+        ))
+        db.session.execute(delete(SchemaMigration).where(SchemaMigration.version == 6))
+        db.session.commit()
+
+        assert upgrade() == [6]
+        rows = db.session.execute(
+            select(DailyOccupancy.restaurant_id, DailyOccupancy.capacity)
+            .where(DailyOccupancy.reservation_date == date(2031, 1, 1))
+            .order_by(DailyOccupancy.restaurant_id)
+        ).all()
+        assert rows == [
+            (ALL_RESTAURANTS, app.config['MAX_RESERVATIONS_PER_DAY']),
+            (restaurant_id, app.config['MAX_TABLES_PER_RESTAURANT'])
+        ]
+        indexes = {index['name']: index['column_names'] for index in inspect(db.session.connection()).get_indexes('daily_occupancy')}
+        assert indexes['ix_daily_occupancy_date'][-1] == 'capacity'
@@ -0,0 +1,98 @@
+"""Paginación keyset de /api/reservations: recorrido por next_cursor, empates y cursores inválidos"""
+import base64
+import json
+from datetime import date, datetime
+import pytest
+from sqlalchemy import insert
+from app.models import db, Reservation
+
+LIST = '/api/reservations'
+
+
+def page(client, **query):
+    response = client.get(LIST, query_string=query)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def walk(client, limit, **query):
+    """Recorre el listado siguiendo next_cursor; devuelve los ids por página"""
+    pages, cursor = [], None
+    while True:
+        body = page(client, limit=limit, **query, **({'cursor': cursor} if cursor else {}))
+        pages.append([reservation['id'] for reservation in body['data']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def tied(app, make_restaurant):
+    """11 reservas: 4 días y, dentro de cada día, varias con el mismo created_at"""
+    restaurant_id = make_restaurant()
+    created_at = datetime(2020, 6, 1, 12, 0, 0)
+    with app.app_context():
+        db.session.execute(insert(Reservation), [
+            {
+                'restaurant_id': restaurant_id, 'customer_name': f'Cliente {i}', 'number_of_people': 2,
+                'reservation_date': date(2031, 1, 1 + i % 4), 'created_at': created_at
+            }
+            for i in range(11)
+        ])
+        db.session.commit()
+        rows = db.session.query(Reservation.id, Reservation.reservation_date, Reservation.created_at).all()
+    # Orden esperado del listado: fecha, created_at e id descendentes
+    return [row.id for row in sorted(rows, key=lambda row: (row.reservation_date, row.created_at, row.id), reverse=True)]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 11])
+def test_walking_next_cursor_returns_every_row_once(client, tied, limit):
+    pages = walk(client, limit)
+    ids = [reservation_id for ids in pages for reservation_id in ids]
+    assert ids == tied
+    assert len(set(ids)) == len(ids)
+    assert all(len(ids) == limit for ids in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_last_page_has_no_cursor(client, tied):
+    body = page(client, limit=len(tied))
+    assert body['count'] == len(tied)
+    assert body['next_cursor'] is None
+
+    body = page(client, limit=len(tied) - 1)
+    assert body['next_cursor'] is not None
+    last = page(client, limit=len(tied) - 1, cursor=body['next_cursor'])
+    assert [reservation['id'] for reservation in last['data']] == tied[-1:]
+    assert last['next_cursor'] is None
+
+
+def test_cursor_keeps_the_filters(client, tied, make_restaurant, make_reservation):
+    restaurant_id = page(client, limit=1)['data'][0]['restaurant_id']
+    other = make_reservation(make_restaurant('Otro'), '2031-01-02').get_json()['data']['id']
+
+    by_date = [reservation_id for ids in walk(client, 2, date='2031-01-02') for reservation_id in ids]
+    # El 2031-01-02 va tras los 2 + 3 ids del 04 y el 03; la reserva nueva tiene created_at posterior
+    assert by_date == [other] + tied[5:8]
+    by_restaurant = [reservation_id for ids in walk(client, 3, restaurant_id=restaurant_id) for reservation_id in ids]
+    assert by_restaurant == tied
+
+
+def encoded(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'roto',
+    '%%%',
+    encoded([]),
+    encoded({'id': 1}),
+    encoded(['2031-01-01', '2020-06-01T12:00:00']),
+    encoded(['01/01/2031', '2020-06-01T12:00:00', 1]),
+    encoded(['2031-01-01', 'ayer', 1]),
+    encoded(['2031-01-01', '2020-06-01T12:00:00', 'uno'])
+])
+def test_malformed_cursor_is_rejected(client, tied, cursor):
+    response = client.get(LIST, query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'message': 'Cursor inválido'}
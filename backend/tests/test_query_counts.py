@@ -0,0 +1,55 @@
+"""Los listados y detalles de reservas lanzan un número constante de queries (sin N+1 al anidar el restaurante)"""
+from datetime import date, timedelta
+import pytest
+from app.models import db, Reservation, Restaurant
+from app.utils.instrumentation import count_queries
+
+N = 10
+
+
+def load(app, restaurants, reservations):
+    """Inserta reservas repartidas entre varios restaurantes y devuelve el id de la última"""
+    with app.app_context():
+        owners = [Restaurant(name=f'Restaurante {i}', address='Calle Mayor 1', city='Madrid') for i in range(restaurants)]
+        db.session.add_all(owners)
+        db.session.flush()
+        rows = [
+            Reservation(
+                restaurant_id=owners[i % restaurants].id,
+                customer_name=f'Cliente {i}',
+                reservation_date=date(2031, 1, 1) + timedelta(days=i % 30),
+                number_of_people=2
+            )
+            for i in range(reservations)
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        return rows[-1].id
+
+
+def statements_for(app, client, path):
+    # El cuerpo se lee dentro del bloque: en streaming las queries se lanzan al generarlo
+    with app.app_context(), count_queries() as statements:
+        response = client.get(path)
+        response.get_data()
+        response.close()
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements)
+
+
+@pytest.mark.parametrize('path', [
+    '/api/reservations?limit=1000',
+    '/api/reservations?format=ndjson',
+    '/api/reservations?limit=1000&include_archived=true',
+    '/api/reservations/{id}',
+    '/api/reservations/{id}?include_archived=true'
+])
+def test_constant_query_count(app, client, path):
+    """Con N y con 10N reservas (y restaurantes) el endpoint ejecuta las mismas sentencias"""
+    last_id = load(app, N, N)
+    small = statements_for(app, client, path.format(id=last_id))
+
+    last_id = load(app, 10 * N, 10 * N)
+    large = statements_for(app, client, path.format(id=last_id))
+
+    assert small == large
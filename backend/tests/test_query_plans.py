@@ -0,0 +1,122 @@
+"""El planificador usa los índices de la migración 1 en las consultas calientes (EXPLAIN)"""
+from datetime import date
+import pytest
+from sqlalchemy import event, func, select, text, tuple_
+from app.models import db, Reservation, Restaurant
+from app.utils.serializers import reservations_select, reservations_source, restaurants_select
+
+DAY = date(2031, 1, 1)
+
+
+def query_plan(statement):
+    """
+    Plan de ejecución de una sentencia Core, como texto
+    El EXPLAIN se lanza sobre el SQL y los parámetros finales que genera
+    SQLAlchemy, justo antes de ejecutar la sentencia original.
+    """
+    connection = db.session.connection()
+    postgresql = connection.dialect.name == 'postgresql'
+    if postgresql:
+        # Con tablas casi vacías un seq scan siempre es más barato: se comprueba que el índice es utilizable
+        connection.execute(text('SET LOCAL enable_seqscan = off'))
+    prefix = 'EXPLAIN ' if postgresql else 'EXPLAIN QUERY PLAN '
+    plans = []
+
+    def explain(conn, cursor, sql, parameters, context, executemany):
+        cursor.execute(prefix + sql, parameters)
+        plans.extend(str(row[-1]) for row in cursor.fetchall())
+
+    event.listen(connection, 'before_cursor_execute', explain)
+    try:
+        connection.execute(statement).all()
+    finally:
+        event.remove(connection, 'before_cursor_execute', explain)
+    return '\n'.join(plans)
+
+
+def assert_uses_index(plan, *names):
+    """El plan usa alguno de los índices indicados y no recorre la tabla entera"""
+    assert any(name in plan for name in names), plan
+    assert 'SCAN reservations\n' not in plan + '\n' and 'Seq Scan' not in plan, plan
+
+
+def reservations_page(source, *conditions):
+    """Página del listado de reservas, con el mismo orden que GET /api/reservations"""
+    return (
+        reservations_select(source)
+        .where(*conditions)
+        .order_by(source.c.reservation_date.desc(), source.c.created_at.desc(), source.c.id.desc())
+        .limit(21)
+    )
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+
+
+def test_reservations_by_restaurant_and_date(app_context):
+    source = reservations_source()
+    plan = query_plan(reservations_page(
+        source, source.c.restaurant_id == 1, source.c.reservation_date == DAY
+    ))
+    # Con ambos filtros el planificador puede preferir el índice que ya da el orden de la página
+    assert_uses_index(plan, 'ix_reservations_restaurant_date', 'ix_reservations_date_created')
+
+
+def test_reservations_by_restaurant(app_context):
+    source = reservations_source()
+    plan = query_plan(reservations_page(source, source.c.restaurant_id == 1))
+    assert_uses_index(plan, 'ix_reservations_restaurant_date', 'ix_reservations_date_created')
+
+
+def test_reservations_by_date(app_context):
+    source = reservations_source()
+    plan = query_plan(reservations_page(source, source.c.reservation_date == DAY))
+    assert_uses_index(plan, 'ix_reservations_date_created', 'ix_reservations_restaurant_date')
+
+
+def test_reservations_page_order(app_context):
+    """Listado sin filtros: el orden y el cursor keyset se resuelven recorriendo el índice"""
+    source = reservations_source()
+    plan = query_plan(reservations_page(
+        source, tuple_(source.c.reservation_date, source.c.created_at, source.c.id) < (DAY, DAY, 10)
+    ))
+    assert_uses_index(plan, 'ix_reservations_date_created')
+
+
+def test_archived_reservations_page_order(app_context):
+    source = reservations_source(include_archived=True)
+    plan = query_plan(reservations_page(source))
+    assert 'ix_reservations_date_created' in plan
+    assert 'ix_reservations_archive_date_created' in plan
+
+
+def test_daily_reservation_count(app_context):
+    """COUNT de admisión y disponibilidad por (restaurante, fecha)"""
+    plan = query_plan(
+        select(func.count(Reservation.id))
+        .where(Reservation.restaurant_id == 1, Reservation.reservation_date == DAY)
+    )
+    assert_uses_index(plan, 'ix_reservations_restaurant_date')
+
+
+def test_restaurants_by_name(app_context):
+    plan = query_plan(restaurants_select().order_by(Restaurant.name))
+    assert 'ix_restaurants_name' in plan
+
+
+def test_restaurants_name_prefix(app_context):
+    if db.session.connection().dialect.name != 'postgresql':
+        pytest.skip('índice de prefijo lower(name) solo en PostgreSQL')
+    plan = query_plan(restaurants_select().where(func.lower(Restaurant.name).like('m%')))
+    assert 'ix_restaurants_name_lower_prefix' in plan
+
+
+def test_restaurants_city_substring(app_context):
+    if db.session.connection().dialect.name != 'postgresql':
+        pytest.skip('índice trigram de city solo en PostgreSQL (pg_trgm)')
+    plan = query_plan(restaurants_select().where(Restaurant.city.ilike('%madrid%')))
+    assert 'ix_restaurants_city_trgm' in plan
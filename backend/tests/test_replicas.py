@@ -0,0 +1,136 @@
+"""Enrutado de lecturas a réplicas: GET a réplica, escrituras y vistas de capacidad al primario, cookie sticky"""
+import pytest
+from flask import g
+from app import create_app
+from app.models import db
+from app.utils.instrumentation import count_queries
+from app.utils.replicas import primary, replica_bind_key
+from tests.conftest import make_config
+
+DAY = '2031-01-01'
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """
+    App con dos réplicas SQLite vacías (mismo esquema, sin datos): lo que solo
+    existe en el primario delata desde qué bind se ha leído
+    """
+    app = create_app(make_config(tmp_path, SQLALCHEMY_REPLICA_URIS=[
+        f'sqlite:///{tmp_path / "replica_0.db"}', f'sqlite:///{tmp_path / "replica_1.db"}'
+    ]))
+    with app.app_context():
+        for key in ('replica_0', 'replica_1'):
+            db.metadata.create_all(db.engines[key])
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def written(routed):
+    """Restaurante y reserva creados por un cliente (que queda con la cookie sticky)"""
+    writer = routed.test_client()
+    restaurant_id = writer.post('/api/restaurants', json={
+        'name': 'Primario', 'address': 'Calle 1', 'city': 'Madrid'
+    }).get_json()['data']['id']
+    reservation = writer.post('/api/reservations', json={
+        'restaurant_id': restaurant_id, 'customer_name': 'Ana', 'reservation_date': DAY, 'number_of_people': 2
+    })
+    assert reservation.status_code == 201
+    return writer, restaurant_id, reservation.get_json()['data']['id']
+
+
+def test_writes_stay_on_the_primary(routed):
+    client = routed.test_client()
+    with routed.app_context(), count_queries() as primary_statements:
+        with count_queries(db.engines['replica_0']) as replica_0, count_queries(db.engines['replica_1']) as replica_1:
+            response = client.post('/api/restaurants', json={'name': 'Nuevo', 'address': 'Calle 1', 'city': 'Madrid'})
+    assert response.status_code == 201
+    assert replica_0 == [] and replica_1 == []
+    assert any(statement.startswith('INSERT INTO restaurants') for statement in primary_statements)
+
+
+def test_reads_go_to_a_replica(routed, written):
+    _, _, reservation_id = written
+    reader = routed.test_client()
+    # La réplica (vacía) no tiene la reserva
+    assert reader.get(f'/api/reservations/{reservation_id}').status_code == 404
+    assert reader.get('/api/reservations').get_json()['data'] == []
+
+
+def test_replicas_take_turns_per_request(routed):
+    with routed.test_request_context('/api/reservations', method='GET'):
+        first = replica_bind_key()
+        # Una réplica por petición: las queries de la misma petición no cambian de réplica
+        assert replica_bind_key() == first
+    with routed.test_request_context('/api/reservations', method='GET'):
+        second = replica_bind_key()
+    assert {first, second} == {'replica_0', 'replica_1'}
+
+    with routed.test_request_context('/api/reservations', method='POST'):
+        assert replica_bind_key() is None
+    with routed.app_context():
+        assert replica_bind_key() is None
+
+
+def test_writer_reads_its_writes(routed, written):
+    writer, _, reservation_id = written
+    cookie = writer.get_cookie('read_primary_until')
+    assert cookie is not None and cookie.max_age == routed.config['REPLICA_STICKY_SECONDS']
+    assert writer.get(f'/api/reservations/{reservation_id}').status_code == 200
+
+    # Ventana vencida o cookie manipulada: vuelve a leer de la réplica
+    for value in ('0', 'mañana'):
+        writer.set_cookie('read_primary_until', value)
+        assert writer.get(f'/api/reservations/{reservation_id}').status_code == 404
+
+
+def test_rejected_write_does_not_set_the_cookie(routed):
+    client = routed.test_client()
+    assert client.post('/api/reservations', json={'restaurant_id': 999}).status_code >= 400
+    assert client.get_cookie('read_primary_until') is None
+
+
+def test_use_primary_views_read_the_primary(routed, written):
+    _, restaurant_id, _ = written
+    reader = routed.test_client()
+    body = reader.get(f'/api/reservations/availability/{restaurant_id}/{DAY}').get_json()
+    assert body['daily_limit']['total_reservations'] == 1
+
+    calendar = reader.get(f'/api/reservations/availability/{restaurant_id}', query_string={'from': DAY, 'to': DAY})
+    assert calendar.status_code == 200
+    assert calendar.get_json()['data'][0]['remaining_daily'] == routed.config['MAX_RESERVATIONS_PER_DAY'] - 1
+
+
+def test_primary_block_reads_the_primary(routed, written):
+    _, restaurant_id, _ = written
+    # El listado de restaurantes se rellena desde el primario dentro de primary()
+    names = [restaurant['name'] for restaurant in routed.test_client().get('/api/restaurants').get_json()['data']]
+    assert names == ['Primario']
+
+    with routed.test_request_context('/api/restaurants', method='GET'):
+        assert replica_bind_key() is not None
+        with primary():
+            with primary():
+                assert replica_bind_key() is None
+            assert replica_bind_key() is None
+        assert g.primary_depth == 0
+        assert replica_bind_key() is not None
+
+
+def test_availability_stream_reads_the_primary(routed, written):
+    _, restaurant_id, _ = written
+    response = routed.test_client().get(
+        '/api/reservations/availability/stream', query_string={'subscribe': f'{restaurant_id}:{DAY}'}, buffered=False
+    )
+    # En la réplica ni siquiera existe el restaurante (sería un 404)
+    assert response.status_code == 200
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    event = next(chunks)
+    response.close()
+    assert event.startswith(b'event: availability\n')
+    assert b'"total_reservations":1' in event
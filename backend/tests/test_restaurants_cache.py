@@ -0,0 +1,49 @@
+"""Listado cacheado de restaurantes: filtros literales e invalidación tras las escrituras"""
+from app.utils.cache import restaurants_cache
+
+
+def names(response):
+    assert response.status_code == 200
+    return [restaurant['name'] for restaurant in response.get_json()['data']]
+
+
+def test_like_wildcards_are_literal(client, make_restaurant):
+    make_restaurant('Casa Pepe', 'Madrid')
+    make_restaurant('100% Tapas', 'San_Sebastián')
+
+    assert names(client.get('/api/restaurants?city=_')) == ['100% Tapas']
+    assert names(client.get('/api/restaurants?city=%')) == []
+    assert names(client.get('/api/restaurants?letter=%')) == []
+    assert names(client.get('/api/restaurants?letter=1')) == ['100% Tapas']
+
+
+def test_write_invalidates_matching_wildcard_list(client, make_restaurant):
+    """Un listado con '%' en la ciudad se invalida con la misma comparación literal que la consulta"""
+    assert names(client.get('/api/restaurants?city=100%')) == []
+
+    make_restaurant('Bar', 'Barrio 100% Sur')
+    assert names(client.get('/api/restaurants?city=100%')) == ['Bar']
+
+
+def test_update_invalidates_previous_and_new_lists(client, make_restaurant):
+    restaurant_id = make_restaurant('Casa Pepe', 'Madrid')
+    assert names(client.get('/api/restaurants?city=madrid')) == ['Casa Pepe']
+    assert names(client.get('/api/restaurants?city=sevilla')) == []
+
+    assert client.put(f'/api/restaurants/{restaurant_id}', json={'city': 'Sevilla'}).status_code == 200
+    assert names(client.get('/api/restaurants?city=madrid')) == []
+    assert names(client.get('/api/restaurants?city=sevilla')) == ['Casa Pepe']
+
+
+def test_stale_fill_after_invalidation_is_not_cached(app):
+    """Una lectura que empezó antes de una invalidación no repuebla la caché"""
+    with app.app_context():
+        generation = restaurants_cache.generation()
+        restaurants_cache.invalidate(lambda key: True)
+
+        entry = restaurants_cache.set('|madrid', '{"data": []}', generation)
+        assert entry['body'] == '{"data": []}'
+        assert restaurants_cache.get('|madrid') is None
+
+        restaurants_cache.set('|madrid', '{"data": []}', restaurants_cache.generation())
+        assert restaurants_cache.get('|madrid') is not None
@@ -0,0 +1,115 @@
+"""Búsqueda de restaurantes: ranking, límites por búsqueda, escrituras concurrentes y sincronización entre workers"""
+import os
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, insert
+from app import create_app
+from app.models import db, Restaurant
+from app.utils.search import restaurant_search
+from tests.conftest import make_config
+
+
+@pytest.fixture(params=[64, 0], ids=['combinations', 'groups'])
+def search_client(request, tmp_path):
+    """Cliente con cada estrategia de ranking (SEARCH_MAX_COMBINATIONS=0 fuerza la de grupos)"""
+    app = create_app(make_config(tmp_path, SEARCH_MAX_COMBINATIONS=request.param, SEARCH_MAX_EXPANSIONS=3))
+    yield app.test_client()
+    with app.app_context():
+        db.session.remove()
+        if os.environ.get('TEST_DATABASE_URL'):
+            db.drop_all(bind_key=None)
+        db.engine.dispose()
+
+
+def create(client, name, city, description=''):
+    response = client.post('/api/restaurants', json={
+        'name': name, 'address': 'Calle Mayor 1', 'city': city, 'description': description
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['data']['id']
+
+
+def search(client, query, **params):
+    response = client.get('/api/restaurants/search', query_string={'q': query, **params})
+    return response.status_code, response.get_json()
+
+
+def test_scores_sum_best_match_per_term(search_client):
+    create(search_client, 'Casa Sol', 'Madrid')
+    create(search_client, 'Casa Madrid', 'Sevilla', 'Cocina de casa')
+    create(search_client, 'Bar Madrid', 'Madrid')
+
+    status, body = search(search_client, 'casa madrid')
+    assert status == 200
+    # Nombre (3) + nombre (3) frente a nombre (3) + ciudad (2); cada término cuenta una vez
+    assert [(row['name'], row['score']) for row in body['data']] == [('Casa Madrid', 6.0), ('Casa Sol', 5.0)]
+
+
+def test_equal_scores_ordered_by_name(search_client):
+    for name in ('Tasca Zeta', 'Tasca Alfa', 'Tasca Medio'):
+        create(search_client, name, 'Madrid')
+
+    status, body = search(search_client, 'tasca', limit=2)
+    assert status == 200
+    assert [row['name'] for row in body['data']] == ['Tasca Alfa', 'Tasca Medio']
+
+
+def test_too_many_terms(search_client):
+    create(search_client, 'Casa Sol', 'Madrid')
+    status, body = search(search_client, 'uno dos tres cuatro cinco seis siete ocho nueve')
+    assert status == 400
+    assert body['success'] is False
+
+
+def test_too_many_expansions(search_client):
+    for name in ('Paella', 'Pasta', 'Patatas', 'Pavo'):
+        create(search_client, name, 'Madrid')
+
+    status, body = search(search_client, 'pa')
+    assert status == 400
+    assert 'pa' in body['message']
+    # Un prefijo más largo vuelve a estar dentro del límite
+    assert search(search_client, 'pat')[0] == 200
+
+
+def test_writes_are_not_blocked_while_scoring(app, client, make_restaurant, monkeypatch):
+    """El ranking corre fuera del lock: una baja concurrente termina y su restaurante se descarta"""
+    removed = make_restaurant('Asador Uno', 'Madrid')
+    make_restaurant('Asador Dos', 'Madrid')
+    rank = restaurant_search._rank_combinations
+
+    def rank_with_concurrent_write(*args):
+        writer = threading.Thread(target=restaurant_search.remove, args=(removed,))
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive()
+        return rank(*args)
+
+    monkeypatch.setattr(restaurant_search, '_rank_combinations', rank_with_concurrent_write)
+    status, body = search(client, 'asador')
+    assert status == 200
+    assert [row['name'] for row in body['data']] == ['Asador Dos']
+
+
+def test_refresh_picks_up_late_commits_and_deletes(app, client, make_restaurant):
+    """
+    Cambios de otros workers: un alta que confirma tarde (updated_at anterior a la
+    marca de agua), otra fuera de la ventana solapada y una baja
+    """
+    gone = make_restaurant('Meson Viejo', 'Madrid')
+    with app.app_context():
+        # Marca de agua en la última escritura de este worker
+        restaurant_search._refresh()
+        watermark = restaurant_search._watermark
+        db.session.execute(insert(Restaurant), [
+            {'name': 'Meson Tardio', 'address': 'Calle 1', 'city': 'Madrid', 'updated_at': watermark - timedelta(seconds=5)},
+            {'name': 'Meson Antiguo', 'address': 'Calle 2', 'city': 'Madrid', 'updated_at': datetime(2000, 1, 1)}
+        ])
+        db.session.execute(delete(Restaurant).where(Restaurant.id == gone))
+        db.session.commit()
+        restaurant_search._refresh()
+
+    status, body = search(client, 'meson')
+    assert status == 200
+    assert [row['name'] for row in body['data']] == ['Meson Antiguo', 'Meson Tardio']
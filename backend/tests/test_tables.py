@@ -0,0 +1,218 @@
+"""Mesas por horario: agenda de intervalos, asignación best fit, /slots, CRUD de mesas y orden de bloqueo"""
+from datetime import date
+import pytest
+from app import create_app
+from app.models import db, ALL_RESTAURANTS
+from app.utils import admission
+from app.utils.allocation import TableIntervals
+from tests.conftest import make_config
+
+DAY = '2031-01-01'
+
+
+@pytest.fixture
+def make_table(client):
+    """Crea una mesa por la API y devuelve su id"""
+    def make(restaurant_id, name, seats):
+        response = client.post(f'/api/restaurants/{restaurant_id}/tables', json={'name': name, 'seats': seats})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['data']['id']
+    return make
+
+
+def book(make_reservation, restaurant_id, people, start_time, **fields):
+    return make_reservation(restaurant_id, DAY, people, start_time=start_time, **fields)
+
+
+def test_intervals_is_free():
+    table = TableIntervals(1, 4)
+    table.add(720, 810)
+    table.add(900, 990)
+
+    assert table.is_free(600, 720)
+    assert table.is_free(810, 900)
+    assert not table.is_free(780, 840)
+    assert not table.is_free(700, 730)
+    assert not table.is_free(600, 1000)
+    assert table.is_free(990, 1080)
+
+
+def test_intervals_free_starts():
+    table = TableIntervals(1, 4)
+    table.add(780, 870)
+    # Rejilla de 15 minutos desde las 12:00; 60 minutos por reserva
+    starts = list(table.free_starts(720, 900, 60, 15))
+    assert starts == [720, 870, 885, 900]
+
+
+def test_smallest_fitting_table(make_restaurant, make_table, make_reservation):
+    restaurant_id = make_restaurant()
+    small, medium, large = (make_table(restaurant_id, name, seats) for name, seats in (('M1', 2), ('M2', 4), ('M3', 6)))
+
+    assert book(make_reservation, restaurant_id, 3, '20:00').get_json()['data']['table_id'] == medium
+    assert book(make_reservation, restaurant_id, 3, '20:00').get_json()['data']['table_id'] == large
+    full = book(make_reservation, restaurant_id, 3, '20:30')
+    assert full.status_code == 400
+    assert 'No hay mesas libres' in full.get_json()['message']
+    assert book(make_reservation, restaurant_id, 2, '20:00').get_json()['data']['table_id'] == small
+    assert book(make_reservation, restaurant_id, 7, '13:00').status_code == 400
+
+
+def test_start_time_required_inside_service_window(make_restaurant, make_table, make_reservation):
+    restaurant_id = make_restaurant()
+    # Sin mesas no hace falta hora
+    assert make_reservation(restaurant_id, DAY).status_code == 201
+
+    make_table(restaurant_id, 'M1', 4)
+    missing = make_reservation(restaurant_id, DAY)
+    assert missing.status_code == 400
+    assert 'start_time' in missing.get_json()['message']
+    assert book(make_reservation, restaurant_id, 2, '11:00').status_code == 400
+    assert book(make_reservation, restaurant_id, 2, '23:00').status_code == 400
+    assert book(make_reservation, restaurant_id, 2, '22:30').status_code == 201
+
+
+def test_service_window_from_app_config(tmp_path):
+    app = create_app(make_config(tmp_path, SERVICE_OPENS='18:00', LAST_SEATING='21:00', DEFAULT_RESERVATION_MINUTES=60))
+    client = app.test_client()
+    restaurant_id = client.post('/api/restaurants', json={
+        'name': 'Cena', 'address': 'Calle 1', 'city': 'Madrid'
+    }).get_json()['data']['id']
+    assert client.post(f'/api/restaurants/{restaurant_id}/tables', json={'name': 'M1', 'seats': 2}).status_code == 201
+
+    def reserve(start_time):
+        return client.post('/api/reservations', json={
+            'restaurant_id': restaurant_id, 'customer_name': 'Ana', 'reservation_date': DAY,
+            'number_of_people': 2, 'start_time': start_time
+        })
+
+    early = reserve('12:00')
+    assert early.status_code == 400
+    assert '18:00 y 21:00' in early.get_json()['message']
+    assert reserve('18:00').get_json()['data']['duration_minutes'] == 60
+
+    slots = client.get(f'/api/reservations/availability/{restaurant_id}/{DAY}/slots', query_string={'party': 2, 'duration': 60})
+    assert slots.get_json()['slots'][:2] == ['19:00', '19:15']
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_slots(client, make_restaurant, make_table, make_reservation):
+    restaurant_id = make_restaurant()
+    make_table(restaurant_id, 'M1', 2)
+    assert book(make_reservation, restaurant_id, 2, '12:00').status_code == 201
+
+    url = f'/api/reservations/availability/{restaurant_id}/{DAY}/slots'
+    body = client.get(url, query_string={'party': 2, 'limit': 3}).get_json()
+    # La mesa está ocupada de 12:00 a 13:30 (duración por defecto 90)
+    assert body['slots'] == ['13:30', '13:45', '14:00']
+    assert body['duration_minutes'] == 90
+
+    assert client.get(url, query_string={'party': 2, 'after': '13:40', 'limit': 1}).get_json()['slots'] == ['13:45']
+    assert client.get(url, query_string={'party': 2, 'duration': 30, 'after': '22:00'}).get_json()['slots'] == [
+        '22:00', '22:15', '22:30'
+    ]
+    assert client.get(url, query_string={'party': 3}).get_json()['slots'] == []
+
+
+@pytest.mark.parametrize('query', [
+    {},
+    {'party': 'dos'},
+    {'party': 0},
+    {'party': 2, 'duration': 10},
+    {'party': 2, 'duration': 400},
+    {'party': 2, 'limit': 0},
+    {'party': 2, 'after': '25:00'}
+])
+def test_slots_validation(client, make_restaurant, make_table, query):
+    restaurant_id = make_restaurant()
+    make_table(restaurant_id, 'M1', 2)
+    assert client.get(f'/api/reservations/availability/{restaurant_id}/{DAY}/slots', query_string=query).status_code == 400
+
+
+def test_slots_without_tables(client, make_restaurant):
+    restaurant_id = make_restaurant()
+    assert client.get(f'/api/reservations/availability/{restaurant_id}/{DAY}/slots?party=2').status_code == 400
+    assert client.get(f'/api/reservations/availability/999/{DAY}/slots?party=2').status_code == 404
+
+
+def test_table_crud(client, make_restaurant, make_table, make_reservation):
+    restaurant_id = make_restaurant()
+    large = make_table(restaurant_id, 'Terraza', 6)
+    small = make_table(restaurant_id, 'Ventana', 2)
+
+    duplicate = client.post(f'/api/restaurants/{restaurant_id}/tables', json={'name': 'Terraza', 'seats': 4})
+    assert duplicate.status_code == 409
+    assert client.post(f'/api/restaurants/{restaurant_id}/tables', json={'name': 'Barra', 'seats': 0}).status_code == 400
+    assert client.post('/api/restaurants/999/tables', json={'name': 'M1', 'seats': 2}).status_code == 404
+
+    listed = client.get(f'/api/restaurants/{restaurant_id}/tables').get_json()
+    assert [table['id'] for table in listed['data']] == [small, large]
+
+    reservation = book(make_reservation, restaurant_id, 5, '21:00').get_json()['data']
+    assert reservation['table_id'] == large
+    blocked = client.delete(f'/api/restaurants/{restaurant_id}/tables/{large}')
+    assert blocked.status_code == 409
+    assert '1 reservas futuras' in blocked.get_json()['message']
+
+    assert client.delete(f'/api/reservations/{reservation["id"]}').status_code == 200
+    assert client.delete(f'/api/restaurants/{restaurant_id}/tables/{large}').status_code == 200
+    assert client.delete(f'/api/restaurants/{restaurant_id}/tables/{large}').status_code == 404
+
+
+def test_update_excludes_own_slot(client, make_restaurant, make_table, make_reservation):
+    """Mover una reserva solapando su propio horario no choca consigo misma; sí con otra"""
+    restaurant_id = make_restaurant()
+    table_id = make_table(restaurant_id, 'M1', 4)
+    first = book(make_reservation, restaurant_id, 2, '12:00').get_json()['data']
+
+    moved = client.put(f'/api/reservations/{first["id"]}', json={'start_time': '12:30'})
+    assert moved.status_code == 200, moved.get_json()
+    assert moved.get_json()['data']['table_id'] == table_id
+    assert moved.get_json()['data']['start_time'] == '12:30'
+
+    second = book(make_reservation, restaurant_id, 2, '14:00').get_json()['data']
+    clash = client.put(f'/api/reservations/{second["id"]}', json={'start_time': '13:00'})
+    assert clash.status_code == 400
+    assert client.get(f'/api/reservations/{second["id"]}').get_json()['data']['start_time'] == '14:00'
+
+
+@pytest.fixture
+def lock_log(monkeypatch):
+    """Registra el orden en que se siembran/bloquean contadores y se bloquea el lote de la importación"""
+    log = []
+    ensure_counter, lock_batch = admission._ensure_counter, admission.lock_batch
+
+    def record_counter(db, restaurant_id, reservation_date):
+        log.append((reservation_date, restaurant_id))
+        return ensure_counter(db, restaurant_id, reservation_date)
+
+    def record_batch(db, slots):
+        log.append('batch')
+        return lock_batch(db, slots)
+
+    monkeypatch.setattr(admission, '_ensure_counter', record_counter)
+    monkeypatch.setattr('app.routes.reservations.lock_batch', record_batch)
+    return log
+
+
+def test_counter_lock_order(client, make_restaurant, make_table, make_reservation, lock_log):
+    """
+    Alta individual e importación bloquean los contadores en el mismo orden (fecha,
+    restaurante) con el total del día primero: en PostgreSQL no pueden interbloquearse
+    """
+    restaurant_id = make_restaurant()
+    make_table(restaurant_id, 'M1', 4)
+    day = date(2031, 1, 1)
+
+    assert book(make_reservation, restaurant_id, 2, '12:00').status_code == 201
+    # admit_reservation y después la asignación de mesa (lock_counters)
+    assert lock_log == [(day, ALL_RESTAURANTS), (day, restaurant_id)] * 2
+
+    lock_log.clear()
+    csv = f'restaurant_id,customer_name,reservation_date,number_of_people,start_time\n{restaurant_id},Eva,{DAY},2,14:00\n'
+    response = client.post('/api/reservations/bulk', data=csv, content_type='text/csv')
+    assert response.get_json()['accepted'] == 1
+    # Todo el lote se bloquea antes de leer la agenda; lock_counters ya no toma filas nuevas
+    assert lock_log == ['batch', (day, ALL_RESTAURANTS), (day, restaurant_id)]
@@ -0,0 +1,50 @@
+"""Rate limiting por cliente: la IP real solo con TRUSTED_PROXY_COUNT (si no, un aviso al arrancar)"""
+import logging
+import os
+import pytest
+from app import create_app
+from app.models import db
+from app.utils.throttling import rate_limiter
+from tests.conftest import make_config
+
+RESTAURANT = {'name': 'Casa Pepe', 'address': 'Calle Mayor 1', 'city': 'Madrid'}
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    apps = []
+
+    def make(**overrides):
+        app = create_app(make_config(tmp_path, **overrides))
+        apps.append(app)
+        return app.test_client()
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            if os.environ.get('TEST_DATABASE_URL'):
+                db.drop_all(bind_key=None)
+            db.engine.dispose()
+    rate_limiter.backend.clear()
+
+
+def test_warns_without_trusted_proxies(make_client, caplog):
+    with caplog.at_level(logging.WARNING):
+        make_client(RATE_LIMIT_ENABLED=True)
+    assert 'TRUSTED_PROXY_COUNT=0' in caplog.text
+
+
+def test_clients_behind_proxy_get_their_own_bucket(make_client, caplog):
+    client = make_client(
+        RATE_LIMIT_ENABLED=True, TRUSTED_PROXY_COUNT=1,
+        RATE_LIMITS={'restaurants': {'client': (0.001, 1)}}
+    )
+    assert 'TRUSTED_PROXY_COUNT=0' not in caplog.text
+
+    def create(address):
+        return client.post('/api/restaurants', json=RESTAURANT, headers={'X-Forwarded-For': address}).status_code
+
+    assert create('10.0.0.1') == 201
+    assert create('10.0.0.1') == 429
+    assert create('10.0.0.2') == 201